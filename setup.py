@@ -61,7 +61,9 @@ setup(
         'pyramid',
         'six',
         'nti.app.products.integration',
+        'perfmetrics',
         'zope.component',
+        'zope.generations',
         'zope.i18nmessageid',
         'zope.interface',
         'zope.schema',
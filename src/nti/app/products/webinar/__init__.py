@@ -20,5 +20,7 @@ VIEW_WEBINAR_REGISTER = 'WebinarRegister'
 VIEW_UPCOMING_WEBINARS = 'UpcomingWebinars'
 VIEW_WEBINAR_UNREGISTER = 'WebinarUnRegister'
 VIEW_WEBINAR_REGISTRATIONS = 'WebinarRegistrations'
+VIEW_WEBINAR_BULK_REGISTER = 'WebinarBulkRegister'
+VIEW_WEBINAR_ATTENDANCE_REPORT = 'WebinarAttendanceReport'
 
 VIEW_WEBINAR_REGISTRATION_FIELDS = 'WebinarRegistrationFields'
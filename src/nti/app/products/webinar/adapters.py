@@ -7,6 +7,14 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+from BTrees.LLBTree import LLTreeSet
+
+from BTrees.OOBTree import OOBTree
+
+from pyramid.threadlocal import get_current_request
+
+from six import unichr
+
 from ZODB.interfaces import IConnection
 
 from zope import component
@@ -14,13 +22,19 @@ from zope import interface
 
 from zope.annotation.interfaces import IAnnotations
 
+from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IIntIdRemovedEvent
+
 from nti.app.products.webinar.interfaces import IWebinar
 from nti.app.products.webinar.interfaces import IWebinarClient
 from nti.app.products.webinar.interfaces import IGoToWebinarAuthorizedIntegration
 from nti.app.products.webinar.interfaces import IWebinarRegistrationMetadataContainer
 
+from nti.containers.containers import _tx_key_insen
 from nti.containers.containers import CaseInsensitiveCheckingLastModifiedBTreeContainer
 
+from nti.dataserver.users import User
+
 from nti.schema.fieldproperty import createDirectFieldProperties
 
 from nti.schema.schema import SchemaConfigured
@@ -28,6 +42,16 @@ from nti.schema.schema import SchemaConfigured
 
 WEBINAR_REGISTRATION_CONTAINER_KEY = 'nti.app.products.webinar.interfaces.IWebinarRegistrationContainer'
 
+#: The request environ key of our per-request integration availability memo.
+INTEGRATION_AVAILABILITY_KEY = 'nti.app.products.webinar.integration_availability'
+
+#: The user annotation key of the set of intids of the webinars the user
+#: registered for.
+USER_REGISTRATIONS_KEY = 'nti.app.products.webinar.user_registered_webinars'
+
+#: The request environ key of our per-request memo of user registrations.
+USER_REGISTRATIONS_MEMO_KEY = 'nti.app.products.webinar.user_registrations_memo'
+
 logger = __import__('logging').getLogger(__name__)
 
 
@@ -43,6 +67,81 @@ def webinar_to_auth_integration(webinar):
         return result
 
 
+def is_webinar_integration_available(webinar, request=None):
+    """
+    Whether we have an authorized integration for the webinar's organizer,
+    memoized by organizer key for the life of the (current) request.
+    """
+    if request is None:
+        request = get_current_request()
+    memo = None
+    if request is not None:
+        memo = request.environ.setdefault(INTEGRATION_AVAILABILITY_KEY, {})
+        try:
+            return memo[webinar.organizerKey]
+        except KeyError:
+            pass
+    result = webinar_to_auth_integration(webinar) is not None
+    if memo is not None:
+        memo[webinar.organizerKey] = result
+    return result
+
+
+def _get_webinar_intid(webinar):
+    intids = component.queryUtility(IIntIds)
+    if webinar is None or intids is None:
+        return None
+    return intids.queryId(webinar)
+
+
+def get_user_registered_webinar_intids(user, create=False):
+    """
+    Return the (persistent) set of intids of the webinars the user is
+    registered for, or None if we have not recorded any.
+    """
+    annotations = IAnnotations(user, None)
+    if annotations is None:
+        return None
+    try:
+        return annotations[USER_REGISTRATIONS_KEY]
+    except KeyError:
+        if not create:
+            return None
+        result = annotations[USER_REGISTRATIONS_KEY] = LLTreeSet()
+        return result
+
+
+def _get_request_registered_webinar_intids(user, request=None):
+    if request is None:
+        request = get_current_request()
+    memo = None
+    if request is not None:
+        memo = request.environ.setdefault(USER_REGISTRATIONS_MEMO_KEY, {})
+        try:
+            return memo[user.username]
+        except KeyError:
+            pass
+    intids = get_user_registered_webinar_intids(user)
+    result = frozenset(intids) if intids else frozenset()
+    if memo is not None:
+        memo[user.username] = result
+    return result
+
+
+def is_user_registered(user, webinar, request=None):
+    """
+    Whether the user is registered for the webinar, answered from the
+    user's registrations (read once per request) without loading the
+    webinar's registration container. Webinars without an intid are looked
+    up in their container.
+    """
+    intid = _get_webinar_intid(webinar)
+    if intid is not None:
+        return intid in _get_request_registered_webinar_intids(user, request)
+    container = query_webinar_registration_container(webinar)
+    return container is not None and user.username in container
+
+
 @interface.implementer(IWebinarClient)
 @component.adapter(IWebinar)
 def webinar_to_client(webinar):
@@ -55,10 +154,122 @@ def webinar_to_client(webinar):
 class WebinarRegistrationMetadataContainer(CaseInsensitiveCheckingLastModifiedBTreeContainer,
                                            SchemaConfigured):
     """
-    Stores :class:`IWebinarRegistration` objects.
+    Stores :class:`IWebinarRegistration` objects, maintaining an index of
+    registrant key to username.
     """
     createDirectFieldProperties(IWebinarRegistrationMetadataContainer)
 
+    _registrant_index = None
+
+    def _iter_registrants(self):
+        for username, registration in self.items():
+            if registration.registrant_key:
+                yield registration.registrant_key, username
+
+    def index_registrants(self):
+        if self._registrant_index is not None:
+            return False
+        self._registrant_index = OOBTree(self._iter_registrants())
+        self._v_registrant_index = None
+        return True
+
+    def _get_registrant_index(self):
+        # Only on write paths
+        self.index_registrants()
+        self._v_registrant_index = None
+        return self._registrant_index
+
+    def __setitem__(self, key, value):
+        super(WebinarRegistrationMetadataContainer, self).__setitem__(key, value)
+        index = self._get_registrant_index()
+        if value.registrant_key:
+            index[value.registrant_key] = key
+        self._index_user_registration(key)
+
+    def __delitem__(self, key):
+        registrant_key = self[key].registrant_key
+        super(WebinarRegistrationMetadataContainer, self).__delitem__(key)
+        index = self._get_registrant_index()
+        if registrant_key and registrant_key in index:
+            del index[registrant_key]
+        self._index_user_registration(key, registered=False)
+
+    def _username_range(self, prefix=None):
+        # Our (case-insensitive) BTree keys, from the first with the prefix
+        # up to, but excluding, the first key past it
+        data = self._SampleContainer__data
+        if not prefix:
+            return data.keys()
+        prefix = prefix.lower()
+        end = prefix[:-1] + unichr(ord(prefix[-1]) + 1)
+        return data.keys(min=_tx_key_insen(prefix),
+                         max=_tx_key_insen(end),
+                         excludemax=True)
+
+    def iter_usernames(self, prefix=None, reverse=False):
+        keys = self._username_range(prefix)
+        if reverse:
+            # BTree items are walked backwards without being copied
+            keys = reversed(keys)
+        for key in keys:
+            yield key.key
+
+    def count_usernames(self, prefix=None):
+        if not prefix:
+            # Our stored length, rather than walking every bucket
+            return len(self)
+        return len(self._username_range(prefix))
+
+    def get_username(self, registrant_key):
+        index = self._registrant_index
+        if index is None:
+            # Containers our generations have not indexed yet; we do not
+            # write on this (progress fetch) read path, but remember our
+            # scan in this (volatile) object.
+            index = getattr(self, '_v_registrant_index', None)
+            if index is None:
+                index = self._v_registrant_index = dict(self._iter_registrants())
+        return index.get(registrant_key)
+
+    def _index_user_registration(self, username, registered=True, intid=None):
+        if intid is None:
+            intid = _get_webinar_intid(self.__parent__)
+        user = User.get_user(username) if intid is not None else None
+        if user is None:
+            return
+        registered_intids = get_user_registered_webinar_intids(user, create=registered)
+        if registered_intids is None:
+            return
+        if registered:
+            registered_intids.add(intid)
+        elif intid in registered_intids:
+            registered_intids.remove(intid)
+
+    def _index_user_registrations(self, registered):
+        intid = _get_webinar_intid(self.__parent__)
+        if intid is None:
+            return False
+        for username in self.keys():
+            self._index_user_registration(username, registered, intid)
+        return True
+
+    def index_user_registrations(self):
+        return self._index_user_registrations(True)
+
+    def unindex_user_registrations(self):
+        return self._index_user_registrations(False)
+
+
+def query_webinar_registration_container(webinar):
+    """
+    Return the webinar's existing :class:`IWebinarRegistrationMetadataContainer`,
+    or None, without creating it; for read paths.
+    """
+    annotations = IAnnotations(webinar, None)
+    if annotations is None:
+        return None
+    return annotations.get(WEBINAR_REGISTRATION_CONTAINER_KEY)
+
 
 def WebinarRegistrationMetadataContainerFactory(webinar):
     result = None
@@ -73,3 +284,11 @@ def WebinarRegistrationMetadataContainerFactory(webinar):
         result.__parent__ = webinar
         IConnection(webinar).add(result)
     return result
+
+
+@component.adapter(IWebinar, IIntIdRemovedEvent)
+def _on_webinar_removed(webinar, unused_event=None):
+    # Our intid may be reused; drop it from our registrants' indexes
+    container = query_webinar_registration_container(webinar)
+    if container is not None:
+        container.unindex_user_registrations()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A cross-process cache of organizer webinar listings, stored in redis.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+import threading
+
+import simplejson
+
+from six import text_type
+
+from six.moves import urllib_parse
+
+from zope import component
+
+from nti.dataserver.interfaces import IRedisClient
+
+#: How long, in seconds, a cached listing is served without revalidation.
+LISTING_CACHE_TTL = 60 * 2
+
+#: How long, in seconds, a listing is retained for conditional revalidation
+#: after it goes stale.
+LISTING_CACHE_RETENTION = 60 * 60 * 24
+
+ALL_WEBINARS_LISTING = u'all'
+UPCOMING_WEBINARS_LISTING = u'upcoming'
+
+LISTING_KINDS = (ALL_WEBINARS_LISTING, UPCOMING_WEBINARS_LISTING)
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class WebinarListingCache(object):
+    """
+    Caches the raw webinar listing json for an organizer, along with the
+    `ETag` it was served with (if any), so that stale entries can be
+    revalidated with a conditional GET.
+    """
+
+    def __init__(self, organizer_key, redis_client=None,
+                 ttl=LISTING_CACHE_TTL, retention=LISTING_CACHE_RETENTION):
+        self.organizer_key = organizer_key
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.retention = max(retention, ttl)
+
+    def _key_name(self, kind):
+        return 'webinar/listings/%s/%s' % (self.organizer_key, kind)
+
+    def get(self, kind):
+        """
+        Return the cached entry for the given listing kind, fresh or not,
+        or None.
+        """
+        try:
+            value = self.redis_client.get(self._key_name(kind))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error reading webinar listing cache')
+            return None
+        if value is None:
+            return None
+        try:
+            return simplejson.loads(value)
+        except ValueError:
+            return None
+
+    def is_fresh(self, entry, now=None):
+        now = time.time() if now is None else now
+        return now - entry.get('fetched', 0) < self.ttl
+
+    def _set(self, kind, entry):
+        try:
+            self.redis_client.setex(self._key_name(kind),
+                                    time=self.retention,
+                                    value=simplejson.dumps(entry))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error writing webinar listing cache')
+
+    def store(self, kind, data, etag=None):
+        entry = {'data': data,
+                 'etag': etag,
+                 'fetched': time.time()}
+        self._set(kind, entry)
+        return entry
+
+    def touch(self, kind, entry):
+        """
+        Mark a revalidated entry as fresh.
+        """
+        entry['fetched'] = time.time()
+        self._set(kind, entry)
+        return entry
+
+    def invalidate(self, kinds=LISTING_KINDS):
+        try:
+            self.redis_client.delete(*[self._key_name(x) for x in kinds])
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error invalidating webinar listing cache')
+
+
+def get_listing_cache(organizer_key):
+    """
+    Return a :class:`WebinarListingCache` for the organizer, or None if we
+    have no redis.
+    """
+    redis_client = component.queryUtility(IRedisClient)
+    if redis_client is None or not organizer_key:
+        return None
+    return WebinarListingCache(organizer_key, redis_client)
+
+
+def invalidate_webinar_listings(organizer_key):
+    """
+    Drop all cached listings for the organizer.
+    """
+    cache = get_listing_cache(organizer_key)
+    if cache is not None:
+        cache.invalidate()
+
+
+def normalize_registration_url(url):
+    """
+    Normalize a registration url for lookup: case-insensitive scheme and
+    host, no trailing slash or fragment, and http treated as https.
+    """
+    if not url:
+        return None
+    parsed = urllib_parse.urlsplit(url.strip())
+    scheme = parsed.scheme.lower()
+    if scheme == 'http':
+        scheme = 'https'
+    return urllib_parse.urlunsplit((scheme,
+                                    parsed.netloc.lower(),
+                                    parsed.path.rstrip('/'),
+                                    parsed.query,
+                                    ''))
+
+
+class WebinarListingIndex(object):
+    """
+    An index of raw webinar listing json by webinarKey and by normalized
+    registrationUrl. Several webinars (e.g. a series) may share a single
+    registration url.
+    """
+
+    def __init__(self, webinars):
+        self.by_key = {}
+        self.by_url = {}
+        for webinar in webinars or ():
+            key = webinar.get('webinarKey')
+            if key is not None:
+                self.by_key[text_type(key)] = webinar
+            url = normalize_registration_url(webinar.get('registrationUrl'))
+            if url:
+                self.by_url.setdefault(url, []).append(webinar)
+
+    def lookup(self, webinar_filter):
+        """
+        Return the raw webinars matching the given webinarKey or
+        registrationUrl.
+        """
+        webinar = self.by_key.get(text_type(webinar_filter))
+        if webinar is not None:
+            return [webinar]
+        url = normalize_registration_url(webinar_filter)
+        return list(self.by_url.get(url, ()))
+
+
+_listing_indexes = {}
+_listing_indexes_lock = threading.Lock()
+
+
+def get_listing_index(organizer_key, kind, entry):
+    """
+    Return the (per-process) :class:`WebinarListingIndex` for the given
+    cached listing entry, building it only when the entry has changed.
+    """
+    version = (entry.get('fetched'), entry.get('etag'))
+    key = (organizer_key, kind)
+    with _listing_indexes_lock:
+        cached = _listing_indexes.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    result = WebinarListingIndex(entry.get('data'))
+    with _listing_indexes_lock:
+        _listing_indexes[key] = (version, result)
+    return result
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A circuit breaker around GOTO API calls, shared per organizer across
+processes through redis.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+import threading
+
+from zope import component
+
+from nti.app.products.webinar import metrics
+
+from nti.app.products.webinar.interfaces import WebinarCircuitOpenError
+
+from nti.dataserver.interfaces import IRedisClient
+
+#: The number of failures, within the failure window, that opens the circuit.
+FAILURE_THRESHOLD = 5
+
+#: The window, in seconds, over which failures are counted.
+FAILURE_WINDOW = 60
+
+#: How long, in seconds, the circuit stays open before a trial call.
+RESET_TIMEOUT = 30
+
+#: How long, in seconds, a trial call holds the half-open circuit.
+TRIAL_TIMEOUT = 60
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class _LocalCircuitStore(object):
+    """
+    In-process circuit state, used when redis is not available.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.failures_expire = 0
+        self.opened_until = None
+        self.trial_until = 0
+
+    def get(self):
+        with self._lock:
+            if self.failures_expire < time.time():
+                self.failures = 0
+            return self.failures, self.opened_until
+
+    def incr_failure(self, window):
+        with self._lock:
+            now = time.time()
+            if self.failures_expire < now:
+                self.failures = 0
+            self.failures += 1
+            self.failures_expire = now + window
+            return self.failures
+
+    def open(self, until):
+        with self._lock:
+            self.opened_until = until
+            self.trial_until = 0
+
+    def close(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_until = None
+            self.trial_until = 0
+
+    def try_trial(self, timeout):
+        with self._lock:
+            now = time.time()
+            if self.trial_until > now:
+                return False
+            self.trial_until = now + timeout
+            return True
+
+
+class _RedisCircuitStore(object):
+    """
+    Circuit state in redis: a hash of failure count and open-until time,
+    plus a trial key held by the single half-open trial call.
+    """
+
+    def __init__(self, redis_client, key):
+        self.redis_client = redis_client
+        self.key = key
+        self.trial_key = '%s/trial' % key
+
+    def get(self):
+        failures, opened_until = self.redis_client.hmget(self.key,
+                                                         'failures',
+                                                         'opened_until')
+        return (int(failures or 0),
+                float(opened_until) if opened_until else None)
+
+    def incr_failure(self, window):
+        pipe = self.redis_client.pipeline()
+        pipe.hincrby(self.key, 'failures', 1)
+        pipe.expire(self.key, window + RESET_TIMEOUT + TRIAL_TIMEOUT)
+        return pipe.execute()[0]
+
+    def open(self, until):
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self.key, 'opened_until', repr(until))
+        pipe.expire(self.key, FAILURE_WINDOW + RESET_TIMEOUT + TRIAL_TIMEOUT)
+        pipe.delete(self.trial_key)
+        pipe.execute()
+
+    def close(self):
+        self.redis_client.delete(self.key, self.trial_key)
+
+    def try_trial(self, timeout):
+        return bool(self.redis_client.set(self.trial_key, '1',
+                                          nx=True, px=int(timeout * 1000)))
+
+
+_local_stores = {}
+_local_stores_lock = threading.Lock()
+
+
+def _get_local_store(organizer_key):
+    with _local_stores_lock:
+        result = _local_stores.get(organizer_key)
+        if result is None:
+            result = _local_stores[organizer_key] = _LocalCircuitStore()
+        return result
+
+
+def reset_local_circuits():
+    """
+    Drop all in-process circuit state (e.g. in tests).
+    """
+    with _local_stores_lock:
+        _local_stores.clear()
+
+
+class CircuitTicket(object):
+    """
+    What :meth:`OrganizerCircuitBreaker.before_call` saw, to be handed back
+    with the outcome of the call.
+    """
+
+    __slots__ = ('dirty', 'trial')
+
+    def __init__(self, dirty=False, trial=False):
+        self.dirty = dirty
+        self.trial = trial
+
+
+class OrganizerCircuitBreaker(object):
+    """
+    Fails calls for an organizer fast, with :class:`WebinarCircuitOpenError`,
+    once `failure_threshold` calls have failed within the failure window.
+    After `reset_timeout` a single trial call is let through (half-open);
+    its success closes the circuit and its failure re-opens it.
+
+    Errors talking to redis never block calls.
+    """
+
+    def __init__(self, organizer_key, redis_client=None,
+                 failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT):
+        self.organizer_key = organizer_key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        if redis_client is not None:
+            self.store = _RedisCircuitStore(redis_client,
+                                            'webinar/circuit/%s' % organizer_key)
+        else:
+            self.store = _get_local_store(organizer_key)
+
+    def before_call(self):
+        """
+        Return a :class:`CircuitTicket` if the call may proceed, or raise
+        :class:`WebinarCircuitOpenError`.
+        """
+        try:
+            failures, opened_until = self.store.get()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error reading webinar circuit state')
+            return CircuitTicket()
+        ticket = CircuitTicket(dirty=bool(failures or opened_until))
+        if opened_until is not None:
+            now = time.time()
+            retry_after = max(0, opened_until - now)
+            if not retry_after:
+                try:
+                    ticket.trial = self.store.try_trial(TRIAL_TIMEOUT)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception('Error acquiring webinar circuit trial')
+                    ticket.trial = True
+            if not ticket.trial:
+                metrics.incr('circuit.rejected')
+                raise WebinarCircuitOpenError('Webinar API unavailable for organizer (%s)'
+                                              % self.organizer_key,
+                                              retry_after=retry_after or self.reset_timeout)
+            metrics.incr('circuit.trial')
+        return ticket
+
+    def record_success(self, ticket):
+        if not ticket.dirty:
+            return
+        try:
+            self.store.close()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error closing webinar circuit')
+            return
+        if ticket.trial:
+            logger.info('Webinar API circuit closed (%s)', self.organizer_key)
+            metrics.incr('circuit.closed')
+
+    def record_failure(self, ticket):
+        try:
+            failures = self.store.incr_failure(FAILURE_WINDOW)
+            if ticket.trial or failures >= self.failure_threshold:
+                self.store.open(time.time() + self.reset_timeout)
+            else:
+                return
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error recording webinar circuit failure')
+            return
+        logger.warn('Webinar API circuit opened (%s) (failures=%s)',
+                    self.organizer_key, failures)
+        metrics.incr('circuit.opened')
+
+
+def get_circuit_breaker(organizer_key):
+    """
+    Return an :class:`OrganizerCircuitBreaker` for the organizer, shared
+    through redis if we have it.
+    """
+    return OrganizerCircuitBreaker(organizer_key,
+                                   component.queryUtility(IRedisClient))
@@ -8,26 +8,99 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import copy
+import time
+import threading
+
 import requests
 
+from six.moves import urllib_parse
+
 from zope import component
 from zope import interface
 
 from zope.cachedescriptors.property import Lazy
 
+from nti.app.products.webinar.cache import ALL_WEBINARS_LISTING
+from nti.app.products.webinar.cache import UPCOMING_WEBINARS_LISTING
+
+from nti.app.products.webinar.cache import WebinarListingIndex
+
+from nti.app.products.webinar.cache import get_listing_cache
+from nti.app.products.webinar.cache import get_listing_index
+
+from nti.app.products.webinar import metrics
+
+from nti.app.products.webinar.client_models import WebinarSummary
+
+from nti.app.products.webinar.circuit import get_circuit_breaker
+
+from nti.app.products.webinar.http_pool import DEFAULT_TIMEOUT
+
+from nti.app.products.webinar.http_pool import get_http_session
+
 from nti.app.products.webinar.interfaces import IWebinar
 from nti.app.products.webinar.interfaces import IWebinarClient
 from nti.app.products.webinar.interfaces import IWebinarCollection
 from nti.app.products.webinar.interfaces import WebinarClientError
+from nti.app.products.webinar.interfaces import WebinarRateLimitError
 from nti.app.products.webinar.interfaces import IUserWebinarProgress
 from nti.app.products.webinar.interfaces import WebinarRegistrationError
+from nti.app.products.webinar.interfaces import WebinarUnauthorizedError
 from nti.app.products.webinar.interfaces import IWebinarRegistrationFields
 from nti.app.products.webinar.interfaces import IWebinarRegistrationMetadata
 from nti.app.products.webinar.interfaces import IGoToWebinarAuthorizedIntegration
 
+from nti.app.products.webinar.ratelimit import MAX_RETRIES
+
+from nti.app.products.webinar.ratelimit import backoff_seconds
+from nti.app.products.webinar.ratelimit import get_rate_limiter
+from nti.app.products.webinar.ratelimit import retry_after_seconds
+
+from nti.app.products.webinar.utils import concurrent_map
+from nti.app.products.webinar.utils import iter_json_array
+from nti.app.products.webinar.utils import retry_unauthorized
+
+#: The default page size when iterating webinars.
+DEFAULT_PAGE_SIZE = 100
+
+#: The chunk size, in bytes, when streaming responses.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+#: The number of registrations submitted concurrently in a bulk registration.
+DEFAULT_REGISTRATION_WORKERS = 4
+
+#: Server errors on which (idempotent) GETs are retried.
+RETRYABLE_STATUS_CODES = (500, 502, 503, 504)
+
 logger = __import__('logging').getLogger(__name__)
 
 
+def _format_time(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class WebinarRegistrationResult(object):
+    """
+    The outcome of registering a single user in a bulk registration.
+    """
+
+    REGISTERED = u'Registered'
+    ALREADY_REGISTERED = u'AlreadyRegistered'
+    INVALID = u'ValidationError'
+    FAILED = u'Error'
+
+    def __init__(self, username, status, metadata=None, error=None):
+        self.username = username
+        self.status = status
+        self.metadata = metadata
+        self.error = error
+
+    @property
+    def success(self):
+        return self.metadata is not None
+
+
 @component.adapter(IGoToWebinarAuthorizedIntegration)
 @interface.implementer(IWebinarClient)
 class GoToWebinarClient(object):
@@ -54,38 +127,132 @@ class GoToWebinarClient(object):
 
     def __init__(self, authorized_integration):
         self.authorized_integration = authorized_integration
+        # Only this thread may refresh our (persistent) integration's tokens
+        self._owner_thread = threading.current_thread()
 
     @Lazy
     def _access_token(self):
         return self.authorized_integration.access_token
 
+    @Lazy
+    def _rate_limiter(self):
+        return get_rate_limiter(self.authorized_integration.organizer_key)
+
+    @Lazy
+    def _circuit_breaker(self):
+        return get_circuit_breaker(self.authorized_integration.organizer_key)
+
+    @Lazy
+    def _listing_cache(self):
+        return get_listing_cache(self.authorized_integration.organizer_key)
+
+    @property
+    def _can_refresh_token(self):
+        return threading.current_thread() is self._owner_thread
+
     def _update_access_token(self):
         result = self.authorized_integration.update_tokens(self._access_token)
         self._access_token = result
 
-    def _make_call(self, url, post_data=None, delete=False, acceptable_return_codes=None):
+    def refresh_access_token(self):
+        if not self._can_refresh_token:
+            raise WebinarUnauthorizedError('Cannot refresh webinar access token off of its owning thread.')
+        self._update_access_token()
+
+    def _make_call(self, url, post_data=None, delete=False,
+                   acceptable_return_codes=None, headers=None, stream=False):
         if not acceptable_return_codes:
             acceptable_return_codes = (200,)
         url = '%s%s' % (self.GOTO_BASE_URL, url)
 
+        session = get_http_session()
+
         def _do_make_call():
             access_header = 'Bearer %s' % self._access_token
+            call_headers = dict(headers or ())
+            call_headers['Authorization'] = access_header
             if post_data:
-                return requests.post(url,
-                                     json=post_data,
-                                     headers={'Authorization': access_header,
-                                              'Accept': 'application/json'})
+                call_headers['Accept'] = 'application/json'
+                return session.post(url,
+                                    json=post_data,
+                                    headers=call_headers,
+                                    timeout=DEFAULT_TIMEOUT)
             elif delete:
-                return requests.delete(url,
-                                       headers={'Authorization': access_header})
+                return session.delete(url,
+                                      headers=call_headers,
+                                      timeout=DEFAULT_TIMEOUT)
             else:
-                return requests.get(url,
-                                    headers={'Authorization': access_header})
-        response = _do_make_call()
-        if response.status_code in (401, 403):
-            # Ok, expired token, refresh and try again.
-            self._update_access_token()
-            response = _do_make_call()
+                return session.get(url,
+                                   headers=call_headers,
+                                   stream=stream,
+                                   timeout=DEFAULT_TIMEOUT)
+        # Only idempotent calls are retried on errors; any call may be
+        # retried when throttled, since the API did not process it.
+        idempotent = not post_data and not delete
+        refreshed = False
+        attempt = 0
+        # A single circuit ticket, and outcome, per call, however many times
+        # we retry it; a half-open trial must not be rejected by its own
+        # retry, nor one flaky call count as many failures.
+        ticket = self._circuit_breaker.before_call()
+        failed = None
+        try:
+            while True:
+                self._rate_limiter.acquire()
+                try:
+                    response = _do_make_call()
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    failed = True
+                    if not idempotent or attempt >= MAX_RETRIES:
+                        logger.warn('Error while making webinar API call (%s) (%s)',
+                                    url, e)
+                        raise WebinarClientError(str(e))
+                    attempt += 1
+                    metrics.incr('client.retry')
+                    time.sleep(backoff_seconds(attempt))
+                    continue
+                failed = response.status_code >= 500
+
+                if response.status_code in (401, 403) and not refreshed:
+                    # Ok, expired token, refresh and try again.
+                    response.close()
+                    if not self._can_refresh_token:
+                        # Our caller refreshes and retries on its own thread
+                        raise WebinarUnauthorizedError('Webinar access token rejected (%s)'
+                                                       % response.status_code)
+                    self._update_access_token()
+                    refreshed = True
+                    continue
+
+                if response.status_code == 429:
+                    metrics.incr('client.throttled')
+                    if attempt >= MAX_RETRIES:
+                        logger.warn('Webinar API call throttled (%s) (%s)',
+                                    url, response.text)
+                        raise WebinarRateLimitError(response.text,
+                                                    retry_after=retry_after_seconds(response, attempt + 1))
+                    attempt += 1
+                    # Hold every caller for this organizer; our next acquire
+                    # waits out the block.
+                    self._rate_limiter.block(retry_after_seconds(response, attempt))
+                    response.close()
+                    metrics.incr('client.retry')
+                    continue
+
+                retryable = idempotent and response.status_code in RETRYABLE_STATUS_CODES
+                if retryable and attempt < MAX_RETRIES:
+                    attempt += 1
+                    response.close()
+                    metrics.incr('client.retry')
+                    time.sleep(backoff_seconds(attempt))
+                    continue
+                break
+        finally:
+            # Only calls that reached (or failed to reach) the API count
+            if failed:
+                self._circuit_breaker.record_failure(ticket)
+            elif failed is not None:
+                self._circuit_breaker.record_success(ticket)
 
         if response.status_code not in acceptable_return_codes:
             logger.warn('Error while making webinar API call (%s) (%s) (%s)',
@@ -95,22 +262,111 @@ class GoToWebinarClient(object):
             raise WebinarClientError(response.text)
         return response
 
-    def get_all_webinars(self, raw=False):
+    def _get_listing_entry(self, kind, url, use_cache=True):
+        """
+        Fetch the raw listing json (with its fetch metadata), served from
+        our listing cache when fresh and revalidated (if we have an ETag)
+        when stale.
+        """
+        cache = self._listing_cache if use_cache else None
+        entry = cache.get(kind) if cache is not None else None
+        if entry is not None and cache.is_fresh(entry):
+            return entry
+        headers = None
+        if entry is not None and entry.get('etag'):
+            headers = {'If-None-Match': entry['etag']}
+        response = self._make_call(url,
+                                   headers=headers,
+                                   acceptable_return_codes=(200, 304))
+        if response.status_code == 304 and entry is not None:
+            return cache.touch(kind, entry)
+        data = response.json()
+        etag = response.headers.get('ETag')
+        if cache is not None:
+            return cache.store(kind, data, etag)
+        return {'data': data, 'etag': etag}
+
+    def _get_listing(self, kind, url, use_cache=True):
+        return self._get_listing_entry(kind, url, use_cache)['data']
+
+    def get_all_webinars(self, raw=False, use_cache=True, summary=False):
         url = self.ALL_WEBINARS % self.authorized_integration.organizer_key
-        result = self._make_call(url)
+        result = self._get_listing(ALL_WEBINARS_LISTING, url, use_cache)
         if raw:
-            return result.json()
-        result = IWebinarCollection(result.json())
+            return result
+        if summary:
+            return [WebinarSummary.from_external(x) for x in result or ()]
+        result = IWebinarCollection(result)
         return result.webinars
 
-    def get_upcoming_webinars(self, raw=False):
+    def get_upcoming_webinars(self, raw=False, use_cache=True, summary=False):
         url = self.UPCOMING_WEBINARS % self.authorized_integration.organizer_key
-        result = self._make_call(url)
+        result = self._get_listing(UPCOMING_WEBINARS_LISTING, url, use_cache)
         if raw:
-            return result.json()
-        result = IWebinarCollection(result.json())
+            return result
+        if summary:
+            return [WebinarSummary.from_external(x) for x in result or ()]
+        result = IWebinarCollection(result)
         return result.webinars
 
+    def iter_webinars(self, from_time, to_time, page_size=DEFAULT_PAGE_SIZE, raw=False):
+        """
+        Lazily iterate the organizer's webinars in the given (UTC) time
+        range, a page at a time.
+        """
+        url = self.ALL_WEBINARS % self.authorized_integration.organizer_key
+        page = 0
+        while True:
+            params = {'fromTime': _format_time(from_time),
+                      'toTime': _format_time(to_time),
+                      'page': page,
+                      'size': page_size}
+            response = self._make_call('%s?%s' % (url, urllib_parse.urlencode(params)))
+            data = response.json()
+            if isinstance(data, list):
+                # Unpaged response
+                webinars, total_pages = data, 1
+            else:
+                webinars = (data.get('_embedded') or {}).get('webinars') or ()
+                total_pages = (data.get('page') or {}).get('totalPages')
+            for ext in webinars:
+                yield ext if raw else IWebinar(ext)
+            page += 1
+            if total_pages is not None:
+                if page >= total_pages:
+                    break
+            elif len(webinars) < page_size:
+                break
+
+    def resolve_webinars(self, webinar_filter, summary=False):
+        """
+        Resolve upcoming webinars by webinarKey or registrationUrl. A bare
+        webinar key is fetched directly; otherwise we look in an index of
+        the (cached) upcoming listing.
+        """
+        webinar_filter = webinar_filter.strip()
+        if webinar_filter.isdigit():
+            webinar = self.get_webinar(webinar_filter, raw=summary)
+            if webinar is None:
+                return []
+            if summary:
+                webinar = WebinarSummary.from_external(webinar)
+            return [webinar]
+        organizer_key = self.authorized_integration.organizer_key
+        url = self.UPCOMING_WEBINARS % organizer_key
+        entry = self._get_listing_entry(UPCOMING_WEBINARS_LISTING, url)
+        if 'fetched' in entry:
+            index = get_listing_index(organizer_key,
+                                      UPCOMING_WEBINARS_LISTING,
+                                      entry)
+        else:
+            index = WebinarListingIndex(entry['data'])
+        webinars = index.lookup(webinar_filter)
+        if summary:
+            return [WebinarSummary.from_external(x) for x in webinars]
+        # The index is shared; do not let internalization mutate it.
+        return [IWebinar(copy.deepcopy(x)) for x in webinars]
+
     def get_webinar(self, webinar_key, raw=False):
         url = self.WEBINAR_URL % (self.authorized_integration.organizer_key, webinar_key)
         get_response = self._make_call(url, acceptable_return_codes=(200, 404))
@@ -130,13 +386,25 @@ class GoToWebinarClient(object):
             result = IWebinarRegistrationFields(get_response.json())
         return result
 
-    def register_user(self, user, webinar_key, registration_data):
+    def _post_registrant(self, webinar_key, registration_data):
         url = self.REGISTRANTS % (self.authorized_integration.organizer_key,
                                   webinar_key)
         # 409 if user is already registered
-        response = self._make_call(url,
-                                   post_data=registration_data,
-                                   acceptable_return_codes=(201, 400, 409))
+        return self._make_call(url,
+                               post_data=registration_data,
+                               acceptable_return_codes=(201, 400, 409))
+
+    def _registration_metadata(self, username, webinar_key, data):
+        registrant_key = unicode(data.get('registrantKey'))
+        data = {'join_url': data.get('joinUrl'),
+                'registrant_key': registrant_key,
+                'webinar_key': webinar_key,
+                'organizer_key': self.authorized_integration.organizer_key,
+                'creator': username}
+        return IWebinarRegistrationMetadata(data)
+
+    def register_user(self, user, webinar_key, registration_data):
+        response = self._post_registrant(webinar_key, registration_data)
         if response.status_code == 400:
             raise WebinarRegistrationError(response.json())
 
@@ -145,31 +413,134 @@ class GoToWebinarClient(object):
 
         # We want to return a metadata object on 409 so we can store it if
         # we have not already.
-        data = response.json()
-        creator = user.username
-        registrant_key = unicode(data.get('registrantKey'))
-        data = {'join_url': data.get('joinUrl'),
-                'registrant_key': registrant_key,
-                'webinar_key': webinar_key,
-                'organizer_key': self.authorized_integration.organizer_key,
-                'creator': creator}
-        return IWebinarRegistrationMetadata(data)
+        return self._registration_metadata(user.username,
+                                           webinar_key,
+                                           response.json())
+
+    def register_users(self, webinar_key, registrations,
+                       max_workers=DEFAULT_REGISTRATION_WORKERS):
+        """
+        Register each of the (user, registration_data) `registrations`,
+        submitting up to `max_workers` at a time. Returns a
+        :class:`WebinarRegistrationResult` per user, in order; users that
+        were already registered (409) still get their metadata.
+        """
+        # Only hand plain values to the workers.
+        jobs = [(user.username, data) for user, data in registrations]
+        if not jobs:
+            return []
+        self._access_token  # pylint: disable=pointless-statement
+
+        def _register(job):
+            username, registration_data = job
+            try:
+                response = self._post_registrant(webinar_key, registration_data)
+                return username, response.status_code, response.json()
+            except WebinarUnauthorizedError as e:
+                # Workers may not refresh the token; we retry in this thread
+                return username, None, e
+            except (WebinarClientError, ValueError) as e:
+                logger.warn('Error registering user for webinar (%s) (%s) (%s)',
+                            webinar_key, username, e)
+                return username, None, getattr(e, 'json', None) or str(e)
+            except Exception as e:  # pylint: disable=broad-except
+                # One bad user must not lose the results of the others
+                logger.exception('Unexpected error registering user for webinar (%s) (%s)',
+                                 webinar_key, username)
+                return username, None, str(e)
+
+        registered = concurrent_map(_register, jobs, max_workers)
+        registered = retry_unauthorized(_register, jobs, registered,
+                                        lambda unused_job: self)
+        result = []
+        for username, status_code, data in registered:
+            if status_code is None:
+                result.append(WebinarRegistrationResult(username,
+                                                        WebinarRegistrationResult.FAILED,
+                                                        error=data))
+            elif status_code == 400:
+                result.append(WebinarRegistrationResult(username,
+                                                        WebinarRegistrationResult.INVALID,
+                                                        error=data))
+            else:
+                status = WebinarRegistrationResult.REGISTERED
+                if status_code == 409:
+                    status = WebinarRegistrationResult.ALREADY_REGISTERED
+                try:
+                    metadata = self._registration_metadata(username, webinar_key, data)
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.exception('Invalid registrant for webinar (%s) (%s) (%s)',
+                                     webinar_key, username, data)
+                    result.append(WebinarRegistrationResult(username,
+                                                            WebinarRegistrationResult.FAILED,
+                                                            error=str(e)))
+                    continue
+                result.append(WebinarRegistrationResult(username, status, metadata))
+        return result
 
     def unregister_user(self, webinar_key, registrant_key):
         url = self.REGISTRANT % (self.authorized_integration.organizer_key,
                                  webinar_key,
                                  registrant_key)
+        # 404 if the registrant is already gone
         response = self._make_call(url, delete=True,
                                    acceptable_return_codes=(204, 404))
-        result = response.status_code == 200
+        result = response.status_code in (204, 404)
         return result
 
-    def get_webinar_progress(self, webinar_key):
-        url = self.WEBINAR_PROGRESS % (self.authorized_integration.organizer_key,
+    def get_webinar_sessions(self, webinar_key):
+        """
+        Return the raw session dicts (`sessionKey`, `startTime`, `endTime`,
+        ...) for the past sessions of this webinar, or None if not found.
+        """
+        url = self.WEBINAR_SESSIONS % (self.authorized_integration.organizer_key,
                                        webinar_key)
         get_response = self._make_call(url,
-                                       acceptable_return_codes = (200, 404))
+                                       acceptable_return_codes=(200, 404))
         result = None
         if get_response.status_code != 404:
-            result = [IUserWebinarProgress(x) for x in get_response.json()]
+            result = get_response.json()
+        return result
+
+    def _iter_progress(self, response, session_key=None):
+        """
+        Parse the streamed attendee response a record at a time.
+        """
+        response.encoding = response.encoding or 'utf-8'
+        try:
+            chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE,
+                                           decode_unicode=True)
+            for ext in iter_json_array(chunks):
+                if session_key is not None:
+                    ext.setdefault('sessionKey', session_key)
+                yield IUserWebinarProgress(ext)
+        finally:
+            response.close()
+
+    def _get_progress(self, url, session_key=None, stream=False):
+        get_response = self._make_call(url,
+                                       acceptable_return_codes=(200, 404),
+                                       stream=stream)
+        if get_response.status_code == 404:
+            get_response.close()
+            return None
+        result = self._iter_progress(get_response, session_key)
+        if not stream:
+            result = list(result)
         return result
+
+    def get_session_progress(self, webinar_key, session_key, stream=False):
+        """
+        Return the :class:`IUserWebinarProgress` objects for a single webinar
+        session, or None if not found. If `stream`, the objects are returned
+        lazily as they are downloaded and parsed.
+        """
+        url = self.SESSION_PROGRESS % (self.authorized_integration.organizer_key,
+                                       webinar_key,
+                                       session_key)
+        return self._get_progress(url, session_key, stream)
+
+    def get_webinar_progress(self, webinar_key, stream=False):
+        url = self.WEBINAR_PROGRESS % (self.authorized_integration.organizer_key,
+                                       webinar_key)
+        return self._get_progress(url, stream=stream)
@@ -8,16 +8,23 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+from collections import namedtuple
+
+from six import text_type
+
 from zope import component
 from zope import interface
 
 from zope.annotation.interfaces import IAttributeAnnotatable
 
+from zope.interface.exceptions import Invalid
+
 from zope.container.contained import Contained
 
 from nti.app.products.webinar.interfaces import IWebinar
 from nti.app.products.webinar.interfaces import IWebinarField
 from nti.app.products.webinar.interfaces import IWebinarSession
+from nti.app.products.webinar.interfaces import IWebinarSummary
 from nti.app.products.webinar.interfaces import IWebinarQuestion
 from nti.app.products.webinar.interfaces import IWebinarCollection
 from nti.app.products.webinar.interfaces import IUserWebinarProgress
@@ -28,6 +35,11 @@ from nti.app.products.webinar.interfaces import IWebinarRegistrationMetadata
 
 from nti.dublincore.time_mixins import PersistentCreatedAndModifiedTimeObject
 
+from nti.externalization.datetime import datetime_from_string
+
+from nti.externalization.interfaces import StandardExternalFields
+from nti.externalization.interfaces import IInternalObjectExternalizer
+
 from nti.externalization.internalization import update_from_external_object
 
 from nti.externalization.representation import WithRepr
@@ -42,12 +54,70 @@ from nti.schema.fieldproperty import createDirectFieldProperties
 
 from nti.schema.schema import SchemaConfigured
 
+CLASS = StandardExternalFields.CLASS
+MIMETYPE = StandardExternalFields.MIMETYPE
+
 logger = __import__('logging').getLogger(__name__)
 
 
+class _FastDecodeError(ValueError):
+    """
+    The external object is not in the shape a fast decoder expects.
+    """
+
+
+#: The errors that send a fast decode back to the generic path.
+_FAST_DECODE_ERRORS = (Invalid, ValueError, TypeError, AttributeError)
+
+
+class _FastDecoder(object):
+    """
+    A precompiled decoder building `factory` objects directly from a known
+    GOTO json shape, bypassing the generic internalization machinery. Only
+    the given field `names` of `iface` are read, each passed through an
+    optional converter and set (and so validated) through the object's field
+    properties. Anything unexpected raises one of :data:`_FAST_DECODE_ERRORS`;
+    callers then fall back to :func:`update_from_external_object`, which
+    raises the usual validation errors.
+    """
+
+    def __init__(self, factory, iface, names, converters=None):
+        self.factory = factory
+        converters = converters or {}
+        self.fields = tuple((name, iface[name].required, converters.get(name))
+                            for name in names)
+
+    def __call__(self, ext):
+        obj = self.factory()
+        for name, required, convert in self.fields:
+            value = ext.get(name)
+            if value is not None and convert is not None:
+                value = convert(value)
+            if value is None:
+                if required:
+                    raise _FastDecodeError(name)
+                continue
+            setattr(obj, name, value)
+        return obj
+
+
+def _fast_decode(decoder, ext):
+    """
+    Decode with the fast `decoder`, or return None if `ext` must go through
+    the generic path.
+    """
+    try:
+        return decoder(ext)
+    except _FAST_DECODE_ERRORS:
+        return None
+
+
 @component.adapter(dict)
 @interface.implementer(IWebinarField)
 def _webinar_field_factory(ext):
+    obj = _fast_decode(_webinar_field_decoder, ext)
+    if obj is not None:
+        return obj
     obj = WebinarField()
     update_from_external_object(obj, ext)
     return obj
@@ -56,6 +126,9 @@ def _webinar_field_factory(ext):
 @component.adapter(dict)
 @interface.implementer(IWebinarQuestion)
 def _webinar_question_factory(ext):
+    obj = _fast_decode(_webinar_question_decoder, ext)
+    if obj is not None:
+        return obj
     obj = WebinarQuestion()
     if 'answers' in ext:
         ext['answers'] = [IWebinarQuestionAnswer(x) for x in ext['answers'] or ()]
@@ -66,6 +139,9 @@ def _webinar_question_factory(ext):
 @component.adapter(dict)
 @interface.implementer(IWebinarQuestionAnswer)
 def _webinar_question_answer_factory(ext):
+    obj = _fast_decode(_webinar_question_answer_decoder, ext)
+    if obj is not None:
+        return obj
     obj = WebinarQuestionAnswer()
     update_from_external_object(obj, ext)
     return obj
@@ -74,6 +150,9 @@ def _webinar_question_answer_factory(ext):
 @component.adapter(dict)
 @interface.implementer(IWebinarRegistrationFields)
 def _webinar_registration_fields_factory(ext):
+    obj = _fast_decode(_webinar_registration_fields_decoder, ext)
+    if obj is not None:
+        return obj
     obj = WebinarRegistrationFields()
     ext['fields'] = [IWebinarField(x) for x in ext['fields'] or ()]
     ext['questions'] = [IWebinarQuestion(x) for x in ext['questions'] or ()]
@@ -84,14 +163,26 @@ def _webinar_registration_fields_factory(ext):
 @component.adapter(dict)
 @interface.implementer(IWebinar)
 def _webinar_factory(ext):
+    obj = _fast_decode(_webinar_decoder, ext)
+    if obj is not None:
+        return obj
     obj = Webinar()
     update_from_external_object(obj, ext)
     return obj
 
 
+@component.adapter(IWebinarSummary)
+@interface.implementer(IWebinar)
+def _webinar_summary_to_webinar(summary):
+    return summary.to_webinar()
+
+
 @component.adapter(dict)
 @interface.implementer(IWebinarSession)
 def _webinar_session_factory(ext):
+    obj = _fast_decode(_webinar_session_decoder, ext)
+    if obj is not None:
+        return obj
     obj = WebinarSession()
     update_from_external_object(obj, ext)
     return obj
@@ -118,6 +209,9 @@ def _webinar_registration_metadata_factory(ext):
 @component.adapter(dict)
 @interface.implementer(IUserWebinarAttendance)
 def _user_webinar_attendance_factory(ext):
+    obj = _fast_decode(_user_webinar_attendance_decoder, ext)
+    if obj is not None:
+        return obj
     obj = UserWebinarAttendance()
     update_from_external_object(obj, ext)
     return obj
@@ -126,6 +220,9 @@ def _user_webinar_attendance_factory(ext):
 @component.adapter(dict)
 @interface.implementer(IUserWebinarProgress)
 def _user_webinar_progress_factory(ext):
+    obj = _fast_decode(_user_webinar_progress_decoder, ext)
+    if obj is not None:
+        return obj
     obj = UserWebinarProgress()
     for key in ('registrantKey', 'sessionKey'):
         if key in ext:
@@ -250,3 +347,149 @@ class WebinarRegistrationMetadata(PersistentCreatedAndModifiedTimeObject,
     def ntiid(self):
         # Let's us be linkable
         return to_external_ntiid_oid(self)
+
+
+# Fast decoders
+
+def _to_text(value):
+    return text_type(value)
+
+
+def _to_url(value):
+    return value or None
+
+
+def _to_list_of(decoder):
+    def _convert(values):
+        return [decoder(x) for x in values]
+    return _convert
+
+
+_webinar_field_decoder = \
+    _FastDecoder(WebinarField, IWebinarField,
+                 ('field', 'maxSize', 'required', 'answers'))
+
+_webinar_question_answer_decoder = \
+    _FastDecoder(WebinarQuestionAnswer, IWebinarQuestionAnswer,
+                 ('answerKey', 'answer'))
+
+_webinar_question_decoder = \
+    _FastDecoder(WebinarQuestion, IWebinarQuestion,
+                 ('questionKey', 'maxSize', 'required', 'type',
+                  'question', 'answers'),
+                 {'answers': _to_list_of(_webinar_question_answer_decoder)})
+
+_webinar_registration_fields_decoder = \
+    _FastDecoder(WebinarRegistrationFields, IWebinarRegistrationFields,
+                 ('fields', 'questions'),
+                 {'fields': _to_list_of(_webinar_field_decoder),
+                  'questions': _to_list_of(_webinar_question_decoder)})
+
+_webinar_session_decoder = \
+    _FastDecoder(WebinarSession, IWebinarSession,
+                 ('startTime', 'endTime'),
+                 {'startTime': datetime_from_string,
+                  'endTime': datetime_from_string})
+
+_webinar_decoder = \
+    _FastDecoder(Webinar, IWebinar,
+                 ('description', 'subject', 'organizerKey', 'webinarKey',
+                  'numberOfRegistrants', 'timeZone', 'registrationUrl',
+                  'webinarID', 'inSession', 'times'),
+                 {'organizerKey': _to_text,
+                  'webinarKey': _to_text,
+                  'registrationUrl': _to_url,
+                  'times': _to_list_of(_webinar_session_decoder)})
+
+_user_webinar_attendance_decoder = \
+    _FastDecoder(UserWebinarAttendance, IUserWebinarAttendance,
+                 ('joinTime', 'leaveTime'),
+                 {'joinTime': datetime_from_string,
+                  'leaveTime': datetime_from_string})
+
+_user_webinar_progress_decoder = \
+    _FastDecoder(UserWebinarProgress, IUserWebinarProgress,
+                 ('registrantKey', 'sessionKey', 'email', 'attendance',
+                  'attendanceTimeInSeconds'),
+                 {'registrantKey': _to_text,
+                  'sessionKey': _to_text,
+                  'attendance': _to_list_of(_user_webinar_attendance_decoder)})
+
+#: A webinar session in a :class:`WebinarSummary`.
+WebinarSessionSummary = namedtuple('WebinarSessionSummary',
+                                   ('startTime', 'endTime'))
+
+
+@interface.implementer(IWebinarSummary, IInternalObjectExternalizer)
+class WebinarSummary(object):
+    """
+    A read-only, non-persistent :class:`IWebinarSummary`, built directly
+    from the API json without schema validation. It externalizes like a
+    :class:`Webinar`; adapt it to :class:`IWebinar` to store it.
+    """
+
+    __slots__ = ('webinarKey', 'organizerKey', 'subject', 'description',
+                 'timeZone', 'registrationUrl', 'webinarID', 'inSession',
+                 'numberOfRegistrants', 'times')
+
+    mimeType = mime_type = Webinar.mimeType
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            object.__setattr__(self, name, kwargs.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is read-only' % type(self).__name__)
+
+    __delattr__ = __setattr__
+
+    @classmethod
+    def from_external(cls, ext):
+        times = tuple(WebinarSessionSummary(x.get('startTime'), x.get('endTime'))
+                      for x in ext.get('times') or ())
+        return cls(webinarKey=text_type(ext.get('webinarKey')),
+                   organizerKey=text_type(ext.get('organizerKey')),
+                   subject=ext.get('subject'),
+                   description=ext.get('description'),
+                   timeZone=ext.get('timeZone'),
+                   registrationUrl=ext.get('registrationUrl') or None,
+                   webinarID=ext.get('webinarID'),
+                   inSession=ext.get('inSession'),
+                   numberOfRegistrants=ext.get('numberOfRegistrants'),
+                   times=times)
+
+    def _to_external(self):
+        result = dict((name, getattr(self, name)) for name in self.__slots__)
+        result['times'] = [{CLASS: 'WebinarSession',
+                            MIMETYPE: WebinarSession.mimeType,
+                            'startTime': x.startTime,
+                            'endTime': x.endTime} for x in self.times]
+        return result
+
+    def toExternalObject(self, *unused_args, **unused_kwargs):
+        result = self._to_external()
+        result[CLASS] = 'Webinar'
+        result[MIMETYPE] = self.mimeType
+        return result
+
+    def to_webinar(self):
+        """
+        Promote to a (validated) persistent :class:`Webinar`.
+        """
+        return _webinar_factory(self._to_external())
+
+    def __eq__(self, other):
+        try:
+            return self.webinarKey == other.webinarKey
+        except AttributeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.webinarKey)
+
+    def __repr__(self):
+        return '<%s %s %r>' % (type(self).__name__, self.webinarKey, self.subject)
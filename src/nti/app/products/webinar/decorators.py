@@ -23,11 +23,12 @@ from nti.app.products.webinar import VIEW_UPCOMING_WEBINARS
 from nti.app.products.webinar import VIEW_WEBINAR_UNREGISTER
 from nti.app.products.webinar import VIEW_WEBINAR_REGISTRATION_FIELDS
 
+from nti.app.products.webinar.adapters import is_user_registered
+from nti.app.products.webinar.adapters import is_webinar_integration_available
+
 from nti.app.products.webinar.interfaces import IWebinar
-from nti.app.products.webinar.interfaces import IWebinarClient
 from nti.app.products.webinar.interfaces import IWebinarIntegration
 from nti.app.products.webinar.interfaces import IWebinarAuthorizedIntegration
-from nti.app.products.webinar.interfaces import IWebinarRegistrationMetadataContainer
 
 from nti.app.renderers.decorators import AbstractAuthenticatedRequestAwareDecorator
 
@@ -98,13 +99,11 @@ class _WebinarDecorator(AbstractAuthenticatedRequestAwareDecorator):
         # have an integration, but we could not get progress back.
         webinar = self._get_webinar(context)
         return super(_WebinarDecorator, self)._predicate(webinar, unused_result) \
-           and has_permission(ACT_READ, webinar, self.request) \
-           and IWebinarClient(webinar, None) is not None
+           and is_webinar_integration_available(webinar, self.request) \
+           and has_permission(ACT_READ, webinar, self.request)
 
     def is_registered(self, webinar):
-        # pylint: disable=no-member
-        reg_container = IWebinarRegistrationMetadataContainer(webinar)
-        return self.remoteUser.username in reg_container
+        return is_user_registered(self.remoteUser, webinar, self.request)
 
     def _get_webinar(self, context):
         """
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Build the registrant key index of existing webinar registration containers.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from nti.app.products.webinar.adapters import query_webinar_registration_container
+
+from nti.app.products.webinar.generations.utils import iter_webinars
+from nti.app.products.webinar.generations.utils import dataserver_site
+
+generation = 1
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def index_registrants(webinars):
+    """
+    Index the registrants of each of the webinars' registration containers,
+    returning how many containers were indexed.
+    """
+    result = 0
+    for webinar in webinars:
+        container = query_webinar_registration_container(webinar)
+        if container is not None and container.index_registrants():
+            result += 1
+    return result
+
+
+def do_evolve(context, generation=generation):
+    with dataserver_site(context):
+        count = index_registrants(iter_webinars(connection=context.connection))
+    logger.info('Evolution %s done (%s registration containers indexed).',
+                generation, count)
+
+
+def evolve(context):
+    """
+    Evolve to generation 1 by indexing registrants of existing webinar
+    registration containers.
+    """
+    do_evolve(context)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Install the webinar progress schedule in the dataserver site, and schedule
+existing webinars.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from nti.app.products.webinar.generations.utils import iter_webinars
+from nti.app.products.webinar.generations.utils import dataserver_site
+
+from nti.app.products.webinar.scheduling import reschedule_webinar_progress
+from nti.app.products.webinar.scheduling import install_webinar_progress_schedule
+
+generation = 2
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def schedule_webinars(webinars):
+    """
+    Schedule the progress updates of each of the webinars, returning how
+    many were scheduled.
+    """
+    result = 0
+    for webinar in webinars:
+        reschedule_webinar_progress(webinar)
+        result += 1
+    return result
+
+
+def do_evolve(context, generation=generation):
+    with dataserver_site(context) as ds_folder:
+        install_webinar_progress_schedule(ds_folder.getSiteManager())
+        count = schedule_webinars(iter_webinars(connection=context.connection))
+    logger.info('Evolution %s done (%s webinars scheduled).',
+                generation, count)
+
+
+def evolve(context):
+    """
+    Evolve to generation 2 by installing our progress schedule.
+    """
+    do_evolve(context)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Record the registrations of existing webinars in the per-user index of
+registered webinars.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from nti.app.products.webinar.adapters import query_webinar_registration_container
+
+from nti.app.products.webinar.generations.utils import iter_webinars
+from nti.app.products.webinar.generations.utils import dataserver_site
+
+generation = 3
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def index_user_registrations(webinars):
+    """
+    Index the registrations of each of the webinars by user, returning how
+    many registration containers were indexed.
+    """
+    result = 0
+    for webinar in webinars:
+        container = query_webinar_registration_container(webinar)
+        if container is not None and container.index_user_registrations():
+            result += 1
+    return result
+
+
+def do_evolve(context, generation=generation):
+    with dataserver_site(context):
+        count = index_user_registrations(iter_webinars(connection=context.connection))
+    logger.info('Evolution %s done (%s registration containers indexed by user).',
+                generation, count)
+
+
+def evolve(context):
+    """
+    Evolve to generation 3 by indexing the registrations of existing
+    webinars by user.
+    """
+    do_evolve(context)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Install the webinar organizer index and index existing webinars in it.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from nti.app.products.webinar.generations.utils import iter_webinars
+from nti.app.products.webinar.generations.utils import dataserver_site
+
+from nti.app.products.webinar.organizers import index_webinar_organizer
+from nti.app.products.webinar.organizers import install_webinar_organizer_index
+
+generation = 4
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def index_webinar_organizers(webinars):
+    """
+    Index each of the webinars by organizer, returning how many were
+    indexed.
+    """
+    result = 0
+    for webinar in webinars:
+        index_webinar_organizer(webinar)
+        result += 1
+    return result
+
+
+def do_evolve(context, generation=generation):
+    with dataserver_site(context) as ds_folder:
+        install_webinar_organizer_index(ds_folder.getSiteManager())
+        count = index_webinar_organizers(iter_webinars(connection=context.connection))
+    logger.info('Evolution %s done (%s webinars indexed by organizer).',
+                generation, count)
+
+
+def evolve(context):
+    """
+    Evolve to generation 4 by installing the webinar organizer index and
+    indexing existing webinars by organizer.
+    """
+    do_evolve(context)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from zope import interface
+
+from zope.generations.generations import SchemaManager
+
+from zope.generations.interfaces import IInstallableSchemaManager
+
+from nti.app.products.webinar.generations import evolve1
+from nti.app.products.webinar.generations import evolve2
+from nti.app.products.webinar.generations import evolve3
+from nti.app.products.webinar.generations import evolve4
+
+generation = 4
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IInstallableSchemaManager)
+class _WebinarSchemaManager(SchemaManager):
+    """
+    A schema manager that we can register as a utility in ZCML.
+    """
+
+    def __init__(self):
+        super(_WebinarSchemaManager, self).__init__(generation=generation,
+                                                    minimum_generation=generation,
+                                                    package_name='nti.app.products.webinar.generations')
+
+    def install(self, context):
+        evolve(context)
+
+
+def evolve(context):
+    """
+    Databases that predate us are installed at our current generation, so
+    we run each of our (idempotent) evolutions.
+    """
+    evolve1.do_evolve(context)
+    evolve2.do_evolve(context)
+    evolve3.do_evolve(context)
+    evolve4.do_evolve(context)
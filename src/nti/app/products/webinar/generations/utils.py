@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Helpers for our generations.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from contextlib import contextmanager
+
+from zope import component
+from zope import interface
+
+from zope.component.hooks import setHooks
+from zope.component.hooks import site as current_site
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.products.webinar.interfaces import IWebinar
+
+from nti.dataserver.interfaces import IDataserver
+from nti.dataserver.interfaces import IOIDResolver
+
+#: How many objects we walk between ghosting our object cache.
+CACHE_GC_INTERVAL = 1000
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IDataserver)
+class MockDataserver(object):
+
+    root = None
+
+    def get_by_oid(self, oid, ignore_creator=False):
+        resolver = component.queryUtility(IOIDResolver)
+        if resolver is None:
+            logger.warn("Using dataserver without a proper ISiteManager.")
+        else:
+            return resolver.get_object_by_oid(oid, ignore_creator=ignore_creator)
+        return None
+
+
+@contextmanager
+def dataserver_site(context):
+    """
+    Run the body of an evolution within the dataserver folder site, with a
+    mock dataserver registered, yielding the dataserver folder.
+    """
+    setHooks()
+    conn = context.connection
+    ds_folder = conn.root()['nti.dataserver']
+    mock_ds = MockDataserver()
+    mock_ds.root = ds_folder
+    component.provideUtility(mock_ds, IDataserver)
+    try:
+        with current_site(ds_folder):
+            assert component.getSiteManager() == ds_folder.getSiteManager(), \
+                   "Hooks not installed?"
+            yield ds_folder
+    finally:
+        component.getGlobalSiteManager().unregisterUtility(mock_ds, IDataserver)
+
+
+def iter_webinars(intids=None, connection=None):
+    """
+    Yield every :class:`IWebinar` registered with our intids, periodically
+    ghosting our object cache so that walking large sites stays bounded.
+    """
+    intids = component.getUtility(IIntIds) if intids is None else intids
+    for count, uid in enumerate(intids, 1):
+        obj = intids.queryObject(uid)
+        if IWebinar.providedBy(obj):
+            yield obj
+        if connection is not None and count % CACHE_GC_INTERVAL == 0:
+            connection.cacheGC()
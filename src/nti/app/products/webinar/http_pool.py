@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A process-wide, pooled HTTP session for talking to the GOTO API.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The number of per-host connection pools to keep around.
+DEFAULT_POOL_CONNECTIONS = 4
+
+#: The max number of keep-alive connections held per host.
+DEFAULT_POOL_MAXSIZE = 16
+
+#: Whether callers should block when all connections to a host are in use,
+#: rather than opening (and then discarding) an overflow connection.
+DEFAULT_POOL_BLOCK = False
+
+#: The seconds to wait to connect to the API.
+DEFAULT_CONNECT_TIMEOUT = 3.05
+
+#: The seconds to wait between bytes read from the API.
+DEFAULT_READ_TIMEOUT = 30
+
+#: The (connect, read) timeout for every call; sessions have no default.
+DEFAULT_TIMEOUT = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+
+_pool_config = {'pool_connections': DEFAULT_POOL_CONNECTIONS,
+                'pool_maxsize': DEFAULT_POOL_MAXSIZE,
+                'pool_block': DEFAULT_POOL_BLOCK}
+
+
+def _create_session():
+    session = requests.Session()
+    # Retries are decided by our callers, never by the pool.
+    adapter = HTTPAdapter(max_retries=0, **_pool_config)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def get_http_session():
+    """
+    Return the shared :class:`requests.Session`, creating it if necessary.
+    Connections are kept alive and reused across requests (and threads).
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def configure_http_session(pool_connections=DEFAULT_POOL_CONNECTIONS,
+                           pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                           pool_block=DEFAULT_POOL_BLOCK):
+    """
+    Set the pool sizes used by the shared session. Any existing session is
+    closed and a new one is built on next use.
+    """
+    global _session
+    with _session_lock:
+        _pool_config.update(pool_connections=pool_connections,
+                            pool_maxsize=pool_maxsize,
+                            pool_block=pool_block)
+        old_session, _session = _session, None
+    if old_session is not None:
+        old_session.close()
+
+
+def reset_http_session():
+    """
+    Close and drop the shared session (e.g. after fork or in tests).
+    """
+    configure_http_session(**_pool_config)
+
+
+def get_http_pool_stats():
+    """
+    Return a dict of connection pool statistics, keyed by
+    `scheme://host:port`. `reused` counts requests that did not have to
+    open a new connection.
+    """
+    result = {}
+    session = _session
+    if session is None:
+        return result
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_made = pool.num_requests
+            connections = pool.num_connections
+            name = '%s://%s:%s' % (pool.scheme, pool.host, pool.port)
+            result[name] = {'requests': requests_made,
+                            'connections': connections,
+                            'reused': max(0, requests_made - connections),
+                            'maxsize': adapter._pool_maxsize}
+    return result
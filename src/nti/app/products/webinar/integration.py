@@ -23,7 +23,9 @@ from nti.app.products.integration.integration import AbstractOAuthAuthorizedInte
 from nti.app.products.webinar.interfaces import IWebinarIntegration
 from nti.app.products.webinar.interfaces import IGoToWebinarAuthorizedIntegration
 
-from nti.app.products.webinar.utils import get_auth_tokens
+from nti.app.products.webinar.tokens import TokenStore
+
+from nti.app.products.webinar.tokens import maybe_refresh_in_background
 
 from nti.dataserver.interfaces import IRedisClient
 
@@ -86,20 +88,36 @@ class GoToWebinarAuthorizedIntegration(AbstractOAuthAuthorizedIntegration,
     access_token_expiry = 60 * 120
     # 60 days for refresh token
     refresh_token_expiry = 60 * 60 * 24 * 60
+    # Refresh the access token in the background once it is this far
+    # through its lifetime
+    access_token_refresh_fraction = 0.75
 
     @property
     def _key_base_name(self):
-        intids = component.getUtility(IIntIds)
-        intid = intids.getId(self)
-        return 'webinar/tokens/%s/%s/%s' % (self.account_key, self.organizer_key, intid)
+        # Memoized (volatile) since our intid does not change
+        result = getattr(self, '_v_key_base_name', None)
+        if result is None:
+            intids = component.getUtility(IIntIds)
+            intid = intids.getId(self)
+            result = 'webinar/tokens/%s/%s/%s' % (self.account_key, self.organizer_key, intid)
+            self._v_key_base_name = result
+        return result
+
+    @property
+    def _token_store(self):
+        return TokenStore(self._redis_client,
+                          self._key_base_name,
+                          self.access_token_expiry,
+                          self.refresh_token_expiry,
+                          self.lock_timeout)
 
     @property
     def _access_token_key_name(self):
-        return '%s/%s' % (self._key_base_name, 'access_token')
+        return self._token_store.access_token_key
 
     @property
     def _refresh_token_key_name(self):
-        return '%s/%s' % (self._key_base_name, 'refresh_token')
+        return self._token_store.refresh_token_key
 
     def store_tokens(self, access_token, refresh_token):
         """
@@ -107,12 +125,7 @@ class GoToWebinarAuthorizedIntegration(AbstractOAuthAuthorizedIntegration,
         tokens. This should only be called with appropriate safeguarding of
         concurrency.
         """
-        self._redis_client.setex(self._access_token_key_name,
-                                 time=self.access_token_expiry,
-                                 value=access_token)
-        self._redis_client.setex(self._refresh_token_key_name,
-                                 time=self.refresh_token_expiry,
-                                 value=refresh_token)
+        self._token_store.store_tokens(access_token, refresh_token)
 
     @property
     def _redis_client(self):
@@ -120,9 +133,13 @@ class GoToWebinarAuthorizedIntegration(AbstractOAuthAuthorizedIntegration,
 
     @property
     def access_token(self):
-        result = self._redis_client.get(self._access_token_key_name)
+        token_store = self._token_store
+        result = token_store.get_access_token()
         if result is None:
             result = self.update_tokens()
+        else:
+            maybe_refresh_in_background(token_store,
+                                        self.access_token_refresh_fraction)
         return result
 
     def get_access_token(self):
@@ -131,29 +148,17 @@ class GoToWebinarAuthorizedIntegration(AbstractOAuthAuthorizedIntegration,
     @property
     def refresh_token(self):
         # This should never be None
-        return self._redis_client.get(self._refresh_token_key_name)
+        return self._token_store.get_refresh_token()
 
     def get_refresh_token(self):
         return self.refresh_token
 
     @property
     def _lock(self):
-        return self._redis_client.lock(self._key_base_name,
-                                       self.lock_timeout)
+        return self._token_store.lock()
 
     def update_tokens(self, old_access_token=None):
-        with self._lock:
-            # Someone may beat us; if so, use their new token
-            current_access_token = self._redis_client.get(self._access_token_key_name)
-            if     not current_access_token \
-                or current_access_token == old_access_token:
-                # First one here, update and store
-                access_token, refresh_token = get_auth_tokens(self.refresh_token)
-                self.store_tokens(access_token, refresh_token)
-                result = access_token
-            else:
-                result = current_access_token
-        return result
+        return self._token_store.update_tokens(old_access_token)
 
 
 @interface.implementer(IIntegrationCollectionProvider)
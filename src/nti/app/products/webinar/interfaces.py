@@ -19,6 +19,9 @@ from zope.container.constraints import contains
 from zope.container.interfaces import IContained
 from zope.container.interfaces import IContainer
 
+from zope.interface.interfaces import IObjectEvent
+from zope.interface.interfaces import ObjectEvent
+
 from nti.app.products.integration.interfaces import IIntegration
 from nti.app.products.integration.interfaces import IOAuthAuthorizedIntegration
 
@@ -83,16 +86,37 @@ class IWebinarClient(interface.Interface):
         returning the raw json.
         """
 
-    def get_all_webinars(raw=False):
+    def refresh_access_token():
+        """
+        Refresh our access token. Only the thread that created the client
+        may do so; calls on other threads raise
+        :class:`WebinarUnauthorizedError` when the token is rejected.
+        """
+
+    def get_all_webinars(raw=False, use_cache=True, summary=False):
         """
         Get all webinars for our organizer; optionally
-        returning the raw json.
+        returning the raw json or :class:`IWebinarSummary` objects. Listings
+        may be served from a shared cache unless `use_cache` is False.
         """
 
-    def get_upcoming_webinars(raw=False):
+    def get_upcoming_webinars(raw=False, use_cache=True, summary=False):
         """
         Get all upcoming webinars for our organizer; optionally
-        returning the raw json.
+        returning the raw json or :class:`IWebinarSummary` objects. Listings
+        may be served from a shared cache unless `use_cache` is False.
+        """
+
+    def iter_webinars(from_time, to_time, page_size=100, raw=False):
+        """
+        Lazily iterate the :class:`IWebinar` objects (or raw json) for our
+        organizer in the given time range, fetching a page at a time.
+        """
+
+    def resolve_webinars(webinar_filter, summary=False):
+        """
+        Get the upcoming :class:`IWebinar` (or :class:`IWebinarSummary`)
+        objects matching the given webinarKey or registrationUrl.
         """
 
     def update_webinar(webinar):
@@ -106,9 +130,15 @@ class IWebinarClient(interface.Interface):
         for the given webinar session.
         """
 
-    def get_webinar_sessions(webinar):
+    def get_webinar_sessions(webinar_key):
         """
-        Get all webinar sessions for the given :class:`IWebinar`.
+        Get the raw past webinar sessions for the given webinar key, or None.
+        """
+
+    def get_session_progress(webinar_key, session_key, stream=False):
+        """
+        Get all :class:`IUserWebinarProgress` for a single session of this
+        webinar, or None; optionally as a lazy iterable.
         """
 
     def get_webinar_registrants(webinar):
@@ -126,14 +156,23 @@ class IWebinarClient(interface.Interface):
         Register a user given the registration_data.
         """
 
+    def register_users(webinar_key, registrations, max_workers=4):
+        """
+        Concurrently register each of the (user, registration_data)
+        `registrations`, returning a per-user result (with the
+        :class:`IWebinarRegistrationMetadata`, if registered) in order.
+        """
+
     def unregister_user(webinar_key, registrant_key):
         """
         Unregister the given registrant key.
         """
 
-    def get_webinar_progress(webinar_key):
+    def get_webinar_progress(webinar_key, stream=False):
         """
-        Get all :class:`IUserWebinarProgress` for all sessions of this webinar.
+        Get all :class:`IUserWebinarProgress` for all sessions of this webinar;
+        optionally as a lazy iterable that parses the response as it is
+        downloaded.
         """
 
 
@@ -181,6 +220,35 @@ class IWebinar(IShouldHaveTraversablePath, IAttributeAnnotatable):
                         min_length=1)
 
 
+class IWebinarSummary(interface.Interface):
+    """
+    A compact, read-only and non-persistent view of a webinar, for API
+    results that are only listed and never stored. Session times are kept
+    as the API's (startTime, endTime) strings. Adapt to :class:`IWebinar`
+    to obtain a storable object.
+    """
+
+    webinarKey = interface.Attribute(u"Webinar key")
+
+    organizerKey = interface.Attribute(u"Webinar organizer key")
+
+    subject = interface.Attribute(u"Webinar subject")
+
+    description = interface.Attribute(u"Webinar description")
+
+    timeZone = interface.Attribute(u"Webinar timeZone")
+
+    registrationUrl = interface.Attribute(u"Webinar registrationUrl, or None")
+
+    webinarID = interface.Attribute(u"Webinar webinarID")
+
+    inSession = interface.Attribute(u"Webinar is in session")
+
+    numberOfRegistrants = interface.Attribute(u"Webinar registrant count")
+
+    times = interface.Attribute(u"A tuple of (startTime, endTime) sessions")
+
+
 class IWebinarCollection(interface.Interface):
 
     webinars = ListOrTuple(Object(IWebinar),
@@ -311,6 +379,42 @@ class IWebinarRegistrationMetadataContainer(IContainer):
     """
     contains(IWebinarRegistrationMetadata)
 
+    def get_username(registrant_key):
+        """
+        Return the username registered with the given registrant key, or
+        None.
+        """
+
+    def iter_usernames(prefix=None, reverse=False):
+        """
+        Yield the registered usernames, optionally only those starting with
+        the (case-insensitive) prefix, in (reverse) key order, without
+        loading any registrations.
+        """
+
+    def count_usernames(prefix=None):
+        """
+        Return how many usernames :meth:`iter_usernames` would yield.
+        """
+
+    def index_registrants():
+        """
+        Build our registrant key index, if we do not have one yet; returns
+        whether we did.
+        """
+
+    def index_user_registrations():
+        """
+        Record all registrations in the registered users' per-user index of
+        webinar intids; returns whether we could (our webinar has an intid).
+        """
+
+    def unindex_user_registrations():
+        """
+        Remove all registrations from the registered users' per-user index
+        of webinar intids; returns whether we could.
+        """
+
 
 class WebinarClientError(Exception):
 
@@ -319,6 +423,33 @@ class WebinarClientError(Exception):
         self.json = json
 
 
+class WebinarRateLimitError(WebinarClientError):
+    """
+    The API throttled us, or we would have had to wait too long for our turn.
+    """
+
+    def __init__(self, msg, retry_after=None, json=None):
+        super(WebinarRateLimitError, self).__init__(msg, json)
+        self.retry_after = retry_after
+
+
+class WebinarCircuitOpenError(WebinarClientError):
+    """
+    Calls to the API are failing fast after repeated failures.
+    """
+
+    def __init__(self, msg, retry_after=None, json=None):
+        super(WebinarCircuitOpenError, self).__init__(msg, json)
+        self.retry_after = retry_after
+
+
+class WebinarUnauthorizedError(WebinarClientError):
+    """
+    Our access token was rejected during a call made off of the thread that
+    owns the client, which may not refresh it.
+    """
+
+
 class WebinarRegistrationError(WebinarClientError):
 
     msg = 'Error during webinar registration.'
@@ -365,6 +496,69 @@ class IUserWebinarProgressContainer(IContainer):
     """
     contains(IUserWebinarProgress)
 
+    total_attendance_seconds = interface.Attribute(
+        u"The total seconds attended across sessions")
+
+    sessions_attended = interface.Attribute(
+        u"The number of sessions attended")
+
+    first_join = interface.Attribute(
+        u"The earliest join time, or None")
+
+    last_leave = interface.Attribute(
+        u"The latest leave time, or None")
+
+    attendance_percent = interface.Attribute(
+        u"The percent (0-100) of the webinar's current scheduled time "
+        u"attended, or None if the webinar has no scheduled time")
+
+    has_aggregates = interface.Attribute(
+        u"Whether our attendance aggregates are stored, rather than "
+        u"computed on read (for containers that predate them)")
+
+    def update_aggregates():
+        """
+        Recompute and store the attendance aggregates from our progress
+        records (as we do whenever records are added, removed or updated);
+        returns whether they changed.
+        """
+
+
+class IWebinarSessionFetchState(interface.Interface):
+    """
+    Tracks the progress fetches for a single (ended) webinar session.
+    """
+
+    sessionKey = ValidTextLine(title=u"Webinar session key",
+                               required=True)
+
+    endTime = ValidDatetime(title=u"Webinar session end date",
+                            required=False)
+
+    last_fetched = ValidDatetime(title=u'The last time session progress was fetched',
+                                 required=False)
+
+    attempts = Int(title=u"The number of times session progress was fetched",
+                   required=True,
+                   default=0)
+
+    next_eligible = ValidDatetime(title=u'The next time session progress may be fetched',
+                                  required=False)
+
+    finalized = Bool(title=u"Whether session progress no longer needs fetching",
+                     required=True,
+                     default=False)
+
+    def record_fetch(fetched=None):
+        """
+        Record a progress fetch for this session, scheduling the next one.
+        """
+
+    def is_due(now=None):
+        """
+        Whether session progress should be fetched again.
+        """
+
 
 class IWebinarProgressContainer(IContainer):
     """
@@ -375,6 +569,84 @@ class IWebinarProgressContainer(IContainer):
     last_updated = ValidDatetime(title=u'The last time webinar progress was updated',
                                  required=True)
 
+    def get_session_state(session_key):
+        """
+        Return the :class:`IWebinarSessionFetchState` for the session key,
+        or None.
+        """
+
+    def get_session_states():
+        """
+        Return all :class:`IWebinarSessionFetchState` objects.
+        """
+
+    def record_session_fetch(session_key, end_time, fetched=None):
+        """
+        Record a progress fetch for the given session.
+        """
+
+
+class IWebinarProgressUpdatedEvent(IObjectEvent):
+    """
+    Sent after progress for a :class:`IWebinar` was fetched and stored.
+    """
+
+
+@interface.implementer(IWebinarProgressUpdatedEvent)
+class WebinarProgressUpdatedEvent(ObjectEvent):
+    pass
+
+
+class IWebinarProgressSchedule(interface.Interface):
+    """
+    A persistent index of webinars (by intid) ordered by the next time
+    their progress is due to be updated.
+    """
+
+    def schedule(intid, due):
+        """
+        Schedule the webinar intid for the given due datetime; unschedule
+        it if `due` is None.
+        """
+
+    def unschedule(intid):
+        """
+        Remove the webinar intid from the schedule.
+        """
+
+    def get_due_time(intid):
+        """
+        Return the due datetime for the webinar intid, or None.
+        """
+
+    def pop_due(now=None, limit=None):
+        """
+        Remove and return (up to `limit` of) the intids of the webinars due
+        by `now`, in due order. Callers reschedule the intids they cannot
+        process.
+        """
+
+
+class IWebinarOrganizerIndex(interface.Interface):
+    """
+    A persistent index of webinars (by intid) by organizer key.
+    """
+
+    def index(intid, organizer_key):
+        """
+        Record the webinar intid under the given organizer key.
+        """
+
+    def unindex(intid):
+        """
+        Remove the webinar intid from the index.
+        """
+
+    def get_intids(organizer_key):
+        """
+        Return the intids of the webinars of the given organizer, in order.
+        """
+
 
 import zope.deferredimport
 zope.deferredimport.initialize()
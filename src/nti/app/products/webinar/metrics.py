@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Statsd metrics for webinar API usage, if statsd is configured.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from perfmetrics import statsd_client
+
+METRIC_PREFIX = 'nti.webinar'
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _name(name):
+    return '%s.%s' % (METRIC_PREFIX, name)
+
+
+def timing(name, seconds):
+    """
+    Record a duration, given in seconds.
+    """
+    client = statsd_client()
+    if client is not None:
+        client.timing(_name(name), int(seconds * 1000))
+
+
+def incr(name, count=1):
+    client = statsd_client()
+    if client is not None:
+        client.incr(_name(name), count)
+
+
+def gauge(name, value):
+    client = statsd_client()
+    if client is not None:
+        client.gauge(_name(name), value)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A persistent index of webinars (by intid) by organizer.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from BTrees.LLBTree import LLTreeSet
+
+from BTrees.LOBTree import LOBTree
+
+from BTrees.OOBTree import OOBTree
+
+from persistent import Persistent
+
+from zope import component
+from zope import interface
+
+from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IIntIdAddedEvent
+from zope.intid.interfaces import IIntIdRemovedEvent
+
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
+
+from nti.app.products.webinar.interfaces import IWebinar
+from nti.app.products.webinar.interfaces import IWebinarOrganizerIndex
+
+from nti.site.utils import registerUtility
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IWebinarOrganizerIndex)
+class WebinarOrganizerIndex(Persistent):
+
+    __parent__ = None
+    __name__ = None
+
+    def __init__(self):
+        # organizer key -> intids
+        self._by_organizer = OOBTree()
+        # intid -> organizer key
+        self._organizer_for = LOBTree()
+
+    def __len__(self):
+        return len(self._organizer_for)
+
+    def index(self, intid, organizer_key):
+        if self._organizer_for.get(intid) == organizer_key:
+            return
+        self.unindex(intid)
+        self._organizer_for[intid] = organizer_key
+        intids = self._by_organizer.get(organizer_key)
+        if intids is None:
+            intids = self._by_organizer[organizer_key] = LLTreeSet()
+        intids.insert(intid)
+
+    def unindex(self, intid):
+        organizer_key = self._organizer_for.get(intid)
+        if organizer_key is None:
+            return
+        del self._organizer_for[intid]
+        intids = self._by_organizer.get(organizer_key)
+        if intids is not None:
+            intids.remove(intid)
+            if not intids:
+                del self._by_organizer[organizer_key]
+
+    def get_intids(self, organizer_key):
+        return self._by_organizer.get(organizer_key, ())
+
+
+def install_webinar_organizer_index(site_manager):
+    """
+    Register a :class:`IWebinarOrganizerIndex` in the given (dataserver)
+    site manager, unless we already have one; see our generations.
+    """
+    result = site_manager.queryUtility(IWebinarOrganizerIndex)
+    if result is None:
+        result = WebinarOrganizerIndex()
+        result.__parent__ = site_manager
+        registerUtility(site_manager,
+                        component=result,
+                        provided=IWebinarOrganizerIndex)
+    return result
+
+
+def get_webinar_organizer_index():
+    """
+    Return the :class:`IWebinarOrganizerIndex` installed in the dataserver
+    site (and visible from its child sites), or None.
+    """
+    return component.queryUtility(IWebinarOrganizerIndex)
+
+
+def index_webinar_organizer(webinar):
+    """
+    Record the webinar under its organizer, so that we can find all of an
+    organizer's webinars (e.g. for reports).
+    """
+    intids = component.queryUtility(IIntIds)
+    intid = intids.queryId(webinar) if intids is not None else None
+    index = get_webinar_organizer_index()
+    if intid is None or index is None or not webinar.organizerKey:
+        return
+    index.index(intid, webinar.organizerKey)
+
+
+def unindex_webinar_organizer(webinar):
+    intids = component.queryUtility(IIntIds)
+    intid = intids.queryId(webinar) if intids is not None else None
+    index = get_webinar_organizer_index()
+    if intid is not None and index is not None:
+        index.unindex(intid)
+
+
+def get_organizer_webinars(organizer_key):
+    """
+    Yield the webinars of the given organizer, in intid order.
+    """
+    index = get_webinar_organizer_index()
+    if index is None:
+        return
+    intids = component.getUtility(IIntIds)
+    for intid in index.get_intids(organizer_key):
+        webinar = intids.queryObject(intid)
+        if IWebinar.providedBy(webinar):
+            yield webinar
+
+
+@component.adapter(IWebinar, IIntIdAddedEvent)
+def _on_webinar_added(webinar, unused_event=None):
+    index_webinar_organizer(webinar)
+
+
+@component.adapter(IWebinar, IObjectModifiedEvent)
+def _on_webinar_modified(webinar, unused_event=None):
+    index_webinar_organizer(webinar)
+
+
+@component.adapter(IWebinar, IIntIdRemovedEvent)
+def _on_webinar_removed(webinar, unused_event=None):
+    unindex_webinar_organizer(webinar)
@@ -8,7 +8,16 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import threading
+
 from datetime import datetime
+from datetime import timedelta
+
+from BTrees.OOBTree import OOBTree
+
+from persistent import Persistent
+
+from six import text_type
 
 from ZODB.interfaces import IConnection
 
@@ -17,11 +26,22 @@ from zope import interface
 
 from zope.annotation import IAnnotations
 
+from zope.event import notify
+
+from zope.schema.interfaces import ValidationError
+
+from nti.app.products.webinar.adapters import query_webinar_registration_container
+
 from nti.app.products.webinar.interfaces import IWebinar
 from nti.app.products.webinar.interfaces import IWebinarClient
+from nti.app.products.webinar.interfaces import WebinarUnauthorizedError
+from nti.app.products.webinar.interfaces import WebinarProgressUpdatedEvent
 from nti.app.products.webinar.interfaces import IWebinarProgressContainer
+from nti.app.products.webinar.interfaces import IWebinarSessionFetchState
 from nti.app.products.webinar.interfaces import IUserWebinarProgressContainer
-from nti.app.products.webinar.interfaces import IWebinarRegistrationMetadataContainer
+
+from nti.app.products.webinar.utils import concurrent_map
+from nti.app.products.webinar.utils import retry_unauthorized
 
 from nti.containers.containers import CaseInsensitiveCheckingLastModifiedBTreeContainer
 
@@ -29,15 +49,80 @@ from nti.coremetadata.interfaces import IUser
 
 from nti.dataserver.users import User
 
+from nti.externalization.datetime import datetime_from_string
+
 from nti.schema.fieldproperty import createDirectFieldProperties
 
 from nti.schema.schema import SchemaConfigured
 
 WEBINAR_PROGRESS_CONTAINER_KEY = 'nti.app.products.webinar.interfaces.IUserWebinarProgress'
 
+#: For containers without per-session state, sessions that ended within
+#: this window before our last update are fetched again.
+PROGRESS_REFRESH_WINDOW = timedelta(days=1)
+
+#: Session progress is not refetched within this delay of the session end.
+SESSION_MIN_REFETCH_DELAY = timedelta(hours=1)
+
+#: We back off refetches by this factor of the time since the session ended
+#: (e.g. 1x, 4 hrs later, 16 hrs later).
+SESSION_BACKOFF_FACTOR = 4
+
+#: Session progress fetched this long after the session ended is final.
+SESSION_FINALIZE_DELAY = timedelta(days=1)
+
+#: The max number of fetches for a single session.
+MAX_SESSION_FETCH_ATTEMPTS = 5
+
+#: The max number of concurrent progress fetches during a batch sync.
+DEFAULT_SYNC_WORKERS = 8
+
+#: The max number of concurrent progress fetches per organizer.
+DEFAULT_SYNC_ORGANIZER_WORKERS = 4
+
 logger = __import__('logging').getLogger(__name__)
 
 
+def _scheduled_seconds(webinar):
+    result = 0
+    for webinar_time in getattr(webinar, 'times', None) or ():
+        if webinar_time.startTime and webinar_time.endTime:
+            delta = webinar_time.endTime - webinar_time.startTime
+            result += max(0, int(delta.total_seconds()))
+    return result
+
+
+def _compute_attendance_aggregates(progress_records):
+    total_seconds = 0
+    sessions_attended = 0
+    first_join = last_leave = None
+    for progress in progress_records:
+        seconds = progress.attendanceTimeInSeconds or 0
+        total_seconds += seconds
+        if seconds or progress.attendance:
+            sessions_attended += 1
+        for attendance in progress.attendance or ():
+            if first_join is None or attendance.joinTime < first_join:
+                first_join = attendance.joinTime
+            if last_leave is None or attendance.leaveTime > last_leave:
+                last_leave = attendance.leaveTime
+    return {'total_attendance_seconds': total_seconds,
+            'sessions_attended': sessions_attended,
+            'first_join': first_join,
+            'last_leave': last_leave}
+
+
+class _AttendanceAggregate(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, inst, klass):
+        if inst is None:
+            return self
+        return inst._get_aggregates()[self.name]
+
+
 @interface.implementer(IUserWebinarProgressContainer)
 class UserWebinarProgressContainer(CaseInsensitiveCheckingLastModifiedBTreeContainer,
                                    SchemaConfigured):
@@ -46,12 +131,127 @@ class UserWebinarProgressContainer(CaseInsensitiveCheckingLastModifiedBTreeConta
     __parent__ = None
     __name__ = None
 
+    # Containers stored before we kept aggregates compute them on read
+    _aggregates = None
+
+    total_attendance_seconds = _AttendanceAggregate('total_attendance_seconds')
+    sessions_attended = _AttendanceAggregate('sessions_attended')
+    first_join = _AttendanceAggregate('first_join')
+    last_leave = _AttendanceAggregate('last_leave')
+
+    @property
+    def webinar(self):
+        return getattr(self.__parent__, '__parent__', None)
+
+    @property
+    def attendance_percent(self):
+        # Against the current schedule, which may change after we are stored
+        scheduled_seconds = _scheduled_seconds(self.webinar)
+        if not scheduled_seconds:
+            return None
+        return min(100.0, self.total_attendance_seconds * 100.0 / scheduled_seconds)
+
+    @property
+    def has_aggregates(self):
+        return self._aggregates is not None
+
+    def __setitem__(self, key, value):
+        super(UserWebinarProgressContainer, self).__setitem__(key, value)
+        self.update_aggregates()
+
+    def __delitem__(self, key):
+        super(UserWebinarProgressContainer, self).__delitem__(key)
+        self.update_aggregates()
+
+    def _get_aggregates(self):
+        if self._aggregates is None:
+            return _compute_attendance_aggregates(self.values())
+        return self._aggregates
+
+    def update_aggregates(self):
+        aggregates = _compute_attendance_aggregates(self.values())
+        if aggregates != self._aggregates:
+            self._aggregates = aggregates
+            return True
+        return False
+
+
+@interface.implementer(IWebinarSessionFetchState)
+class WebinarSessionFetchState(Persistent,
+                               SchemaConfigured):
+    createDirectFieldProperties(IWebinarSessionFetchState)
+
+    def record_fetch(self, fetched=None):
+        fetched = fetched or datetime.utcnow()
+        self.attempts += 1
+        self.last_fetched = fetched
+        end_time = self.endTime or fetched
+        since_end = fetched - end_time
+        if     since_end > SESSION_FINALIZE_DELAY \
+            or self.attempts >= MAX_SESSION_FETCH_ATTEMPTS:
+            self.finalized = True
+            self.next_eligible = None
+        else:
+            self.next_eligible = max(end_time + SESSION_MIN_REFETCH_DELAY,
+                                     fetched + since_end * SESSION_BACKOFF_FACTOR)
+
+    def is_due(self, now=None):
+        if self.finalized:
+            return False
+        now = now or datetime.utcnow()
+        return self.next_eligible is None or self.next_eligible <= now
+
 
 @interface.implementer(IWebinarProgressContainer)
 class WebinarProgressContainer(CaseInsensitiveCheckingLastModifiedBTreeContainer,
                                SchemaConfigured):
     createDirectFieldProperties(IWebinarProgressContainer)
 
+    _session_states = None
+
+    def get_session_state(self, session_key):
+        if self._session_states is None:
+            return None
+        return self._session_states.get(session_key)
+
+    def get_session_states(self):
+        if self._session_states is None:
+            return ()
+        return self._session_states.values()
+
+    def record_session_fetch(self, session_key, end_time, fetched=None):
+        if self._session_states is None:
+            self._session_states = OOBTree()
+        state = self._session_states.get(session_key)
+        if state is None:
+            state = WebinarSessionFetchState(sessionKey=session_key,
+                                             endTime=end_time)
+            self._session_states[session_key] = state
+        state.record_fetch(fetched)
+        return state
+
+
+def query_webinar_progress_container(webinar):
+    """
+    Return the webinar's existing :class:`IWebinarProgressContainer`, or
+    None, without creating it; for read paths.
+    """
+    annotations = IAnnotations(webinar, None)
+    if annotations is None:
+        return None
+    return annotations.get(WEBINAR_PROGRESS_CONTAINER_KEY)
+
+
+def query_user_progress_container(user, webinar):
+    """
+    Return the user's existing :class:`IUserWebinarProgressContainer` for
+    the webinar, or None, without creating it.
+    """
+    container = query_webinar_progress_container(webinar)
+    if container is None:
+        return None
+    return container.get(user.username)
+
 
 def webinar_to_webinar_progress_container(webinar):
     annotations = IAnnotations(webinar)
@@ -80,46 +280,261 @@ def _webinar_to_user_container(user, webinar):
     return result
 
 
-def update_webinar_progress(webinar):
+def _attendance_intervals(progress):
+    return tuple((x.joinTime, x.leaveTime) for x in progress.attendance or ())
+
+
+def _progress_changed(stored, progress):
+    return stored.attendanceTimeInSeconds != progress.attendanceTimeInSeconds \
+        or _attendance_intervals(stored) != _attendance_intervals(progress)
+
+
+def _store_user_progress(user_container, user_progress, upsert=True):
     """
-    Update the webinar progress for all of our registered users.
+    Store the given :class:`IUserWebinarProgress` in the user container. If
+    we already have a record for the session, it is only updated (in place)
+    if `upsert` and the attendance has actually changed; otherwise we leave
+    the stored record untouched to avoid needless writes. Returns whether
+    anything was written.
+    """
+    stored = user_container.get(user_progress.sessionKey)
+    if stored is None:
+        user_container[user_progress.sessionKey] = user_progress
+        return True
+    if not upsert or not _progress_changed(stored, user_progress):
+        return False
+    stored.attendanceTimeInSeconds = user_progress.attendanceTimeInSeconds
+    stored.attendance = user_progress.attendance
+    stored.updateLastMod()
+    user_container.updateLastMod()
+    user_container.update_aggregates()
+    return True
+
+
+def _store_webinar_progress(webinar, progress_collection, upsert=True,
+                            fetched_sessions=()):
+    """
+    Store the fetched progress for all of our registered users, recording
+    the fetch for each of the given (session_key, end_time) sessions.
+    """
+    # Records are stored as they arrive (they may be streamed); we only
+    # resolve each registrant's container once.
+    registration_container = query_webinar_registration_container(webinar)
+    user_containers = dict()
+    for progress in progress_collection or ():
+        registrant_key = progress.registrantKey
+        try:
+            user_container = user_containers[registrant_key]
+        except KeyError:
+            user_container = None
+            username = None
+            if registration_container is not None:
+                username = registration_container.get_username(registrant_key)
+            user = User.get_user(username) if username else None
+            if user is not None:
+                user_container = component.queryMultiAdapter((user, webinar),
+                                                             IUserWebinarProgressContainer)
+            user_containers[registrant_key] = user_container
+        if user_container is None:
+            continue
+        written = _store_user_progress(user_container, progress, upsert)
+        if not written and not user_container.has_aggregates:
+            # Legacy containers get their aggregates on first update
+            user_container.update_aggregates()
+
+    now = datetime.utcnow()
+    progress_container = IWebinarProgressContainer(webinar)
+    for session_key, end_time in fetched_sessions or ():
+        progress_container.record_session_fetch(session_key, end_time, now)
+    progress_container.last_updated = now
+    notify(WebinarProgressUpdatedEvent(webinar))
+
+
+def _parse_time(value):
+    try:
+        return datetime_from_string(value) if value else None
+    except (ValueError, ValidationError):
+        return None
+
+
+def _iter_sessions_progress(client, webinar_key, due_sessions, stream=False):
+    for session_key, unused_end_time in due_sessions:
+        session_progress = client.get_session_progress(webinar_key,
+                                                       session_key,
+                                                       stream=stream)
+        for progress in session_progress or ():
+            yield progress
+
+
+def _fetch_webinar_progress(client, webinar_key, last_updated=None,
+                            session_plan=None, stream=False):
+    """
+    Fetch progress for the ended sessions of a webinar that are due, as
+    given by the `session_plan` of session key to whether it is due. The
+    first time, we fetch attendees for the whole webinar in one call. This
+    should not touch any persistent objects.
+
+    Returns a tuple of the progress collection (None if not found) and
+    the (session_key, end_time) of the sessions that were fetched. If
+    `stream`, the collection is a lazy iterable, downloaded and parsed as it
+    is consumed.
+    """
+    sessions = client.get_webinar_sessions(webinar_key)
+    if sessions is None:
+        return None, ()
+    session_plan = session_plan or {}
+    now = datetime.utcnow()
+    due_sessions = []
+    for session in sessions:
+        session_key = text_type(session.get('sessionKey'))
+        end_time = _parse_time(session.get('endTime'))
+        if end_time is None or end_time > now:
+            continue
+        is_due = session_plan.get(session_key)
+        if is_due is None:
+            # A session we have not tracked; it may still have been
+            # fetched before we tracked sessions.
+            is_due = last_updated is None \
+                  or end_time >= last_updated - PROGRESS_REFRESH_WINDOW
+        if is_due:
+            due_sessions.append((session_key, end_time))
+
+    if last_updated is None:
+        result = client.get_webinar_progress(webinar_key, stream=stream)
+        return result, due_sessions
+    result = _iter_sessions_progress(client, webinar_key, due_sessions, stream)
+    if not stream:
+        result = list(result)
+    return result, due_sessions
+
+
+def _get_last_updated(webinar):
+    container = query_webinar_progress_container(webinar)
+    return container.last_updated if container is not None else None
+
+
+def _get_session_plan(webinar, now=None):
+    """
+    Return a dict of tracked session key to whether it is due.
+    """
+    now = now or datetime.utcnow()
+    container = query_webinar_progress_container(webinar)
+    if container is None:
+        return {}
+    return {x.sessionKey: x.is_due(now) for x in container.get_session_states()}
+
+
+def update_webinar_progress(webinar, upsert=True):
+    """
+    Update the webinar progress for all of our registered users. If `upsert`,
+    existing session records are updated when their attendance changed.
     """
     client = IWebinarClient(webinar, None)
     if client is None:
         logger.info("Cannot get webinar progress (%s) since we cannot obtain a client (unauthorized)",
                     webinar)
         return False
-    # Get the progress and store by registrantKey
-    progress_collection = client.get_webinar_progress(webinar.webinarKey)
+    # Stream the progress, storing records as they are parsed
+    progress_collection, fetched_sessions = \
+        _fetch_webinar_progress(client,
+                                webinar.webinarKey,
+                                _get_last_updated(webinar),
+                                _get_session_plan(webinar),
+                                stream=True)
 
     if progress_collection is None:
         logger.info("Cannot get webinar progress (%s) since webinar progress cannot be fetched (deleted?)",
                     webinar)
         return False
 
-    registrant_key_to_progress = dict()
-    for progress in progress_collection or ():
-        registrant_progress = registrant_key_to_progress.setdefault(progress.registrantKey, [])
-        registrant_progress.append(progress)
-
-    # Store progress in our user container
-    registration_container = IWebinarRegistrationMetadataContainer(webinar)
-    for username, user_reg in registration_container.items():
-        user = User.get_user(username)
-        if user is None:
+    _store_webinar_progress(webinar, progress_collection, upsert,
+                            fetched_sessions)
+    return True
+
+
+class WebinarProgressSyncResult(object):
+    """
+    The outcome of syncing progress for a single webinar.
+    """
+
+    def __init__(self, webinar, success, error=None):
+        self.webinar = webinar
+        self.success = success
+        self.error = error
+
+    def __repr__(self):
+        return '<%s %s success=%s error=%r>' % (self.__class__.__name__,
+                                                self.webinar.webinarKey,
+                                                self.success,
+                                                self.error)
+
+
+def update_webinars_progress(webinars,
+                             max_workers=DEFAULT_SYNC_WORKERS,
+                             max_organizer_workers=DEFAULT_SYNC_ORGANIZER_WORKERS,
+                             force=False,
+                             upsert=True):
+    """
+    Update the progress for all the given webinars that are due (or all of
+    them if `force`). Attendee data is fetched concurrently; the results are
+    then stored serially, in this thread, so that they land in the caller's
+    transaction. Returns a list of :class:`WebinarProgressSyncResult`.
+    """
+    results = []
+    jobs = []
+    clients = {}
+    semaphores = {}
+    for webinar in webinars or ():
+        if not force and not should_update_progress(webinar):
             continue
-        user_container = component.queryMultiAdapter((user, webinar),
-                                                     IUserWebinarProgressContainer)
-        user_progress_objs = registrant_key_to_progress.get(user_reg.registrant_key)
-        for user_progress in user_progress_objs or ():
-            # XXX Is this what we want? Would we ever need to update an
-            # existing record?
-            if user_progress.sessionKey not in user_container:
-                user_container[user_progress.sessionKey] = user_progress
+        organizer_key = webinar.organizerKey
+        if organizer_key not in clients:
+            clients[organizer_key] = IWebinarClient(webinar, None)
+            semaphores[organizer_key] = threading.BoundedSemaphore(max_organizer_workers)
+        client = clients[organizer_key]
+        if client is None:
+            logger.info("Cannot get webinar progress (%s) since we cannot obtain a client (unauthorized)",
+                        webinar)
+            results.append(WebinarProgressSyncResult(webinar, False, u'Unauthorized'))
+            continue
+        jobs.append((webinar, client, webinar.webinarKey, organizer_key,
+                     _get_last_updated(webinar), _get_session_plan(webinar)))
 
-    progress_container = IWebinarProgressContainer(webinar)
-    progress_container.last_updated = datetime.utcnow()
-    return True
+    # Fetch tokens up front, while we have our connection and request
+    for client in clients.values():
+        if client is not None:
+            client._access_token  # pylint: disable=pointless-statement,protected-access
+
+    def _fetch(job):
+        unused_webinar, client, webinar_key, organizer_key, last_updated, plan = job
+        with semaphores[organizer_key]:
+            try:
+                progress_collection, fetched_sessions = \
+                    _fetch_webinar_progress(client, webinar_key, last_updated, plan)
+                return progress_collection, fetched_sessions, None
+            except WebinarUnauthorizedError as e:
+                # Workers may not refresh the token; we retry in this thread
+                return None, (), e
+            except Exception as e:  # pylint: disable=broad-except
+                logger.exception('Error fetching webinar progress (%s)',
+                                 webinar_key)
+                return None, (), e
+
+    fetched = concurrent_map(_fetch, jobs, max_workers)
+    fetched = retry_unauthorized(_fetch, jobs, fetched, lambda job: job[1])
+    for job, (progress_collection, fetched_sessions, error) in zip(jobs, fetched):
+        webinar = job[0]
+        if error is not None:
+            results.append(WebinarProgressSyncResult(webinar, False, error))
+        elif progress_collection is None:
+            logger.info("Cannot get webinar progress (%s) since webinar progress cannot be fetched (deleted?)",
+                        webinar)
+            results.append(WebinarProgressSyncResult(webinar, False, u'NotFound'))
+        else:
+            _store_webinar_progress(webinar, progress_collection, upsert,
+                                    fetched_sessions)
+            results.append(WebinarProgressSyncResult(webinar, True))
+    return results
 
 
 def should_update_progress(webinar):
@@ -138,20 +553,24 @@ def should_update_progress(webinar):
             last_session = webinar_time
     result = False
     if last_session is not None:
-        progress_container = IWebinarProgressContainer(webinar)
-        if progress_container.last_updated is None:
+        progress_container = query_webinar_progress_container(webinar)
+        if progress_container is None or progress_container.last_updated is None:
             # First time update
             result = True
         else:
             update_delta = progress_container.last_updated - last_session.endTime
             since_end_delta = now - last_session.endTime
+            session_states = tuple(progress_container.get_session_states())
             if update_delta.total_seconds() < 0:
                 # A new session finished
                 result = True
-            elif update_delta.days > 0:
+            elif session_states:
+                # Only if one of our unfinished sessions is due
+                result = any(x.is_due(now) for x in session_states)
+            elif update_delta >= SESSION_FINALIZE_DELAY:
                 # Should not have to update after a day right...
                 result = False
-            elif since_end_delta.seconds < 3600:
+            elif since_end_delta < SESSION_MIN_REFETCH_DELAY:
                 # Do not update more than once in first hour
                 result = False
             else:
@@ -159,5 +578,43 @@ def should_update_progress(webinar):
                 # We'd like to update every so often, backing off.
                 # e.g. 1x, 4 hrs later, 16 hrs later
                 since_update_delta = now - progress_container.last_updated
-                result = since_update_delta.seconds > update_delta.seconds * 4
+                result = since_update_delta >= update_delta * SESSION_BACKOFF_FACTOR
     return result
+
+
+def next_progress_update_time(webinar):
+    """
+    Return the next time progress for this webinar should be updated, or
+    None if it never needs to be again. This mirrors
+    :func:`should_update_progress`.
+    """
+    progress_container = query_webinar_progress_container(webinar)
+    last_updated = None
+    session_states = ()
+    if progress_container is not None:
+        last_updated = progress_container.last_updated
+        session_states = tuple(progress_container.get_session_states())
+    candidates = []
+    # The first session to end after our last update
+    for webinar_time in webinar.times or ():
+        if last_updated is None or webinar_time.endTime > last_updated:
+            candidates.append(webinar_time.endTime)
+            break
+    for state in session_states:
+        if not state.finalized:
+            candidates.append(state.next_eligible or last_updated)
+    if not session_states and last_updated is not None:
+        # Without per-session state, we back off from the most recently
+        # completed session.
+        last_session = None
+        for webinar_time in webinar.times or ():
+            if webinar_time.endTime > last_updated:
+                break
+            last_session = webinar_time
+        if last_session is not None:
+            update_delta = last_updated - last_session.endTime
+            if update_delta < SESSION_FINALIZE_DELAY:
+                candidates.append(max(last_session.endTime + SESSION_MIN_REFETCH_DELAY,
+                                      last_updated + update_delta * SESSION_BACKOFF_FACTOR))
+    candidates = [x for x in candidates if x is not None]
+    return min(candidates) if candidates else None
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Client-side pacing of GOTO API calls, with a token bucket per organizer
+shared across processes through redis.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+import random
+import threading
+
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
+
+from zope import component
+
+from nti.app.products.webinar import metrics
+
+from nti.app.products.webinar.interfaces import WebinarRateLimitError
+
+from nti.dataserver.interfaces import IRedisClient
+
+#: The sustained number of calls per second allowed per organizer.
+DEFAULT_RATE = 5
+
+#: The number of calls per organizer that may burst above the rate.
+DEFAULT_CAPACITY = 10
+
+#: The longest, in seconds, a caller waits for its turn before giving up.
+DEFAULT_MAX_WAIT = 30
+
+#: How many times a throttled (or, for GETs, failed) call is retried.
+MAX_RETRIES = 3
+
+#: The base and cap, in seconds, of our jittered exponential backoff.
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 10
+
+#: How long, in seconds, an idle bucket is kept in redis.
+BUCKET_TTL = 60 * 60
+
+logger = __import__('logging').getLogger(__name__)
+
+# Reserve a token, letting the bucket go negative so that callers queue up
+# in arrival order; a caller waits until its token would have been refilled
+# (and any Retry-After block has passed). Reservations that would wait
+# longer than max_wait are not taken.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+if now > ts then
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    ts = now
+end
+tokens = tokens - 1
+local wait = 0
+if tokens < 0 then
+    wait = -tokens / rate
+end
+local blocked_until = tonumber(redis.call('GET', KEYS[2]) or 0) or 0
+if blocked_until - now > wait then
+    wait = blocked_until - now
+end
+if wait > max_wait then
+    return {0, tostring(wait), tostring(tokens + 1)}
+end
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[5]))
+return {1, tostring(wait), tostring(tokens)}
+"""
+
+# Block the bucket until the given time, keeping any longer block already
+# in place (e.g. from another process's Retry-After).
+_BLOCK_SCRIPT = """
+local blocked_until = tonumber(redis.call('GET', KEYS[1]) or 0) or 0
+if tonumber(ARGV[1]) <= blocked_until then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', tonumber(ARGV[2]))
+return 1
+"""
+
+
+class _LocalTokenBucket(object):
+    """
+    An in-process equivalent of our redis token bucket, used when redis is
+    not available.
+    """
+
+    def __init__(self, capacity):
+        self._lock = threading.Lock()
+        self.tokens = capacity
+        self.ts = None
+        self.blocked_until = 0
+
+    def reserve(self, rate, capacity, now, max_wait):
+        with self._lock:
+            tokens = self.tokens
+            ts = now if self.ts is None else self.ts
+            if now > ts:
+                tokens = min(capacity, tokens + (now - ts) * rate)
+                ts = now
+            tokens -= 1
+            wait = -tokens / rate if tokens < 0 else 0
+            wait = max(wait, self.blocked_until - now)
+            if wait > max_wait:
+                return False, wait, tokens + 1
+            self.tokens = tokens
+            self.ts = ts
+            return True, wait, tokens
+
+    def block(self, until):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, until)
+
+
+_local_buckets = {}
+_local_buckets_lock = threading.Lock()
+
+
+def _get_local_bucket(organizer_key, capacity):
+    with _local_buckets_lock:
+        result = _local_buckets.get(organizer_key)
+        if result is None:
+            result = _local_buckets[organizer_key] = _LocalTokenBucket(capacity)
+        return result
+
+
+def reset_local_buckets():
+    """
+    Drop all in-process buckets (e.g. in tests).
+    """
+    with _local_buckets_lock:
+        _local_buckets.clear()
+
+
+class OrganizerRateLimiter(object):
+    """
+    Paces calls for an organizer with a token bucket shared (via redis)
+    by all our processes. Callers :meth:`acquire` before each call; a
+    throttled response should :meth:`block` all callers for its
+    `Retry-After`.
+    """
+
+    def __init__(self, organizer_key, redis_client=None, rate=DEFAULT_RATE,
+                 capacity=DEFAULT_CAPACITY, max_wait=DEFAULT_MAX_WAIT):
+        self.organizer_key = organizer_key
+        self.redis_client = redis_client
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+
+    @property
+    def _bucket_key(self):
+        return 'webinar/ratelimit/%s' % self.organizer_key
+
+    @property
+    def _blocked_key(self):
+        return 'webinar/ratelimit/%s/blocked' % self.organizer_key
+
+    def _reserve(self, now):
+        if self.redis_client is not None:
+            try:
+                script = self.redis_client.register_script(_TOKEN_BUCKET_SCRIPT)
+                granted, wait, tokens = script(keys=[self._bucket_key, self._blocked_key],
+                                               args=[self.rate, self.capacity, now,
+                                                     self.max_wait, BUCKET_TTL])
+                return bool(int(granted)), float(wait), float(tokens)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error reserving webinar rate limit token')
+        bucket = _get_local_bucket(self.organizer_key, self.capacity)
+        return bucket.reserve(self.rate, self.capacity, now, self.max_wait)
+
+    def acquire(self):
+        """
+        Wait for our turn to make a call, returning the seconds waited.
+        Raises :class:`WebinarRateLimitError` if we would have to wait
+        longer than `max_wait`.
+        """
+        granted, wait, tokens = self._reserve(time.time())
+        metrics.gauge('ratelimit.queue_depth', max(0, int(-tokens)))
+        if not granted:
+            metrics.incr('ratelimit.rejected')
+            raise WebinarRateLimitError('Webinar API rate limit wait too long (%.1fs)' % wait,
+                                        retry_after=wait)
+        if wait > 0:
+            time.sleep(wait)
+        metrics.timing('ratelimit.wait', wait)
+        return wait
+
+    def block(self, seconds):
+        """
+        Hold all calls for this organizer for (at least) the given seconds;
+        a shorter block never cuts a longer one short.
+        """
+        until = time.time() + seconds
+        if self.redis_client is not None:
+            try:
+                script = self.redis_client.register_script(_BLOCK_SCRIPT)
+                script(keys=[self._blocked_key],
+                       args=[repr(until), max(1, int(seconds * 1000))])
+                return
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error blocking webinar rate limit')
+        _get_local_bucket(self.organizer_key, self.capacity).block(until)
+
+
+def get_rate_limiter(organizer_key):
+    """
+    Return an :class:`OrganizerRateLimiter` for the organizer, shared
+    through redis if we have it.
+    """
+    return OrganizerRateLimiter(organizer_key,
+                                component.queryUtility(IRedisClient))
+
+
+def backoff_seconds(attempt):
+    """
+    A jittered exponential backoff for the given (1-based) retry attempt.
+    """
+    ceiling = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def retry_after_seconds(response, attempt):
+    """
+    The seconds to wait before retrying a throttled response, from its
+    `Retry-After` header (in seconds or an HTTP date), falling back to our
+    backoff.
+    """
+    value = response.headers.get('Retry-After')
+    if value:
+        try:
+            return max(0, float(value))
+        except (TypeError, ValueError):
+            parsed = parsedate_tz(value)
+            if parsed is not None:
+                return max(0, mktime_tz(parsed) - time.time())
+    return backoff_seconds(attempt)
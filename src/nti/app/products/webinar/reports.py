@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Webinar attendance reports, generated with bounded memory by walking our
+progress containers in key order.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+from nti.app.products.webinar.organizers import get_organizer_webinars
+
+from nti.app.products.webinar.progress import query_webinar_progress_container
+
+from nti.app.products.webinar.utils import csv_line
+from nti.app.products.webinar.utils import ndjson_line
+
+#: The columns of an attendance report, one row per attendance interval.
+ATTENDANCE_REPORT_FIELDS = ('webinar_key', 'organizer_key', 'username',
+                            'registrant_key', 'session_key', 'join_time',
+                            'leave_time', 'attendance_seconds')
+
+ATTENDANCE_REPORT_FORMATS = ('csv', 'ndjson')
+
+ATTENDANCE_REPORT_CONTENT_TYPES = {'csv': 'text/csv',
+                                   'ndjson': 'application/x-ndjson'}
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _isoformat(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ') if dt is not None else None
+
+
+def _release(obj):
+    # Ghost objects we have read (but not changed) so that a long walk does
+    # not fill our object cache.
+    if getattr(obj, '_p_changed', None) is False:
+        obj._p_deactivate()
+
+
+def iter_webinar_attendance(webinar):
+    """
+    Yield attendance report rows (see :data:`ATTENDANCE_REPORT_FIELDS`) for
+    the webinar, by username and session. Progress records without any
+    attendance yield a single row without join and leave times.
+    """
+    container = query_webinar_progress_container(webinar)
+    if container is None:
+        return
+    webinar_key = webinar.webinarKey
+    organizer_key = webinar.organizerKey
+    for username, user_container in container.items():
+        for session_key, progress in user_container.items():
+            intervals = progress.attendance or (None,)
+            for attendance in intervals:
+                yield (webinar_key,
+                       organizer_key,
+                       username,
+                       progress.registrantKey,
+                       session_key,
+                       _isoformat(getattr(attendance, 'joinTime', None)),
+                       _isoformat(getattr(attendance, 'leaveTime', None)),
+                       progress.attendanceTimeInSeconds)
+            _release(progress)
+        _release(user_container)
+
+
+def iter_webinars_attendance(webinars):
+    """
+    Yield attendance report rows for each of the given webinars, in turn.
+    """
+    for webinar in webinars:
+        for row in iter_webinar_attendance(webinar):
+            yield row
+
+
+def iter_organizer_attendance(organizer_key):
+    """
+    Yield attendance report rows for every webinar of the organizer.
+    """
+    return iter_webinars_attendance(get_organizer_webinars(organizer_key))
+
+
+def iter_attendance_report_lines(rows, report_format='csv'):
+    """
+    Yield the given attendance rows as encoded `csv` (with a header) or
+    `ndjson` lines.
+    """
+    if report_format not in ATTENDANCE_REPORT_FORMATS:
+        raise ValueError('Invalid attendance report format (%s)' % report_format)
+    if report_format == 'csv':
+        yield csv_line(ATTENDANCE_REPORT_FIELDS)
+        for row in rows:
+            yield csv_line(row)
+    else:
+        for row in rows:
+            yield ndjson_line(OrderedDict(zip(ATTENDANCE_REPORT_FIELDS, row)))
+
+
+def write_attendance_report(rows, out, report_format='csv'):
+    """
+    Write the given attendance rows to the (binary) file object `out`,
+    returning the number of rows written; e.g. from a background job for
+    large sites.
+    """
+    count = [0]
+
+    def _counted():
+        for row in rows:
+            count[0] += 1
+            yield row
+
+    for line in iter_attendance_report_lines(_counted(), report_format):
+        out.write(line)
+    return count[0]
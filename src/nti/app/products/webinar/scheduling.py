@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A persistent, next-due ordered index for webinar progress polling.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import calendar
+
+from datetime import datetime
+from datetime import timedelta
+
+from BTrees.LLBTree import LLBTree
+from BTrees.LLBTree import LLTreeSet
+
+from BTrees.LOBTree import LOBTree
+
+from BTrees.Length import Length
+
+from persistent import Persistent
+
+from zope import component
+from zope import interface
+
+from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IIntIdAddedEvent
+from zope.intid.interfaces import IIntIdRemovedEvent
+
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
+
+from nti.app.products.webinar.interfaces import IWebinar
+from nti.app.products.webinar.interfaces import IWebinarProgressSchedule
+from nti.app.products.webinar.interfaces import IWebinarProgressUpdatedEvent
+
+from nti.app.products.webinar.progress import next_progress_update_time
+
+from nti.site.utils import registerUtility
+
+#: Webinars handed out as due are rescheduled this far out until their
+#: progress is updated, so failed or skipped updates are retried.
+PROGRESS_RETRY_DELAY = timedelta(hours=1)
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _to_timestamp(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+
+@interface.implementer(IWebinarProgressSchedule)
+class WebinarProgressSchedule(Persistent):
+
+    __parent__ = None
+    __name__ = None
+
+    def __init__(self):
+        # due timestamp -> intids
+        self._by_due = LOBTree()
+        # intid -> due timestamp
+        self._due_for = LLBTree()
+        self._length = Length()
+
+    def __len__(self):
+        return self._length()
+
+    def unschedule(self, intid):
+        due = self._due_for.get(intid)
+        if due is None:
+            return
+        del self._due_for[intid]
+        self._length.change(-1)
+        intids = self._by_due.get(due)
+        if intids is not None:
+            intids.remove(intid)
+            if not intids:
+                del self._by_due[due]
+
+    def schedule(self, intid, due):
+        if due is None:
+            self.unschedule(intid)
+            return
+        due = _to_timestamp(due)
+        if self._due_for.get(intid) == due:
+            return
+        self.unschedule(intid)
+        self._due_for[intid] = due
+        self._length.change(1)
+        intids = self._by_due.get(due)
+        if intids is None:
+            intids = self._by_due[due] = LLTreeSet()
+        intids.insert(intid)
+
+    def get_due_time(self, intid):
+        due = self._due_for.get(intid)
+        return datetime.utcfromtimestamp(due) if due is not None else None
+
+    def pop_due(self, now=None, limit=None):
+        now = _to_timestamp(now or datetime.utcnow())
+        result = []
+        for due in list(self._by_due.keys(max=now)):
+            for intid in list(self._by_due[due]):
+                if limit is not None and len(result) >= limit:
+                    return result
+                self.unschedule(intid)
+                result.append(intid)
+        return result
+
+
+def install_webinar_progress_schedule(site_manager):
+    """
+    Register a :class:`IWebinarProgressSchedule` in the given (dataserver)
+    site manager, unless we already have one; see our generations.
+    """
+    result = site_manager.queryUtility(IWebinarProgressSchedule)
+    if result is None:
+        result = WebinarProgressSchedule()
+        result.__parent__ = site_manager
+        registerUtility(site_manager,
+                        component=result,
+                        provided=IWebinarProgressSchedule)
+    return result
+
+
+def get_webinar_progress_schedule():
+    """
+    Return the :class:`IWebinarProgressSchedule` installed in the dataserver
+    site (and visible from its child sites), or None.
+    """
+    return component.queryUtility(IWebinarProgressSchedule)
+
+
+def reschedule_webinar_progress(webinar):
+    """
+    Update the schedule with the next progress update time for the webinar.
+    """
+    intids = component.queryUtility(IIntIds)
+    intid = intids.queryId(webinar) if intids is not None else None
+    if intid is None:
+        return
+    schedule = get_webinar_progress_schedule()
+    if schedule is not None:
+        schedule.schedule(intid, next_progress_update_time(webinar))
+
+
+def unschedule_webinar_progress(webinar):
+    intids = component.queryUtility(IIntIds)
+    intid = intids.queryId(webinar) if intids is not None else None
+    schedule = get_webinar_progress_schedule()
+    if intid is not None and schedule is not None:
+        schedule.unschedule(intid)
+
+
+def pop_due_webinars(now=None, limit=None):
+    """
+    Return the webinars whose progress is due. Each is rescheduled for a
+    retry after :data:`PROGRESS_RETRY_DELAY`; successfully updating its
+    progress reschedules it for its next update instead.
+    """
+    schedule = get_webinar_progress_schedule()
+    if schedule is None:
+        return []
+    now = now or datetime.utcnow()
+    intids = component.getUtility(IIntIds)
+    result = []
+    for intid in schedule.pop_due(now, limit):
+        webinar = intids.queryObject(intid)
+        if IWebinar.providedBy(webinar):
+            if next_progress_update_time(webinar) is not None:
+                schedule.schedule(intid, now + PROGRESS_RETRY_DELAY)
+            result.append(webinar)
+    return result
+
+
+@component.adapter(IWebinar, IIntIdAddedEvent)
+def _on_webinar_added(webinar, unused_event=None):
+    reschedule_webinar_progress(webinar)
+
+
+@component.adapter(IWebinar, IObjectModifiedEvent)
+def _on_webinar_modified(webinar, unused_event=None):
+    reschedule_webinar_progress(webinar)
+
+
+@component.adapter(IWebinar, IWebinarProgressUpdatedEvent)
+def _on_webinar_progress_updated(webinar, unused_event=None):
+    reschedule_webinar_progress(webinar)
+
+
+@component.adapter(IWebinar, IIntIdRemovedEvent)
+def _on_webinar_removed(webinar, unused_event=None):
+    unschedule_webinar_progress(webinar)
@@ -38,3 +38,92 @@ class SharedConfiguringTestLayer(ZopeComponentLayer,
     @classmethod
     def testTearDown(cls):
         pass
+
+
+class _IntIds(object):
+    """
+    A minimal, in-memory stand-in for our intids utility.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.refs = {}
+
+    def register(self, obj):
+        intid = self.ids[id(obj)] = len(self.ids) + 1
+        self.refs[intid] = obj
+        return intid
+
+    def __iter__(self):
+        return iter(sorted(self.refs))
+
+    def queryId(self, obj, default=None):
+        return self.ids.get(id(obj), default)
+
+    def queryObject(self, intid, default=None):
+        return self.refs.get(intid, default)
+
+
+class _MockLock(object):
+
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.name = name
+
+    def acquire(self, blocking=True):
+        if self.name in self.redis.locks:
+            return False
+        self.redis.locks.add(self.name)
+        return True
+
+    def release(self):
+        self.redis.locks.discard(self.name)
+
+
+class _MockPipeline(object):
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(lambda: self.redis.get(key))
+
+    def ttl(self, key):
+        self.calls.append(lambda: 100 if key in self.redis.data else -2)
+
+    def execute(self):
+        return [x() for x in self.calls]
+
+
+class _MockRedis(object):
+    """
+    A minimal, in-memory stand-in for a redis client, recording the
+    scripts it runs in `calls`.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.locks = set()
+        self.calls = []
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, time, value):  # pylint: disable=redefined-outer-name
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self):
+        return _MockPipeline(self)
+
+    def lock(self, name, unused_timeout):
+        return _MockLock(self, name)
+
+    def register_script(self, script):
+        def _run(keys=(), args=()):
+            self.calls.append((script, keys, args))
+        return _run
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the fast and generic internalization of attendee (progress)
+records. Run with::
+
+    python -m nti.app.products.webinar.tests.bench_internalization [count]
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access
+
+import sys
+import copy
+import time
+
+from nti.externalization.internalization import update_from_external_object
+
+from nti.app.products.webinar.client_models import UserWebinarProgress
+from nti.app.products.webinar.client_models import _user_webinar_progress_decoder
+
+from nti.app.products.webinar.interfaces import IUserWebinarAttendance
+
+from nti.app.products.webinar.tests import SharedConfiguringTestLayer
+
+DEFAULT_COUNT = 10000
+
+
+def _records(count):
+    return [{"registrantKey": 100000000 + i,
+             "firstName": u"first",
+             "lastName": u"last",
+             "email": u"user%s@example.com" % i,
+             "attendanceTimeInSeconds": 1800,
+             "sessionKey": 999999,
+             "attendance": [{"joinTime": u"2018-07-24T20:00:00Z",
+                             "leaveTime": u"2018-07-24T20:15:00Z"},
+                            {"joinTime": u"2018-07-24T20:20:00Z",
+                             "leaveTime": u"2018-07-24T20:35:00Z"}]}
+            for i in range(count)]
+
+
+def _generic(ext):
+    obj = UserWebinarProgress()
+    for key in ('registrantKey', 'sessionKey'):
+        ext[key] = str(ext[key])
+    ext['attendance'] = [IUserWebinarAttendance(x) for x in ext['attendance']]
+    update_from_external_object(obj, ext)
+    return obj
+
+
+def _time(func, records):
+    start = time.time()
+    for ext in records:
+        func(ext)
+    return time.time() - start
+
+
+def main(count=DEFAULT_COUNT):
+    SharedConfiguringTestLayer.setUp()
+    try:
+        records = _records(count)
+        generic = _time(_generic, copy.deepcopy(records))
+        fast = _time(_user_webinar_progress_decoder, records)
+    finally:
+        SharedConfiguringTestLayer.tearDown()
+    print('%s attendee records' % count)
+    print('generic: %.3fs (%.1f us/record)' % (generic, generic / count * 1e6))
+    print('fast:    %.3fs (%.1f us/record)' % (fast, fast / count * 1e6))
+    print('speedup: %.1fx' % (generic / fast if fast else float('inf')))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT)
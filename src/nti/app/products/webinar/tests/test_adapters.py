@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import not_none
+from hamcrest import assert_that
+
+import unittest
+
+from zope import component
+from zope import interface
+
+from zope.annotation.interfaces import IAnnotations
+from zope.annotation.interfaces import IAttributeAnnotatable
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.products.webinar import adapters
+
+from nti.app.products.webinar.adapters import is_user_registered
+from nti.app.products.webinar.adapters import is_webinar_integration_available
+from nti.app.products.webinar.adapters import WEBINAR_REGISTRATION_CONTAINER_KEY
+from nti.app.products.webinar.adapters import get_user_registered_webinar_intids
+from nti.app.products.webinar.adapters import WebinarRegistrationMetadataContainer
+
+from nti.app.products.webinar.interfaces import IGoToWebinarAuthorizedIntegration
+
+from nti.app.products.webinar.interfaces import IWebinarRegistrationMetadata
+
+from nti.app.products.webinar.tests import _IntIds
+from nti.app.products.webinar.tests import SharedConfiguringTestLayer
+
+
+def _metadata(registrant_key):
+    return IWebinarRegistrationMetadata({"organizer_key": u"111111111111",
+                                         "webinar_key": u"222222222222",
+                                         "registrant_key": registrant_key,
+                                         "join_url": u"http://reg_url"})
+
+
+class TestRegistrationContainer(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def test_registrant_index(self):
+        container = WebinarRegistrationMetadataContainer()
+        container[u'user1'] = _metadata(u'reg1')
+        container[u'user2'] = _metadata(u'reg2')
+        assert_that(container.get_username(u'reg1'), is_(u'user1'))
+        assert_that(container.get_username(u'reg2'), is_(u'user2'))
+        assert_that(container.get_username(u'reg3'), none())
+
+        del container[u'user1']
+        assert_that(container.get_username(u'reg1'), none())
+
+        # Legacy containers are scanned, without writing, until indexed
+        container._registrant_index = None
+        assert_that(container.get_username(u'reg2'), is_(u'user2'))
+        assert_that(container._registrant_index, none())
+        assert_that(container.index_registrants(), is_(True))
+        assert_that(container.index_registrants(), is_(False))
+        assert_that(dict(container._registrant_index), is_({u'reg2': u'user2'}))
+
+        # Writes index legacy containers, and drop any scan
+        container._registrant_index = None
+        assert_that(container.get_username(u'reg3'), none())
+        container[u'user3'] = _metadata(u'reg3')
+        assert_that(container.get_username(u'reg3'), is_(u'user3'))
+        assert_that(container._registrant_index, is_(not_none()))
+
+
+class _Webinar(object):
+
+    def __init__(self, organizer_key):
+        self.organizerKey = organizer_key
+
+
+class _Integration(object):
+
+    organizer_key = u'111111111111'
+
+
+class _Request(object):
+
+    def __init__(self):
+        self.environ = {}
+
+
+class TestIntegrationAvailability(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def test_availability(self):
+        webinar = _Webinar(u'111111111111')
+        other_webinar = _Webinar(u'999999999999')
+        request = _Request()
+        assert_that(is_webinar_integration_available(webinar, request), is_(False))
+
+        request = _Request()
+        gsm = component.getGlobalSiteManager()
+        integration = _Integration()
+        gsm.registerUtility(integration, IGoToWebinarAuthorizedIntegration)
+        try:
+            assert_that(is_webinar_integration_available(webinar, request), is_(True))
+            assert_that(is_webinar_integration_available(other_webinar, request),
+                        is_(False))
+        finally:
+            gsm.unregisterUtility(integration, IGoToWebinarAuthorizedIntegration)
+        # Memoized for the request
+        assert_that(is_webinar_integration_available(webinar, request), is_(True))
+        assert_that(is_webinar_integration_available(webinar, _Request()), is_(False))
+
+
+@interface.implementer(IAttributeAnnotatable)
+class _User(object):
+
+    def __init__(self, username):
+        self.username = username
+
+
+class _Users(object):
+
+    def __init__(self, *usernames):
+        self.users = dict((x, _User(x)) for x in usernames)
+
+    def get_user(self, username):
+        return self.users.get(username)
+
+
+@interface.implementer(IAttributeAnnotatable)
+class _IndexedWebinar(object):
+
+    def __init__(self, webinar_key):
+        self.webinarKey = webinar_key
+
+
+class TestUserRegistrationIndex(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.users = _Users(u'user1', u'user2')
+        self.old_user = adapters.User
+        adapters.User = self.users
+        self.intids = _IntIds()
+        component.getGlobalSiteManager().registerUtility(self.intids, IIntIds)
+
+    def tearDown(self):
+        adapters.User = self.old_user
+        component.getGlobalSiteManager().unregisterUtility(self.intids, IIntIds)
+
+    def _intids(self, username):
+        intids = get_user_registered_webinar_intids(self.users.get_user(username))
+        return set(intids or ())
+
+    def test_user_index(self):
+        # Webinars with the same key are indexed apart, by intid
+        webinar = _IndexedWebinar(u'222')
+        webinar_id = self.intids.register(webinar)
+        container = WebinarRegistrationMetadataContainer()
+        container.__parent__ = webinar
+        container[u'user1'] = _metadata(u'reg1')
+        container[u'user2'] = _metadata(u'reg2')
+        assert_that(self._intids(u'user1'), is_({webinar_id}))
+        assert_that(self._intids(u'user2'), is_({webinar_id}))
+
+        other = _IndexedWebinar(u'222')
+        other_id = self.intids.register(other)
+        other_container = WebinarRegistrationMetadataContainer()
+        other_container.__parent__ = other
+        other_container[u'user1'] = _metadata(u'reg3')
+        assert_that(self._intids(u'user1'), is_({webinar_id, other_id}))
+
+        del container[u'user1']
+        assert_that(self._intids(u'user1'), is_({other_id}))
+
+        user1 = self.users.get_user(u'user1')
+        request = _Request()
+        assert_that(is_user_registered(user1, webinar, request), is_(False))
+        assert_that(is_user_registered(user1, other, request), is_(True))
+        # A single read of the user's registrations per request
+        container[u'user1'] = _metadata(u'reg1')
+        assert_that(is_user_registered(user1, webinar, request), is_(False))
+        assert_that(is_user_registered(user1, webinar, _Request()), is_(True))
+
+        # Removed webinars drop out of the index
+        adapters._on_webinar_removed(other)
+        assert_that(self._intids(u'user1'), is_({webinar_id}))
+
+        # Our generation indexes existing registrations
+        user1.__annotations__.clear()
+        assert_that(container.index_user_registrations(), is_(True))
+        assert_that(self._intids(u'user1'), is_({webinar_id}))
+
+    def test_without_intid(self):
+        # Webinars without intids are not indexed, but looked up directly
+        webinar = _IndexedWebinar(u'222')
+        container = WebinarRegistrationMetadataContainer()
+        container.__parent__ = webinar
+        container[u'user1'] = _metadata(u'reg1')
+        assert_that(self._intids(u'user1'), is_(set()))
+        assert_that(container.index_user_registrations(), is_(False))
+        IAnnotations(webinar)[WEBINAR_REGISTRATION_CONTAINER_KEY] = container
+        assert_that(is_user_registered(self.users.get_user(u'user1'), webinar),
+                    is_(True))
+        assert_that(is_user_registered(self.users.get_user(u'user2'), webinar),
+                    is_(False))
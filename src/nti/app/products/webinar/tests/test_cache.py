@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import has_length
+from hamcrest import none
+from hamcrest import not_none
+from hamcrest import assert_that
+
+import unittest
+
+from nti.app.products.webinar.cache import UPCOMING_WEBINARS_LISTING
+
+from nti.app.products.webinar.cache import WebinarListingCache
+from nti.app.products.webinar.cache import WebinarListingIndex
+
+from nti.app.products.webinar.cache import normalize_registration_url
+
+from nti.app.products.webinar.tests import _MockRedis
+
+
+class TestListingCache(unittest.TestCase):
+
+    def test_cache(self):
+        cache = WebinarListingCache(u'1111', _MockRedis(), ttl=60)
+        assert_that(cache.get(UPCOMING_WEBINARS_LISTING), none())
+
+        cache.store(UPCOMING_WEBINARS_LISTING, [{'webinarKey': 2222}], u'"etag"')
+        entry = cache.get(UPCOMING_WEBINARS_LISTING)
+        assert_that(entry, not_none())
+        assert_that(entry['data'], is_([{'webinarKey': 2222}]))
+        assert_that(entry['etag'], is_(u'"etag"'))
+        assert_that(cache.is_fresh(entry), is_(True))
+        assert_that(cache.is_fresh(entry, now=entry['fetched'] + 61), is_(False))
+
+        entry['fetched'] -= 120
+        cache.touch(UPCOMING_WEBINARS_LISTING, entry)
+        assert_that(cache.is_fresh(cache.get(UPCOMING_WEBINARS_LISTING)), is_(True))
+
+        cache.invalidate()
+        assert_that(cache.get(UPCOMING_WEBINARS_LISTING), none())
+
+
+class TestListingIndex(unittest.TestCase):
+
+    def test_normalize(self):
+        assert_that(normalize_registration_url(u'HTTP://Register.GotoWebinar.com/register/123/'),
+                    is_(u'https://register.gotowebinar.com/register/123'))
+        assert_that(normalize_registration_url(None), none())
+
+    def test_lookup(self):
+        webinars = [{'webinarKey': 1, 'registrationUrl': u'https://reg/1'},
+                    {'webinarKey': 2, 'registrationUrl': u'https://reg/series'},
+                    {'webinarKey': 3, 'registrationUrl': u'https://reg/series'},
+                    {'webinarKey': 4, 'registrationUrl': None}]
+        index = WebinarListingIndex(webinars)
+        assert_that(index.lookup(u'1'), contains(webinars[0]))
+        assert_that(index.lookup(u'4'), contains(webinars[3]))
+        assert_that(index.lookup(u'http://REG/series/'), has_length(2))
+        assert_that(index.lookup(u'https://reg/dne'), has_length(0))
+        assert_that(index.lookup(u'5'), has_length(0))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import calling
+from hamcrest import raises
+from hamcrest import assert_that
+
+import unittest
+
+from nti.app.products.webinar.circuit import OrganizerCircuitBreaker
+
+from nti.app.products.webinar.circuit import reset_local_circuits
+
+from nti.app.products.webinar.interfaces import WebinarClientError
+from nti.app.products.webinar.interfaces import WebinarCircuitOpenError
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        reset_local_circuits()
+
+    def tearDown(self):
+        reset_local_circuits()
+
+    def _fail(self, breaker, count):
+        for _ in range(count):
+            breaker.record_failure(breaker.before_call())
+
+    def test_circuit(self):
+        breaker = OrganizerCircuitBreaker(u'org', failure_threshold=3,
+                                          reset_timeout=60)
+        # Successes reset the failure count
+        self._fail(breaker, 2)
+        breaker.record_success(breaker.before_call())
+        self._fail(breaker, 2)
+        breaker.before_call()
+
+        # Shared by all breakers for the organizer
+        other = OrganizerCircuitBreaker(u'org', failure_threshold=3,
+                                        reset_timeout=60)
+        self._fail(other, 1)
+        assert_that(calling(breaker.before_call),
+                    raises(WebinarCircuitOpenError))
+        assert_that(issubclass(WebinarCircuitOpenError, WebinarClientError),
+                    is_(True))
+        OrganizerCircuitBreaker(u'org2').before_call()
+
+    def test_half_open(self):
+        breaker = OrganizerCircuitBreaker(u'org', failure_threshold=1,
+                                          reset_timeout=0)
+        self._fail(breaker, 1)
+        # A single trial call is let through
+        ticket = breaker.before_call()
+        assert_that(ticket.trial, is_(True))
+        assert_that(calling(breaker.before_call),
+                    raises(WebinarCircuitOpenError))
+        # A failed trial re-opens, a successful one closes
+        breaker.record_failure(ticket)
+        ticket = breaker.before_call()
+        assert_that(ticket.trial, is_(True))
+        breaker.record_success(ticket)
+        ticket = breaker.before_call()
+        assert_that(ticket.trial, is_(False))
+        assert_that(ticket.dirty, is_(False))
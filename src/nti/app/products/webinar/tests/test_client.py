@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import contains
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import starts_with
+
+import threading
+import unittest
+
+from datetime import datetime
+
+from six.moves import urllib_parse
+
+from nti.app.products.webinar.client import GoToWebinarClient
+from nti.app.products.webinar.client import WebinarRegistrationResult
+
+from nti.app.products.webinar.interfaces import WebinarUnauthorizedError
+
+from nti.app.products.webinar.tests import SharedConfiguringTestLayer
+
+
+class MockIntegration(object):
+
+    organizer_key = u'111111111111'
+    access_token = u'access_token'
+
+
+class MockResponse(object):
+
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.headers = {}
+
+    def json(self):
+        return self.data
+
+
+class MockClient(GoToWebinarClient):
+
+    def __init__(self, responses):
+        super(MockClient, self).__init__(MockIntegration())
+        self.responses = responses
+        self.urls = []
+
+    def _make_call(self, url, *unused_args, **unused_kwargs):
+        self.urls.append(url)
+        return self.responses.pop(0)
+
+
+class MockRegistrationClient(GoToWebinarClient):
+    """
+    Responds to registrant posts by the registrant's email.
+    """
+
+    def __init__(self, responses):
+        super(MockRegistrationClient, self).__init__(MockIntegration())
+        self.responses = responses
+        self.lock = threading.Lock()
+        self.refreshes = []
+
+    def _update_access_token(self):
+        self.refreshes.append(threading.current_thread())
+
+    def _make_call(self, unused_url, post_data=None, *unused_args, **unused_kwargs):
+        with self.lock:
+            response = self.responses[post_data['email']].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        if response.status_code == 401 and not self._can_refresh_token:
+            raise WebinarUnauthorizedError('Webinar access token rejected (401)')
+        return response
+
+
+def _query(url):
+    return dict(urllib_parse.parse_qsl(urllib_parse.urlparse(url).query))
+
+
+class TestClient(unittest.TestCase):
+
+    def test_iter_webinars(self):
+        def _page(keys, number, total):
+            return MockResponse({'_embedded': {'webinars': [{'webinarKey': x} for x in keys]},
+                                 'page': {'number': number,
+                                          'size': 2,
+                                          'totalPages': total}})
+        client = MockClient([_page((1, 2), 0, 2), _page((3,), 1, 2)])
+        webinars = client.iter_webinars(datetime(2018, 1, 1),
+                                        datetime(2019, 1, 1),
+                                        page_size=2,
+                                        raw=True)
+        # Lazy
+        assert_that(client.urls, has_length(0))
+        assert_that([x['webinarKey'] for x in webinars], contains(1, 2, 3))
+        assert_that(client.urls, has_length(2))
+        assert_that(client.urls[0], starts_with('/organizers/111111111111/webinars?'))
+        assert_that(_query(client.urls[0]),
+                    is_({'fromTime': '2018-01-01T00:00:00Z',
+                         'toTime': '2019-01-01T00:00:00Z',
+                         'page': '0',
+                         'size': '2'}))
+        assert_that(_query(client.urls[1])['page'], is_('1'))
+
+        # Unpaged responses
+        client = MockClient([MockResponse([{'webinarKey': 1}])])
+        webinars = client.iter_webinars(datetime(2018, 1, 1),
+                                        datetime(2019, 1, 1),
+                                        raw=True)
+        assert_that(list(webinars), has_length(1))
+
+
+class _User(object):
+
+    def __init__(self, username):
+        self.username = username
+
+
+class TestClientRegistration(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def test_register_users(self):
+        def _registered(key):
+            return MockResponse({'registrantKey': key,
+                                 'joinUrl': u'http://join/%s' % key},
+                                201)
+        unauthorized = MockResponse({}, 401)
+        client = MockRegistrationClient(
+            {'user1': [_registered(1)],
+             'user2': [MockResponse({'registrantKey': 2,
+                                     'joinUrl': u'http://join/2'}, 409)],
+             'user3': [MockResponse({'description': u'invalid'}, 400)],
+             'user4': [unauthorized, _registered(4)],
+             'user5': [unauthorized, _registered(5)],
+             'user6': [RuntimeError('boom')],
+             'user7': [MockResponse([], 201)]})
+        usernames = ('user1', 'user2', 'user3', 'user4', 'user5', 'user6', 'user7')
+        registrations = [(_User(x), {'email': x}) for x in usernames]
+        results = client.register_users(u'222', registrations, max_workers=2)
+        assert_that([x.username for x in results], contains(*usernames))
+        assert_that([x.status for x in results],
+                    contains(WebinarRegistrationResult.REGISTERED,
+                             WebinarRegistrationResult.ALREADY_REGISTERED,
+                             WebinarRegistrationResult.INVALID,
+                             WebinarRegistrationResult.REGISTERED,
+                             WebinarRegistrationResult.REGISTERED,
+                             WebinarRegistrationResult.FAILED,
+                             WebinarRegistrationResult.FAILED))
+        assert_that(results[0].metadata.registrant_key, is_(u'1'))
+        assert_that(results[0].metadata.creator, is_('user1'))
+        assert_that(results[1].metadata.join_url, is_(u'http://join/2'))
+        assert_that(results[2].metadata, none())
+        assert_that(results[2].error, is_({'description': u'invalid'}))
+        assert_that(results[3].metadata.registrant_key, is_(u'4'))
+        assert_that(results[4].metadata.registrant_key, is_(u'5'))
+        # Unexpected errors only fail that user
+        assert_that(results[5].metadata, none())
+        assert_that(results[5].error, is_('boom'))
+        assert_that(results[6].metadata, none())
+
+        # Rejected tokens are refreshed once, on our thread, never by workers
+        assert_that(client.refreshes, contains(threading.current_thread()))
+
+        assert_that(client.register_users(u'222', ()), is_([]))
@@ -8,6 +8,9 @@ from __future__ import absolute_import
 # pylint: disable=protected-access,too-many-public-methods
 
 from hamcrest import is_
+from hamcrest import none
+from hamcrest import calling
+from hamcrest import raises
 from hamcrest import not_none
 from hamcrest import has_length
 from hamcrest import assert_that
@@ -20,11 +23,23 @@ from nti.testing.matchers import verifiably_provides
 
 from nti.externalization.externalization import to_external_object
 
+from nti.externalization.internalization import update_from_external_object
+
+from nti.app.products.webinar.client_models import Webinar
+from nti.app.products.webinar.client_models import WebinarField
+from nti.app.products.webinar.client_models import UserWebinarProgress
+from nti.app.products.webinar.client_models import WebinarSummary
+from nti.app.products.webinar.client_models import _fast_decode
+from nti.app.products.webinar.client_models import _webinar_decoder
+from nti.app.products.webinar.client_models import _webinar_field_decoder
+from nti.app.products.webinar.client_models import _user_webinar_progress_decoder
+
 from nti.app.products.webinar.tests import SharedConfiguringTestLayer
 
 from nti.app.products.webinar.interfaces import IWebinar
 from nti.app.products.webinar.interfaces import IWebinarField
 from nti.app.products.webinar.interfaces import IWebinarSession
+from nti.app.products.webinar.interfaces import IWebinarSummary
 from nti.app.products.webinar.interfaces import IWebinarQuestion
 from nti.app.products.webinar.interfaces import IWebinarCollection
 from nti.app.products.webinar.interfaces import IUserWebinarProgress
@@ -110,6 +125,32 @@ class TestWebinarClientInternalization(unittest.TestCase):
         assert_that(collection_ext['webinars'], has_length(1))
         assert_that(collection_ext['webinars'][0]['times'], has_length(1))
 
+    def test_webinar_summary(self):
+        summary = WebinarSummary.from_external(dict(webinar_json,
+                                                    registrationUrl=u''))
+        assert_that(IWebinarSummary.providedBy(summary), is_(True))
+        assert_that(summary.webinarKey, is_(u"222222222222"))
+        assert_that(summary.organizerKey, is_(u"111111111111"))
+        assert_that(summary.registrationUrl, none())
+        assert_that(summary.times, has_length(1))
+        assert_that(summary.times[0].startTime, is_(u"2018-07-09T17:00:00Z"))
+        assert_that(calling(setattr).with_args(summary, 'subject', u'x'),
+                    raises(AttributeError))
+
+        ext = to_external_object(summary)
+        assert_that(ext['MimeType'], is_(Webinar.mimeType))
+        assert_that(ext['subject'], is_(u'subject'))
+        assert_that(ext['times'], has_length(1))
+        assert_that(ext['times'][0]['endTime'], is_(u"2018-07-09T18:00:00Z"))
+
+        # Promotion to a persistent, storable webinar
+        webinar = IWebinar(summary)
+        assert_that(webinar, verifiably_provides(IWebinar))
+        assert_that(webinar, is_(Webinar))
+        assert_that(webinar.webinarKey, is_(u"222222222222"))
+        assert_that(webinar.times, has_length(1))
+        assert_that(webinar.times[0], verifiably_provides(IWebinarSession))
+
     def test_webinar_registration(self):
         registration_data = self._load_resource('fields.json')
         fields = IWebinarRegistrationFields(registration_data)
@@ -150,3 +191,36 @@ class TestWebinarClientInternalization(unittest.TestCase):
         assert_that(attendance, verifiably_provides(IUserWebinarAttendance))
         assert_that(attendance.joinTime, not_none())
         assert_that(attendance.leaveTime, not_none())
+
+    def test_fast_decoders(self):
+        # The fast path builds the same objects as the generic path
+        progress = _fast_decode(_user_webinar_progress_decoder, dict(user_progress))
+        assert_that(progress, is_(UserWebinarProgress))
+        generic = UserWebinarProgress()
+        ext = dict(user_progress)
+        ext['registrantKey'] = u'111111111'
+        ext['sessionKey'] = u'999999'
+        ext['attendance'] = [IUserWebinarAttendance(x) for x in ext['attendance']]
+        update_from_external_object(generic, ext)
+        for name in ('registrantKey', 'sessionKey', 'email',
+                     'attendanceTimeInSeconds'):
+            assert_that(getattr(progress, name), is_(getattr(generic, name)))
+        assert_that(progress.attendance[0].joinTime,
+                    is_(generic.attendance[0].joinTime))
+        assert_that(progress.attendance[0].leaveTime,
+                    is_(generic.attendance[0].leaveTime))
+
+        webinar = _fast_decode(_webinar_decoder, dict(webinar_json))
+        assert_that(webinar, verifiably_provides(IWebinar))
+        assert_that(webinar.webinarKey, is_(u"222222222222"))
+        assert_that(webinar.times[0], verifiably_provides(IWebinarSession))
+
+        # Unexpected shapes fall back to the generic path
+        field_ext = {'field': u'firstName', 'maxSize': u'128', 'required': True}
+        assert_that(_fast_decode(_webinar_field_decoder, dict(field_ext)),
+                    none())
+        field = IWebinarField(dict(field_ext))
+        assert_that(field, is_(WebinarField))
+        assert_that(field.maxSize, is_(128))
+        assert_that(_fast_decode(_webinar_decoder, {'subject': u'subject'}),
+                    none())
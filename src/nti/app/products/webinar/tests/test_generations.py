@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import same_instance
+from hamcrest import assert_that
+
+import unittest
+
+from zope import component
+
+from zope.annotation.interfaces import IAnnotations
+
+from zope.intid.interfaces import IIntIds
+
+from zope.interface.registry import Components
+
+from nti.app.products.webinar import adapters
+
+from nti.app.products.webinar.adapters import WEBINAR_REGISTRATION_CONTAINER_KEY
+
+from nti.app.products.webinar.adapters import WebinarRegistrationMetadataContainer
+
+from nti.app.products.webinar.generations import utils as generation_utils
+
+from nti.app.products.webinar.generations.evolve1 import index_registrants
+
+from nti.app.products.webinar.generations.evolve2 import schedule_webinars
+
+from nti.app.products.webinar.generations.evolve3 import index_user_registrations
+
+from nti.app.products.webinar.generations.evolve4 import index_webinar_organizers
+
+from nti.app.products.webinar.generations.utils import iter_webinars
+
+from nti.app.products.webinar.interfaces import IWebinar
+from nti.app.products.webinar.interfaces import IWebinarOrganizerIndex
+from nti.app.products.webinar.interfaces import IWebinarProgressSchedule
+
+from nti.app.products.webinar.organizers import install_webinar_organizer_index
+
+from nti.app.products.webinar.scheduling import install_webinar_progress_schedule
+
+from nti.app.products.webinar.tests import _IntIds
+from nti.app.products.webinar.tests import SharedConfiguringTestLayer
+
+from nti.app.products.webinar.tests.test_adapters import _Users
+from nti.app.products.webinar.tests.test_adapters import _metadata
+
+from nti.app.products.webinar.tests.test_webinar_progress import webinar_json
+
+
+class _Connection(object):
+
+    collected = 0
+
+    def cacheGC(self):
+        self.collected += 1
+
+
+def _registration_container(webinar, **registrations):
+    result = WebinarRegistrationMetadataContainer()
+    for username, registrant_key in registrations.items():
+        result[username] = _metadata(registrant_key)
+    result.__parent__ = webinar
+    IAnnotations(webinar)[WEBINAR_REGISTRATION_CONTAINER_KEY] = result
+    return result
+
+
+class TestGenerations(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def test_iter_webinars(self):
+        webinar = IWebinar(dict(webinar_json))
+        intids = _IntIds()
+        for obj in (object(), webinar, None):
+            intids.register(obj)
+        connection = _Connection()
+        old_interval = generation_utils.CACHE_GC_INTERVAL
+        generation_utils.CACHE_GC_INTERVAL = 2
+        try:
+            assert_that(list(iter_webinars(intids, connection)), is_([webinar]))
+        finally:
+            generation_utils.CACHE_GC_INTERVAL = old_interval
+        assert_that(connection.collected, is_(1))
+
+    def test_index_registrants(self):
+        legacy = IWebinar(dict(webinar_json))
+        container = _registration_container(legacy, user1=u'reg1')
+        container._registrant_index = None
+        indexed = IWebinar(dict(webinar_json))
+        _registration_container(indexed, user2=u'reg2')
+        empty = IWebinar(dict(webinar_json))
+
+        assert_that(index_registrants([legacy, indexed, empty]), is_(1))
+        assert_that(dict(container._registrant_index), is_({u'reg1': u'user1'}))
+        assert_that(index_registrants([legacy]), is_(0))
+        assert_that(container._registrant_index.get(u'reg2'), none())
+
+    def test_index_user_registrations(self):
+        users = _Users(u'user1')
+        old_user = adapters.User
+        adapters.User = users
+        intids = _IntIds()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(intids, IIntIds)
+        try:
+            webinar = IWebinar(dict(webinar_json))
+            _registration_container(webinar, user1=u'reg1')
+            unregistered = IWebinar(dict(webinar_json))
+            _registration_container(unregistered, user1=u'reg2')
+            empty = IWebinar(dict(webinar_json))
+            webinar_id = intids.register(webinar)
+            intids.register(empty)
+
+            # Webinars without intids, or registrations, are skipped
+            assert_that(index_user_registrations([webinar, unregistered, empty]),
+                        is_(1))
+            registered = adapters.get_user_registered_webinar_intids(users.get_user(u'user1'))
+            assert_that(set(registered), is_({webinar_id}))
+        finally:
+            adapters.User = old_user
+            gsm.unregisterUtility(intids, IIntIds)
+
+    def test_install_schedule(self):
+        site_manager = Components()
+        schedule = install_webinar_progress_schedule(site_manager)
+        assert_that(site_manager.getUtility(IWebinarProgressSchedule),
+                    same_instance(schedule))
+        assert_that(schedule.__parent__, same_instance(site_manager))
+        # Idempotent
+        assert_that(install_webinar_progress_schedule(site_manager),
+                    same_instance(schedule))
+
+        # Without intids (or a schedule), webinars are simply skipped
+        webinar = IWebinar(dict(webinar_json))
+        assert_that(schedule_webinars([webinar]), is_(1))
+
+    def test_index_webinar_organizers(self):
+        webinar = IWebinar(dict(webinar_json))
+        # Without intids (or an index), webinars are simply skipped
+        assert_that(index_webinar_organizers([webinar]), is_(1))
+
+        intids = _IntIds()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(intids, IIntIds)
+        site_manager = Components()
+        index = install_webinar_organizer_index(site_manager)
+        assert_that(site_manager.getUtility(IWebinarOrganizerIndex),
+                    same_instance(index))
+        assert_that(install_webinar_organizer_index(site_manager),
+                    same_instance(index))
+        gsm.registerUtility(index, IWebinarOrganizerIndex)
+        try:
+            webinar_id = intids.register(webinar)
+            unregistered = IWebinar(dict(webinar_json))
+            assert_that(index_webinar_organizers([webinar, unregistered]), is_(2))
+            assert_that(list(index.get_intids(webinar.organizerKey)),
+                        is_([webinar_id]))
+        finally:
+            gsm.unregisterUtility(intids, IIntIds)
+            gsm.unregisterUtility(index, IWebinarOrganizerIndex)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import is_not
+from hamcrest import assert_that
+from hamcrest import same_instance
+
+import unittest
+
+from nti.app.products.webinar.http_pool import get_http_session
+from nti.app.products.webinar.http_pool import reset_http_session
+from nti.app.products.webinar.http_pool import get_http_pool_stats
+from nti.app.products.webinar.http_pool import configure_http_session
+
+
+class TestHTTPPool(unittest.TestCase):
+
+    def tearDown(self):
+        configure_http_session()
+
+    def test_shared_session(self):
+        session = get_http_session()
+        assert_that(get_http_session(), same_instance(session))
+        adapter = session.get_adapter('https://api.getgo.com')
+        assert_that(adapter._pool_maxsize, is_(16))
+        assert_that(get_http_pool_stats(), is_({}))
+
+        reset_http_session()
+        assert_that(get_http_session(), is_not(same_instance(session)))
+
+    def test_configure(self):
+        configure_http_session(pool_connections=2, pool_maxsize=32)
+        adapter = get_http_session().get_adapter('https://api.getgo.com')
+        assert_that(adapter._pool_maxsize, is_(32))
+        assert_that(adapter._pool_connections, is_(2))
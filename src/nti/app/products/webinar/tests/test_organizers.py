@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import assert_that
+
+import unittest
+
+from zope import component
+
+from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IntIdAddedEvent
+from zope.intid.interfaces import IntIdRemovedEvent
+
+from zope.lifecycleevent import ObjectModifiedEvent
+
+from nti.app.products.webinar.interfaces import IWebinar
+from nti.app.products.webinar.interfaces import IWebinarOrganizerIndex
+
+from nti.app.products.webinar.organizers import WebinarOrganizerIndex
+
+from nti.app.products.webinar.organizers import get_organizer_webinars
+from nti.app.products.webinar.organizers import get_webinar_organizer_index
+
+from nti.app.products.webinar.tests import _IntIds
+from nti.app.products.webinar.tests import SharedConfiguringTestLayer
+
+from nti.app.products.webinar.tests.test_webinar_progress import webinar_json
+
+
+class TestOrganizerIndex(unittest.TestCase):
+
+    def test_index(self):
+        index = WebinarOrganizerIndex()
+        assert_that(list(index.get_intids(u'org1')), is_([]))
+        index.index(2, u'org1')
+        index.index(1, u'org1')
+        index.index(3, u'org2')
+        assert_that(len(index), is_(3))
+        assert_that(list(index.get_intids(u'org1')), is_([1, 2]))
+
+        # Moving organizers
+        index.index(1, u'org2')
+        assert_that(len(index), is_(3))
+        assert_that(list(index.get_intids(u'org1')), is_([2]))
+        assert_that(list(index.get_intids(u'org2')), is_([1, 3]))
+
+        index.unindex(2)
+        index.unindex(4)
+        assert_that(len(index), is_(2))
+        assert_that(list(index.get_intids(u'org1')), is_([]))
+
+
+class TestOrganizerIndexSubscribers(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.intids = _IntIds()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(self.intids, IIntIds)
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.intids, IIntIds)
+        index = get_webinar_organizer_index()
+        if index is not None:
+            gsm.unregisterUtility(index, IWebinarOrganizerIndex)
+
+    def test_subscribers_without_index(self):
+        # Subscribers never install an index
+        webinar = IWebinar(dict(webinar_json))
+        self.intids.register(webinar)
+        component.handle(webinar, IntIdAddedEvent(webinar, None))
+        component.handle(webinar, ObjectModifiedEvent(webinar))
+        component.handle(webinar, IntIdRemovedEvent(webinar, None))
+        assert_that(get_webinar_organizer_index(), none())
+        assert_that(list(get_organizer_webinars(webinar.organizerKey)), is_([]))
+
+    def test_subscribers(self):
+        index = WebinarOrganizerIndex()
+        component.getGlobalSiteManager().registerUtility(index,
+                                                         IWebinarOrganizerIndex)
+        webinar = IWebinar(dict(webinar_json))
+        intid = self.intids.register(webinar)
+        organizer_key = webinar.organizerKey
+
+        component.handle(webinar, IntIdAddedEvent(webinar, None))
+        assert_that(list(index.get_intids(organizer_key)), is_([intid]))
+        assert_that(list(get_organizer_webinars(organizer_key)), is_([webinar]))
+
+        webinar.organizerKey = u'222222222222'
+        component.handle(webinar, ObjectModifiedEvent(webinar))
+        assert_that(list(get_organizer_webinars(organizer_key)), is_([]))
+        assert_that(list(get_organizer_webinars(u'222222222222')), is_([webinar]))
+
+        component.handle(webinar, IntIdRemovedEvent(webinar, None))
+        assert_that(len(index), is_(0))
+
+        # Webinars without intids are ignored
+        other = IWebinar(dict(webinar_json))
+        component.handle(other, IntIdAddedEvent(other, None))
+        assert_that(len(index), is_(0))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import calling
+from hamcrest import raises
+from hamcrest import contains
+from hamcrest import close_to
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import less_than_or_equal_to
+
+import time
+import unittest
+import threading
+
+from email.utils import formatdate
+
+from nti.app.products.webinar import client as client_module
+from nti.app.products.webinar import ratelimit
+
+from nti.app.products.webinar.circuit import reset_local_circuits
+from nti.app.products.webinar.circuit import OrganizerCircuitBreaker
+
+from nti.app.products.webinar.client import GoToWebinarClient
+
+from nti.app.products.webinar.interfaces import WebinarRateLimitError
+from nti.app.products.webinar.interfaces import WebinarUnauthorizedError
+
+from nti.app.products.webinar.ratelimit import OrganizerRateLimiter
+
+from nti.app.products.webinar.ratelimit import backoff_seconds
+from nti.app.products.webinar.ratelimit import retry_after_seconds
+from nti.app.products.webinar.ratelimit import reset_local_buckets
+
+from nti.app.products.webinar.utils import concurrent_map
+
+from nti.app.products.webinar.tests import _MockRedis
+
+from nti.app.products.webinar.tests.test_client import MockResponse
+from nti.app.products.webinar.tests.test_client import MockIntegration
+
+
+class _MockSession(object):
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def _call(self, method, url):
+        self.calls.append((method, url))
+        return self.responses.pop(0)
+
+    def get(self, url, **unused_kwargs):
+        return self._call('GET', url)
+
+    def post(self, url, **unused_kwargs):
+        return self._call('POST', url)
+
+
+class _Response(MockResponse):
+
+    text = u''
+
+    def close(self):
+        pass
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def setUp(self):
+        reset_local_buckets()
+        reset_local_circuits()
+        self.backoff_base = ratelimit.BACKOFF_BASE
+        ratelimit.BACKOFF_BASE = 0
+        self.get_http_session = client_module.get_http_session
+
+    def tearDown(self):
+        reset_local_buckets()
+        reset_local_circuits()
+        ratelimit.BACKOFF_BASE = self.backoff_base
+        client_module.get_http_session = self.get_http_session
+
+    def test_local_bucket(self):
+        limiter = OrganizerRateLimiter(u'org', rate=10, capacity=2, max_wait=0.5)
+        now = time.time()
+        # Bursts up to capacity, then callers queue behind each other
+        waits = [limiter._reserve(now)[1] for _ in range(4)]
+        assert_that(waits[:2], contains(0, 0))
+        assert_that(waits[2], close_to(0.1, 0.001))
+        assert_that(waits[3], close_to(0.2, 0.001))
+        # Too long a wait is refused, without taking a token
+        for _ in range(3):
+            limiter._reserve(now)
+        granted, wait, unused_tokens = limiter._reserve(now)
+        assert_that(granted, is_(False))
+        assert_that(wait > 0.5, is_(True))
+        assert_that(calling(limiter.acquire), raises(WebinarRateLimitError))
+
+        # Refilled over time
+        granted, wait, unused_tokens = limiter._reserve(now + 10)
+        assert_that(granted, is_(True))
+        assert_that(wait, is_(0))
+
+    def test_block(self):
+        limiter = OrganizerRateLimiter(u'org', rate=10, capacity=2, max_wait=60)
+        limiter.block(30)
+        unused_granted, wait, unused_tokens = limiter._reserve(time.time())
+        assert_that(wait, close_to(30, 1))
+        # A shorter block does not cut a longer one short
+        limiter.block(1)
+        unused_granted, wait, unused_tokens = limiter._reserve(time.time())
+        assert_that(wait, close_to(30, 1))
+
+    def test_block_redis(self):
+        redis_client = _MockRedis()
+        limiter = OrganizerRateLimiter(u'org', redis_client)
+        limiter.block(2)
+        script, keys, args = redis_client.calls[0]
+        assert_that(script, is_(ratelimit._BLOCK_SCRIPT))
+        assert_that(keys, contains('webinar/ratelimit/org/blocked'))
+        assert_that(float(args[0]), close_to(time.time() + 2, 1))
+        assert_that(args[1], is_(2000))
+
+    def test_retry_after(self):
+        response = MockResponse({}, 429)
+        response.headers['Retry-After'] = '7'
+        assert_that(retry_after_seconds(response, 1), is_(7))
+        response.headers['Retry-After'] = formatdate(time.time() + 20, usegmt=True)
+        assert_that(retry_after_seconds(response, 1), close_to(20, 2))
+        response.headers.clear()
+        assert_that(retry_after_seconds(response, 1),
+                    less_than_or_equal_to(backoff_seconds(1) * 2))
+
+    def test_make_call_retries(self):
+        client = GoToWebinarClient(MockIntegration())
+        client._rate_limiter = OrganizerRateLimiter(u'org', rate=1000,
+                                                    capacity=100, max_wait=5)
+        throttled = _Response({}, 429)
+        throttled.headers['Retry-After'] = '0'
+        session = _MockSession([_Response({}, 503), throttled, _Response([1])])
+        client_module.get_http_session = lambda: session
+        response = client._make_call('/webinars')
+        assert_that(response.json(), is_([1]))
+        assert_that(session.calls, has_length(3))
+
+        # POSTs are not retried on server errors...
+        session = _MockSession([_Response({}, 503)])
+        client_module.get_http_session = lambda: session
+        assert_that(calling(client._make_call).with_args('/registrants',
+                                                         post_data={'a': 1}),
+                    raises(client_module.WebinarClientError))
+        assert_that(session.calls, has_length(1))
+
+        # ...but are when throttled, up to a limit
+        session = _MockSession([throttled] * 5)
+        client_module.get_http_session = lambda: session
+        assert_that(calling(client._make_call).with_args('/registrants',
+                                                         post_data={'a': 1}),
+                    raises(WebinarRateLimitError))
+        assert_that(session.calls, has_length(ratelimit.MAX_RETRIES + 1))
+
+    def test_make_call_circuit(self):
+        client = GoToWebinarClient(MockIntegration())
+        client._rate_limiter = OrganizerRateLimiter(u'org', rate=1000,
+                                                    capacity=100, max_wait=5)
+        breaker = client._circuit_breaker = OrganizerCircuitBreaker(u'org',
+                                                                    failure_threshold=2,
+                                                                    reset_timeout=60)
+        # Retried failures of a call that succeeds are not counted...
+        session = _MockSession([_Response({}, 503), _Response({}, 503), _Response([1])])
+        client_module.get_http_session = lambda: session
+        assert_that(client._make_call('/webinars').json(), is_([1]))
+        assert_that(breaker.before_call().dirty, is_(False))
+
+        # ...and a call that fails every retry counts once
+        session = _MockSession([_Response({}, 503)] * (ratelimit.MAX_RETRIES + 1))
+        client_module.get_http_session = lambda: session
+        assert_that(calling(client._make_call).with_args('/webinars'),
+                    raises(client_module.WebinarClientError))
+        assert_that(session.calls, has_length(ratelimit.MAX_RETRIES + 1))
+        assert_that(breaker.before_call().dirty, is_(True))
+
+        # A half-open trial is not rejected by its own retries
+        breaker = client._circuit_breaker = OrganizerCircuitBreaker(u'org',
+                                                                    failure_threshold=1,
+                                                                    reset_timeout=0)
+        breaker.record_failure(breaker.before_call())
+        session = _MockSession([_Response({}, 503), _Response([1])])
+        client_module.get_http_session = lambda: session
+        assert_that(client._make_call('/webinars').json(), is_([1]))
+        ticket = breaker.before_call()
+        assert_that(ticket.trial, is_(False))
+        assert_that(ticket.dirty, is_(False))
+
+    def test_make_call_unauthorized_off_thread(self):
+        client = GoToWebinarClient(MockIntegration())
+        session = _MockSession([_Response({}, 401)])
+        client_module.get_http_session = lambda: session
+        errors = []
+
+        def _call():
+            try:
+                client._make_call('/webinars')
+            except WebinarUnauthorizedError as e:
+                errors.append(e)
+
+        # Workers may not refresh our token
+        worker = threading.Thread(target=_call)
+        worker.start()
+        worker.join()
+        assert_that(errors, has_length(1))
+        assert_that(session.calls, has_length(1))
+        assert_that(calling(concurrent_map).with_args(lambda unused: client.refresh_access_token(),
+                                                      [1], 1),
+                    raises(WebinarUnauthorizedError))
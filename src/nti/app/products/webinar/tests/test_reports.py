@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import calling
+from hamcrest import raises
+from hamcrest import contains
+from hamcrest import assert_that
+
+import unittest
+
+from io import BytesIO
+
+from nti.app.products.webinar.interfaces import IWebinar
+from nti.app.products.webinar.interfaces import IWebinarProgressContainer
+
+from nti.app.products.webinar.progress import UserWebinarProgressContainer
+
+from nti.app.products.webinar.reports import iter_webinar_attendance
+from nti.app.products.webinar.reports import write_attendance_report
+from nti.app.products.webinar.reports import iter_attendance_report_lines
+
+from nti.app.products.webinar.tests import SharedConfiguringTestLayer
+
+from nti.app.products.webinar.tests.test_webinar_progress import _progress
+from nti.app.products.webinar.tests.test_webinar_progress import webinar_json
+
+
+class TestAttendanceReports(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def test_attendance_report(self):
+        webinar = IWebinar(dict(webinar_json))
+        assert_that(list(iter_webinar_attendance(webinar)), is_([]))
+
+        container = IWebinarProgressContainer(webinar)
+        for username in (u'user2', u'user1'):
+            user_container = container[username] = UserWebinarProgressContainer()
+            user_container[u'999999'] = _progress()
+        container[u'user2'][u'888888'] = _progress(sessionKey=888888,
+                                                   attendance=[],
+                                                   attendanceTimeInSeconds=0)
+
+        rows = list(iter_webinar_attendance(webinar))
+        assert_that(rows,
+                    contains((u'222222222222', u'111111111111', u'user1',
+                              u'111111111', u'999999', '2018-07-24T20:00:00Z',
+                              '2018-07-24T20:00:30Z', 30),
+                             (u'222222222222', u'111111111111', u'user2',
+                              u'111111111', u'888888', None, None, 0),
+                             (u'222222222222', u'111111111111', u'user2',
+                              u'111111111', u'999999', '2018-07-24T20:00:00Z',
+                              '2018-07-24T20:00:30Z', 30)))
+
+        out = BytesIO()
+        assert_that(write_attendance_report(iter(rows), out), is_(3))
+        lines = out.getvalue().splitlines()
+        assert_that(lines, contains(
+            b'webinar_key,organizer_key,username,registrant_key,session_key,'
+            b'join_time,leave_time,attendance_seconds',
+            b'222222222222,111111111111,user1,111111111,999999,'
+            b'2018-07-24T20:00:00Z,2018-07-24T20:00:30Z,30',
+            b'222222222222,111111111111,user2,111111111,888888,,,0',
+            b'222222222222,111111111111,user2,111111111,999999,'
+            b'2018-07-24T20:00:00Z,2018-07-24T20:00:30Z,30'))
+
+        lines = list(iter_attendance_report_lines(rows[1:2], 'ndjson'))
+        assert_that(lines, is_([b'{"webinar_key":"222222222222",'
+                                b'"organizer_key":"111111111111",'
+                                b'"username":"user2",'
+                                b'"registrant_key":"111111111",'
+                                b'"session_key":"888888",'
+                                b'"join_time":null,"leave_time":null,'
+                                b'"attendance_seconds":0}\n']))
+
+        assert_that(calling(list).with_args(iter_attendance_report_lines(rows, 'parquet')),
+                    raises(ValueError))
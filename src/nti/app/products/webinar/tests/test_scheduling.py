@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import assert_that
+
+import unittest
+
+from datetime import datetime
+from datetime import timedelta
+
+from zope import component
+
+from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IntIdAddedEvent
+from zope.intid.interfaces import IntIdRemovedEvent
+
+from zope.lifecycleevent import ObjectModifiedEvent
+
+from nti.app.products.webinar.interfaces import IWebinar
+from nti.app.products.webinar.interfaces import IWebinarProgressSchedule
+from nti.app.products.webinar.interfaces import IWebinarProgressContainer
+from nti.app.products.webinar.interfaces import WebinarProgressUpdatedEvent
+
+from nti.app.products.webinar.scheduling import WebinarProgressSchedule
+
+from nti.app.products.webinar.scheduling import PROGRESS_RETRY_DELAY
+
+from nti.app.products.webinar.scheduling import pop_due_webinars
+from nti.app.products.webinar.scheduling import get_webinar_progress_schedule
+
+from nti.app.products.webinar.tests import _IntIds
+from nti.app.products.webinar.tests import SharedConfiguringTestLayer
+
+from nti.app.products.webinar.tests.test_webinar_progress import webinar_json
+
+
+class TestProgressSchedule(unittest.TestCase):
+
+    def test_schedule(self):
+        now = datetime.utcnow().replace(microsecond=0)
+        schedule = WebinarProgressSchedule()
+        schedule.schedule(1, now - timedelta(hours=1))
+        schedule.schedule(2, now + timedelta(hours=1))
+        schedule.schedule(3, now - timedelta(hours=2))
+        schedule.schedule(4, now - timedelta(hours=2))
+        schedule.schedule(5, None)
+        assert_that(len(schedule), is_(4))
+        assert_that(schedule.get_due_time(2), is_(now + timedelta(hours=1)))
+        assert_that(schedule.get_due_time(5), none())
+
+        # Rescheduling moves the entry
+        schedule.schedule(4, now + timedelta(hours=3))
+        assert_that(len(schedule), is_(4))
+
+        assert_that(schedule.pop_due(now, limit=1), is_([3]))
+        assert_that(schedule.pop_due(now), is_([1]))
+        assert_that(schedule.pop_due(now), is_([]))
+        assert_that(len(schedule), is_(2))
+
+        schedule.unschedule(2)
+        assert_that(schedule.pop_due(now + timedelta(days=1)), is_([4]))
+        assert_that(len(schedule), is_(0))
+
+
+class TestScheduleSubscribers(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.intids = _IntIds()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(self.intids, IIntIds)
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.intids, IIntIds)
+        schedule = get_webinar_progress_schedule()
+        if schedule is not None:
+            gsm.unregisterUtility(schedule, IWebinarProgressSchedule)
+
+    def _webinar(self, end_time):
+        webinar = IWebinar(dict(webinar_json))
+        webinar.times[0].endTime = end_time
+        return webinar
+
+    def test_subscribers_without_schedule(self):
+        # Subscribers never install a schedule
+        webinar = self._webinar(datetime.utcnow())
+        self.intids.register(webinar)
+        component.handle(webinar, IntIdAddedEvent(webinar, None))
+        component.handle(webinar, ObjectModifiedEvent(webinar))
+        component.handle(webinar, IntIdRemovedEvent(webinar, None))
+        assert_that(get_webinar_progress_schedule(), none())
+
+    def test_subscribers(self):
+        schedule = WebinarProgressSchedule()
+        component.getGlobalSiteManager().registerUtility(schedule,
+                                                         IWebinarProgressSchedule)
+        now = datetime.utcnow().replace(microsecond=0)
+        webinar = self._webinar(now - timedelta(minutes=5))
+        intid = self.intids.register(webinar)
+
+        component.handle(webinar, IntIdAddedEvent(webinar, None))
+        assert_that(schedule.get_due_time(intid), is_(now - timedelta(minutes=5)))
+
+        webinar.times[0].endTime = now + timedelta(hours=1)
+        component.handle(webinar, ObjectModifiedEvent(webinar))
+        assert_that(schedule.get_due_time(intid), is_(now + timedelta(hours=1)))
+
+        webinar.times[0].endTime = now + timedelta(hours=2)
+        component.handle(webinar, WebinarProgressUpdatedEvent(webinar))
+        assert_that(schedule.get_due_time(intid), is_(now + timedelta(hours=2)))
+
+        component.handle(webinar, IntIdRemovedEvent(webinar, None))
+        assert_that(schedule.get_due_time(intid), none())
+        assert_that(len(schedule), is_(0))
+
+        # Webinars without intids are ignored
+        other = self._webinar(now)
+        component.handle(other, IntIdAddedEvent(other, None))
+        assert_that(len(schedule), is_(0))
+
+    def test_pop_due_webinars(self):
+        assert_that(pop_due_webinars(), is_([]))
+        schedule = WebinarProgressSchedule()
+        component.getGlobalSiteManager().registerUtility(schedule,
+                                                         IWebinarProgressSchedule)
+        now = datetime.utcnow().replace(microsecond=0)
+        webinar = self._webinar(now - timedelta(minutes=5))
+        intid = self.intids.register(webinar)
+        component.handle(webinar, IntIdAddedEvent(webinar, None))
+        future = self._webinar(now + timedelta(hours=2))
+        future_intid = self.intids.register(future)
+        component.handle(future, IntIdAddedEvent(future, None))
+
+        # Due webinars stay scheduled for a retry, should their
+        # update fail or be skipped
+        assert_that(pop_due_webinars(now), is_([webinar]))
+        assert_that(schedule.get_due_time(intid), is_(now + PROGRESS_RETRY_DELAY))
+        assert_that(pop_due_webinars(now), is_([]))
+        assert_that(pop_due_webinars(now + PROGRESS_RETRY_DELAY), is_([webinar]))
+
+        # Updating progress reschedules them for their next update
+        webinar.times[0].endTime = now + timedelta(hours=3)
+        component.handle(webinar, WebinarProgressUpdatedEvent(webinar))
+        assert_that(schedule.get_due_time(intid), is_(now + timedelta(hours=3)))
+        assert_that(schedule.get_due_time(future_intid),
+                    is_(now + timedelta(hours=2)))
+
+        # Webinars that never need updating again are not retried
+        IWebinarProgressContainer(webinar).last_updated = now + timedelta(days=2)
+        schedule.schedule(intid, now)
+        assert_that(pop_due_webinars(now), is_([webinar]))
+        assert_that(schedule.get_due_time(intid), none())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import calling
+from hamcrest import raises
+from hamcrest import assert_that
+
+import time
+import unittest
+
+from nti.app.products.webinar import tokens
+
+from nti.app.products.webinar.interfaces import WebinarClientError
+
+from nti.app.products.webinar.tokens import TokenStore
+from nti.app.products.webinar.tokens import TokenCache
+
+from nti.app.products.webinar.tokens import access_token_cache
+from nti.app.products.webinar.tokens import token_refresh_scheduler
+from nti.app.products.webinar.tokens import maybe_refresh_in_background
+
+from nti.app.products.webinar.tests import _MockRedis
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def test_cache(self):
+        cache = TokenCache(margin=10)
+        now = time.time()
+        assert_that(cache.get('key'), none())
+
+        cache.set('key', 'token', now + 60)
+        assert_that(cache.get('key', now), is_('token'))
+        assert_that(cache.get('key', now + 55), none())
+        assert_that(cache.get_expiry('key'), is_(now + 60))
+
+        # Only invalidated if it's the token we have
+        cache.invalidate('key', 'other_token')
+        assert_that(cache.get('key', now), is_('token'))
+        cache.invalidate('key', 'token')
+        assert_that(cache.get('key', now), none())
+
+        cache.set('key', 'token', now + 60)
+        cache.invalidate('key')
+        assert_that(cache.get('key', now), none())
+
+
+class _MockTokenStore(object):
+
+    access_token_key = 'webinar/tokens/test/access_token'
+    access_token_expiry = 100
+
+    def __init__(self):
+        self.refreshed = []
+
+    def update_tokens(self, old_access_token=None, blocking=True):
+        self.refreshed.append((old_access_token, blocking))
+        return 'new_token'
+
+
+class TestBackgroundRefresh(unittest.TestCase):
+
+    def tearDown(self):
+        access_token_cache.clear()
+
+    def test_refresh(self):
+        store = _MockTokenStore()
+        key = store.access_token_key
+        assert_that(maybe_refresh_in_background(store, 0.75), is_(False))
+
+        # Plenty of lifetime left
+        access_token_cache.set(key, 'token', time.time() + 90)
+        assert_that(maybe_refresh_in_background(store, 0.75), is_(False))
+
+        # Refreshed once we are 75% through
+        access_token_cache.set(key, 'token', time.time() + 20)
+        assert_that(maybe_refresh_in_background(store, 0.75), is_(True))
+        for _ in range(100):
+            if not token_refresh_scheduler.is_pending(key):
+                break
+            time.sleep(0.01)
+        assert_that(store.refreshed, is_([('token', False)]))
+
+
+class TestTokenStore(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = _MockRedis()
+        self.store = TokenStore(self.redis, 'webinar/tokens/test', 100, 1000, 10)
+        self.store.store_tokens('token1', 'refresh1')
+        self.exchanged = []
+
+        def _get_auth_tokens(refresh_token):
+            self.exchanged.append(refresh_token)
+            return 'token2', 'refresh2'
+        self._old_get_auth_tokens = tokens.get_auth_tokens
+        tokens.get_auth_tokens = _get_auth_tokens
+
+    def tearDown(self):
+        tokens.get_auth_tokens = self._old_get_auth_tokens
+        access_token_cache.clear()
+
+    def test_refresh(self):
+        assert_that(self.store.get_access_token(), is_('token1'))
+        assert_that(self.store.update_tokens('token1'), is_('token2'))
+        assert_that(self.exchanged, is_(['refresh1']))
+        assert_that(self.store.get_refresh_token(), is_('refresh2'))
+        assert_that(self.redis.locks, is_(set()))
+
+        # Someone already refreshed
+        assert_that(self.store.update_tokens('token1'), is_('token2'))
+        assert_that(self.exchanged, is_(['refresh1']))
+
+    def test_wait_for_other_process(self):
+        # Someone else holds the lock
+        self.redis.locks.add(self.store.lock_name)
+        assert_that(self.store.update_tokens('token1', blocking=False), none())
+        assert_that(calling(self.store.update_tokens).with_args('token1', timeout=0.1),
+                    raises(WebinarClientError))
+
+        # They finish
+        self.redis.data[self.store.access_token_key] = 'token3'
+        assert_that(self.store.update_tokens('token1'), is_('token3'))
+        assert_that(self.exchanged, is_([]))
+
+        # They let go without refreshing; we take over
+        self.redis.data[self.store.access_token_key] = 'token1'
+        self.redis.locks.discard(self.store.lock_name)
+        access_token_cache.clear()
+        assert_that(self.store._wait_for_refresh('token1', 1), is_('token2'))
+        assert_that(self.exchanged, is_(['refresh1']))
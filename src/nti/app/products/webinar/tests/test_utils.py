@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import calling
+from hamcrest import raises
+from hamcrest import assert_that
+
+import threading
+import unittest
+
+from nti.app.products.webinar.utils import csv_line
+from nti.app.products.webinar.utils import ndjson_line
+from nti.app.products.webinar.utils import concurrent_map
+from nti.app.products.webinar.utils import iter_json_array
+from nti.app.products.webinar.utils import export_response
+from nti.app.products.webinar.utils import retry_unauthorized
+
+from nti.app.products.webinar.interfaces import WebinarUnauthorizedError
+
+
+class TestUtils(unittest.TestCase):
+
+    def test_concurrent_map(self):
+        assert_that(concurrent_map(lambda x: x, (), 4), is_([]))
+
+        seen = set()
+        lock = threading.Lock()
+
+        def _square(x):
+            with lock:
+                seen.add(threading.current_thread().ident)
+            return x * x
+
+        result = concurrent_map(_square, range(20), 4)
+        assert_that(result, is_([x * x for x in range(20)]))
+        assert_that(len(seen) <= 4, is_(True))
+
+    def test_iter_json_array(self):
+        data = u'[ {"a": 1, "b": "x,]"}, 12345, true, [1, 2], "\u00e9" ]'
+        expected = [{u'a': 1, u'b': u'x,]'}, 12345, True, [1, 2], u'\u00e9']
+        for size in (1, 2, 3, 7, len(data)):
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            assert_that(list(iter_json_array(chunks)), is_(expected))
+
+        assert_that(list(iter_json_array([u'[', u']'])), is_([]))
+        assert_that(list(iter_json_array([u'[1', u'2]'])), is_([12]))
+        assert_that(list(iter_json_array([u'[1]', u' \n', u'', u'\t'])), is_([1]))
+
+        # Elements are yielded before the stream is complete
+        def _chunks():
+            yield u'[{"a": 1}, '
+            raise AssertionError('Read too far')
+        assert_that(next(iter_json_array(_chunks())), is_({u'a': 1}))
+
+        assert_that(calling(list).with_args(iter_json_array([u'{}'])),
+                    raises(ValueError))
+        assert_that(calling(list).with_args(iter_json_array([u'[1, {"a"'])),
+                    raises(ValueError))
+
+        # Elements must be separated, and the array closed and not followed
+        # by anything but whitespace
+        for data in (u'[1 2]', u'[1,]', u'[,1]', u'[1,,2]', u'[{"a": 1}{"b": 2}]',
+                     u'[1, 2', u'[', u'[1,2]x', u'[1,2] ]', u'[][]'):
+            for size in (1, len(data)):
+                chunks = [data[i:i + size] for i in range(0, len(data), size)]
+                assert_that(calling(list).with_args(iter_json_array(chunks)),
+                            raises(ValueError))
+
+    def test_export_lines(self):
+        assert_that(csv_line((u'a,b', None, 1, u'\u00e9')),
+                    is_(u'"a,b",,1,\u00e9\r\n'.encode('utf-8')))
+        assert_that(ndjson_line({u'a': u'\u00e9'}),
+                    is_(b'{"a":"\\u00e9"}\n'))
+
+        lines = [csv_line((u'username',)), csv_line((u'user1',))]
+        response = export_response(iter(lines), 'text/csv', 'export.csv')
+        assert_that(response.content_disposition,
+                    is_('attachment; filename="export.csv"'))
+        assert_that(response.content_length, is_(len(b''.join(lines))))
+        assert_that(b''.join(response.app_iter), is_(b''.join(lines)))
+
+    def test_retry_unauthorized(self):
+        class _Client(object):
+            refreshes = 0
+
+            def refresh_access_token(self):
+                self.refreshes += 1
+
+        client = _Client()
+        unauthorized = WebinarUnauthorizedError('401')
+        results = [(1, None), (2, unauthorized), (3, unauthorized)]
+        retried = retry_unauthorized(lambda job: (job * 10, None),
+                                     [1, 2, 3], results,
+                                     lambda unused_job: client)
+        assert_that(retried, is_([(1, None), (20, None), (30, None)]))
+        assert_that(client.refreshes, is_(1))
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import calling
+from hamcrest import raises
+from hamcrest import contains
+from hamcrest import has_entry
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import contains_inanyorder
+
+import fudge
+
+import csv
+import json
+import unittest
+
+from pyramid import httpexceptions as hexc
+
+from pyramid.testing import DummyRequest
+
+from zope.annotation.interfaces import IAnnotations
+
+from nti.app.products.webinar.adapters import WEBINAR_REGISTRATION_CONTAINER_KEY
+
+from nti.app.products.webinar.adapters import WebinarRegistrationMetadataContainer
+
+from nti.app.products.webinar.client import WebinarRegistrationResult
+
+from nti.app.products.webinar.interfaces import IWebinar
+from nti.app.products.webinar.interfaces import IWebinarProgressContainer
+
+from nti.app.products.webinar.progress import UserWebinarProgressContainer
+
+from nti.app.products.webinar.tests import SharedConfiguringTestLayer
+
+from nti.app.products.webinar.tests.test_adapters import _metadata
+
+from nti.app.products.webinar.tests.test_client import _User
+from nti.app.products.webinar.tests.test_client import MockResponse
+from nti.app.products.webinar.tests.test_client import MockIntegration
+from nti.app.products.webinar.tests.test_client import MockRegistrationClient
+
+from nti.app.products.webinar.tests.test_webinar_progress import _progress
+from nti.app.products.webinar.tests.test_webinar_progress import webinar_json
+
+from nti.app.products.webinar.views.webinar_views import WebinarBulkRegisterView
+from nti.app.products.webinar.views.webinar_views import WebinarRegistrationsView
+from nti.app.products.webinar.views.webinar_views import WebinarAttendanceReportView
+from nti.app.products.webinar.views.webinar_views import OrganizerAttendanceReportView
+
+
+class TestBulkRegisterView(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    @fudge.patch('nti.app.products.webinar.views.webinar_views.User',
+                 'nti.app.products.webinar.views.webinar_views.IWebinarClient',
+                 'nti.app.products.webinar.views.webinar_views.IWebinarRegistrationMetadataContainer',
+                 'nti.app.products.webinar.views.webinar_views.invalidate_webinar_listings')
+    def test_bulk_register(self, mock_user, mock_client,
+                           mock_container, mock_invalidate):
+        webinar = IWebinar(dict(webinar_json))
+        users = dict((x, _User(x)) for x in ('user1', 'user2', 'user3', 'user4'))
+        mock_user.provides('get_user').calls(users.get)
+
+        client = MockRegistrationClient(
+            {'user1': [MockResponse({'registrantKey': 1,
+                                     'joinUrl': u'http://join/1'}, 201)],
+             'user2': [MockResponse({'registrantKey': 2,
+                                     'joinUrl': u'http://join/2'}, 409)],
+             'user3': [MockResponse({'description': u'invalid'}, 400)],
+             'user4': [RuntimeError('boom')]})
+        mock_client.is_callable().returns(client)
+        container = WebinarRegistrationMetadataContainer()
+        mock_container.is_callable().returns(container)
+        mock_invalidate.expects_call().with_args(webinar.organizerKey)
+
+        view = WebinarBulkRegisterView(DummyRequest(context=webinar))
+        view.readInput = lambda: {'Items': [{'username': x, 'email': x}
+                                            for x in ('user1', 'user2', 'missing',
+                                                      'user3', 'user4')],
+                                  'registration_data': {'firstName': u'first'}}
+        result = view()
+
+        statuses = [(x['username'], x['status']) for x in result['Items']]
+        assert_that(statuses,
+                    contains(('user1', WebinarRegistrationResult.REGISTERED),
+                             ('user2', WebinarRegistrationResult.ALREADY_REGISTERED),
+                             ('user3', WebinarRegistrationResult.INVALID),
+                             ('user4', WebinarRegistrationResult.FAILED),
+                             ('missing', u'UserNotFound')))
+        assert_that(result, has_entry('RegisteredCount', 2))
+        assert_that(result, has_entry('Total', 5))
+        assert_that(result['Items'][2], has_entry('error', {'description': u'invalid'}))
+        assert_that(result['Items'][3], has_entry('error', 'boom'))
+        assert_that(list(container), contains_inanyorder(u'user1', u'user2'))
+        assert_that(container[u'user2'].join_url, is_(u'http://join/2'))
+
+
+class TestRegistrationsView(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.webinar = IWebinar(dict(webinar_json))
+        container = WebinarRegistrationMetadataContainer()
+        # Created in reverse username order
+        for created, username in enumerate((u'carol', u'bobby', u'Bob',
+                                            u'bo', u'alice')):
+            registration = container[username] = _metadata(u'reg-%s' % username.lower())
+            registration.createdTime = 1000 + created
+        IAnnotations(self.webinar)[WEBINAR_REGISTRATION_CONTAINER_KEY] = container
+
+    def _call(self, **params):
+        request = DummyRequest(params=params, context=self.webinar)
+        request.current_route_path = lambda *unused_args, **unused_kwargs: u'/registrations'
+        return WebinarRegistrationsView(request)()
+
+    def _registrant_keys(self, **params):
+        result = self._call(**params)
+        return [x.registrant_key for x in result['Items']], result['Total']
+
+    def test_registrations(self):
+        # Without batching params, all registrations by username
+        result = self._call()
+        assert_that(sorted(result['Items']),
+                    contains(u'Bob', u'alice', u'bo', u'bobby', u'carol'))
+        assert_that(result['Total'], is_(5))
+
+        assert_that(self._registrant_keys(batchSize=u'2'),
+                    is_(([u'reg-alice', u'reg-bo'], 5)))
+        assert_that(self._registrant_keys(batchSize=u'2', batchStart=u'2'),
+                    is_(([u'reg-bob', u'reg-bobby'], 5)))
+        assert_that(self._registrant_keys(usernamePrefix=u'BO'),
+                    is_(([u'reg-bo', u'reg-bob', u'reg-bobby'], 3)))
+        assert_that(self._registrant_keys(usernamePrefix=u'bo', sortOrder=u'descending'),
+                    is_(([u'reg-bobby', u'reg-bob', u'reg-bo'], 3)))
+        assert_that(self._registrant_keys(usernamePrefix=u'z'), is_(([], 0)))
+        assert_that(self._registrant_keys(sortOn=u'createdTime', batchSize=u'2'),
+                    is_(([u'reg-carol', u'reg-bobby'], 5)))
+        assert_that(self._registrant_keys(sortOn=u'createdTime', batchSize=u'2',
+                                          sortOrder=u'descending'),
+                    is_(([u'reg-alice', u'reg-bo'], 5)))
+
+        assert_that(calling(self._call).with_args(sortOn=u'bogus'),
+                    raises(hexc.HTTPBadRequest))
+        assert_that(calling(self._call).with_args(format=u'bogus'),
+                    raises(hexc.HTTPBadRequest))
+
+    def test_no_registrations(self):
+        del IAnnotations(self.webinar)[WEBINAR_REGISTRATION_CONTAINER_KEY]
+        assert_that(self._call()['Items'], is_({}))
+        assert_that(self._registrant_keys(batchSize=u'2'), is_(([], 0)))
+
+    def test_export(self):
+        response = self._call(format=u'csv', usernamePrefix=u'bo',
+                              sortOn=u'createdTime')
+        assert_that(response.content_type, is_('text/csv'))
+        assert_that(response.content_disposition,
+                    is_('attachment; filename="webinar_registrations_222222222222.csv"'))
+        lines = b''.join(response.app_iter).decode('utf-8').splitlines()
+        rows = list(csv.reader(lines))
+        assert_that(rows[0], is_(list(WebinarRegistrationsView.EXPORT_FIELDS)))
+        assert_that([x[:2] for x in rows[1:]],
+                    contains([u'bobby', u'reg-bobby'],
+                             [u'Bob', u'reg-bob'],
+                             [u'bo', u'reg-bo']))
+        assert_that(rows[1][5], is_(u'1970-01-01T00:16:41Z'))
+
+        response = self._call(format=u'ndjson', sortOrder=u'descending')
+        assert_that(response.content_type, is_('application/x-ndjson'))
+        rows = [json.loads(x) for x in b''.join(response.app_iter).splitlines()]
+        assert_that([x['username'] for x in rows],
+                    contains(u'carol', u'bobby', u'Bob', u'bo', u'alice'))
+
+
+class TestAttendanceReportViews(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def test_webinar_report(self):
+        webinar = IWebinar(dict(webinar_json))
+        container = IWebinarProgressContainer(webinar)
+        user_container = container[u'user1'] = UserWebinarProgressContainer()
+        user_container[u'999999'] = _progress()
+
+        view = WebinarAttendanceReportView(DummyRequest(context=webinar))
+        response = view()
+        assert_that(response.content_type, is_('text/csv'))
+        assert_that(response.content_disposition,
+                    is_('attachment; filename="webinar_attendance_222222222222.csv"'))
+        lines = b''.join(response.app_iter).splitlines()
+        assert_that(lines, has_length(2))
+
+        request = DummyRequest(params={'format': u'NDJSON'}, context=webinar)
+        response = WebinarAttendanceReportView(request)()
+        assert_that(response.content_type, is_('application/x-ndjson'))
+        rows = [json.loads(x) for x in b''.join(response.app_iter).splitlines()]
+        assert_that(rows, contains(has_entry('username', u'user1')))
+
+        request = DummyRequest(params={'format': u'xml'}, context=webinar)
+        assert_that(calling(WebinarAttendanceReportView(request)),
+                    raises(hexc.HTTPBadRequest))
+
+    def test_organizer_report(self):
+        # Without an index, an organizer has no (indexed) webinars
+        view = OrganizerAttendanceReportView(DummyRequest(context=MockIntegration()))
+        response = view()
+        assert_that(response.content_disposition,
+                    is_('attachment; filename="webinar_attendance_organizer_111111111111.csv"'))
+        lines = b''.join(response.app_iter).splitlines()
+        assert_that(lines, has_length(1))
@@ -9,16 +9,40 @@ from __future__ import absolute_import
 
 from hamcrest import is_
 from hamcrest import none
+from hamcrest import close_to
+from hamcrest import contains
+from hamcrest import not_none
+from hamcrest import has_length
+from hamcrest import same_instance
 from hamcrest import assert_that
 
+import time
 import unittest
+import threading
 
 from datetime import datetime
 from datetime import timedelta
 
+from nti.app.products.webinar import progress as progress_module
+
+from nti.app.products.webinar.adapters import query_webinar_registration_container
+
 from nti.app.products.webinar.interfaces import IWebinar
+from nti.app.products.webinar.interfaces import WebinarClientError
+from nti.app.products.webinar.interfaces import WebinarUnauthorizedError
+from nti.app.products.webinar.interfaces import IUserWebinarProgress
 from nti.app.products.webinar.interfaces import IWebinarProgressContainer
 
+from nti.app.products.webinar.progress import UserWebinarProgressContainer
+
+from nti.app.products.webinar.progress import _store_user_progress
+from nti.app.products.webinar.progress import _fetch_webinar_progress
+from nti.app.products.webinar.progress import query_webinar_progress_container
+
+from nti.app.products.webinar.progress import update_webinar_progress
+from nti.app.products.webinar.progress import update_webinars_progress
+from nti.app.products.webinar.progress import next_progress_update_time
+
 from nti.app.products.webinar.progress import should_update_progress
 
 from nti.app.products.webinar.tests import SharedConfiguringTestLayer
@@ -41,6 +65,88 @@ webinar_json = {
           "registrationUrl": u"http://reg_url",
 }
 
+user_progress_json = {
+    "registrantKey": 111111111,
+    "email": "user_email",
+    "attendanceTimeInSeconds": 30,
+    "sessionKey": 999999,
+    "attendance": [
+      {
+        "joinTime": "2018-07-24T20:00:00Z",
+        "leaveTime": "2018-07-24T20:00:30Z"
+      }
+    ]
+}
+
+
+def _progress(**kwargs):
+    ext = dict(user_progress_json)
+    ext['attendance'] = [dict(x) for x in ext['attendance']]
+    ext.update(kwargs)
+    return IUserWebinarProgress(ext)
+
+
+def _isoformat(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class _MockClient(object):
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.fetched = []
+
+    def get_webinar_progress(self, unused_webinar_key, stream=False):
+        self.fetched.append(None)
+        return [u'all']
+
+    def get_webinar_sessions(self, unused_webinar_key):
+        return self.sessions
+
+    def get_session_progress(self, unused_webinar_key, session_key, stream=False):
+        self.fetched.append(session_key)
+        return [session_key]
+
+
+class _SyncClient(object):
+    """
+    Responds to session fetches by webinar key, tracking how many fetches
+    run at once.
+    """
+
+    _access_token = u'token'
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.refreshes = 0
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+
+    def refresh_access_token(self):
+        self.refreshes += 1
+
+    def get_webinar_sessions(self, webinar_key):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            response = self.responses[webinar_key].pop(0)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def get_webinar_progress(self, unused_webinar_key, stream=False):
+        return []
+
+
+def _webinar(webinar_key, organizer_key=u'111111111111'):
+    return IWebinar(dict(webinar_json,
+                         webinarKey=webinar_key,
+                         organizerKey=organizer_key))
+
+
 class TestWebinarProgress(unittest.TestCase):
 
     layer = SharedConfiguringTestLayer
@@ -57,11 +163,18 @@ class TestWebinarProgress(unittest.TestCase):
         webinar.times[0].endTime = one_day_later
         assert_that(should_update_progress(webinar), is_(False))
 
-        # Completed webinar
+        # Completed webinar; read paths do not create containers
         webinar = IWebinar(dict(webinar_json))
         webinar.times[0].endTime = thirty_seconds_ago
+        assert_that(should_update_progress(webinar), is_(True))
+        assert_that(next_progress_update_time(webinar), is_(thirty_seconds_ago))
+        assert_that(query_webinar_progress_container(webinar), none())
+        assert_that(query_webinar_registration_container(webinar), none())
+
         container = IWebinarProgressContainer(webinar)
         assert_that(container.last_updated, none())
+        assert_that(query_webinar_progress_container(webinar),
+                    same_instance(container))
 
         # First time
         assert_that(should_update_progress(webinar), is_(True))
@@ -82,3 +195,251 @@ class TestWebinarProgress(unittest.TestCase):
         webinar.times[0].endTime = now - timedelta(hours=6)
         container.last_updated = now - timedelta(hours=5)
         assert_that(should_update_progress(webinar), is_(True))
+
+        # Backoffs spanning days agree with the schedule
+        webinar.times[0].endTime = now - timedelta(hours=26)
+        container.last_updated = now - timedelta(hours=25)
+        assert_that(should_update_progress(webinar), is_(True))
+        assert_that(next_progress_update_time(webinar),
+                    is_(now - timedelta(hours=21)))
+
+        container.last_updated = now - timedelta(hours=3)
+        assert_that(should_update_progress(webinar), is_(False))
+        assert_that(next_progress_update_time(webinar),
+                    is_(now + timedelta(hours=89)))
+
+    def test_upsert(self):
+        container = UserWebinarProgressContainer()
+        progress = _progress()
+        assert_that(_store_user_progress(container, progress), is_(True))
+        assert_that(container['999999'], same_instance(progress))
+
+        # Unchanged records are not written
+        assert_that(_store_user_progress(container, _progress()), is_(False))
+
+        # Insert-only mode leaves the stored record alone
+        changed = _progress(attendanceTimeInSeconds=60)
+        assert_that(_store_user_progress(container, changed, upsert=False),
+                    is_(False))
+        assert_that(container['999999'].attendanceTimeInSeconds, is_(30))
+
+        # Changes are written in place
+        changed = _progress(attendanceTimeInSeconds=60,
+                            attendance=[{"joinTime": "2018-07-24T20:00:00Z",
+                                         "leaveTime": "2018-07-24T20:00:30Z"},
+                                        {"joinTime": "2018-07-24T20:01:00Z",
+                                         "leaveTime": "2018-07-24T20:01:30Z"}])
+        assert_that(_store_user_progress(container, changed), is_(True))
+        stored = container['999999']
+        assert_that(stored, same_instance(progress))
+        assert_that(stored.attendanceTimeInSeconds, is_(60))
+        assert_that(stored.attendance, has_length(2))
+
+    def test_fetch_sessions(self):
+        now = datetime.utcnow()
+        old_end = now - timedelta(days=30)
+        recent_end = now - timedelta(hours=2)
+        new_end = now - timedelta(minutes=5)
+        sessions = [{'sessionKey': 1, 'endTime': _isoformat(old_end)},
+                    {'sessionKey': 2, 'endTime': _isoformat(recent_end)},
+                    {'sessionKey': 3, 'endTime': _isoformat(new_end)},
+                    {'sessionKey': 4,
+                     'endTime': _isoformat(now + timedelta(hours=1))}]
+        client = _MockClient(sessions)
+
+        # First fetch is for the whole webinar
+        result, fetched = _fetch_webinar_progress(client, u'key')
+        assert_that(result, is_([u'all']))
+        assert_that([x[0] for x in fetched], is_([u'1', u'2', u'3']))
+
+        # Untracked sessions since our last update
+        client = _MockClient(sessions)
+        result, fetched = _fetch_webinar_progress(client, u'key',
+                                                  now - timedelta(hours=1))
+        assert_that(result, is_([u'2', u'3']))
+        assert_that([x[0] for x in fetched], is_([u'2', u'3']))
+
+        # Tracked sessions only if due
+        client = _MockClient(sessions)
+        plan = {u'1': True, u'2': False, u'3': True}
+        result, fetched = _fetch_webinar_progress(client, u'key',
+                                                  now - timedelta(hours=1),
+                                                  plan)
+        assert_that(result, is_([u'1', u'3']))
+
+    def test_session_states(self):
+        now = datetime.utcnow()
+        webinar = IWebinar(dict(webinar_json))
+        webinar.times[0].endTime = now - timedelta(minutes=30)
+        container = IWebinarProgressContainer(webinar)
+        assert_that(container.get_session_state(u'1'), none())
+
+        end_time = now - timedelta(minutes=30)
+        container.record_session_fetch(u'1', end_time, now)
+        container.last_updated = now
+        state = container.get_session_state(u'1')
+        assert_that(state.attempts, is_(1))
+        assert_that(state.finalized, is_(False))
+        assert_that(state.next_eligible, is_(now + timedelta(hours=2)))
+        assert_that(state.is_due(now), is_(False))
+        assert_that(should_update_progress(webinar), is_(False))
+
+        # Never within the first hour of the end
+        state.record_fetch(end_time)
+        assert_that(state.next_eligible, is_(end_time + timedelta(hours=1)))
+
+        # Back off
+        fetched = end_time + timedelta(hours=1)
+        state.record_fetch(fetched)
+        assert_that(state.attempts, is_(3))
+        assert_that(state.next_eligible, is_(fetched + timedelta(hours=4)))
+        assert_that(state.is_due(fetched + timedelta(hours=5)), is_(True))
+
+        # Finalized a day after the end
+        state.record_fetch(end_time + timedelta(days=2))
+        assert_that(state.finalized, is_(True))
+        assert_that(state.is_due(), is_(False))
+
+    def test_next_progress_update_time(self):
+        now = datetime.utcnow()
+        webinar = IWebinar(dict(webinar_json))
+        end_time = now + timedelta(hours=1)
+        webinar.times[0].endTime = end_time
+        assert_that(next_progress_update_time(webinar), is_(end_time))
+
+        end_time = now - timedelta(minutes=30)
+        webinar.times[0].endTime = end_time
+        container = IWebinarProgressContainer(webinar)
+        container.last_updated = now
+        assert_that(next_progress_update_time(webinar), is_(now + timedelta(hours=2)))
+
+        container.record_session_fetch(u'1', end_time, now)
+        assert_that(next_progress_update_time(webinar), is_(now + timedelta(hours=2)))
+
+        container.get_session_state(u'1').record_fetch(now + timedelta(days=2))
+        assert_that(next_progress_update_time(webinar), none())
+
+    def test_attendance_aggregates(self):
+        webinar = IWebinar(dict(webinar_json))
+        container = IWebinarProgressContainer(webinar)
+        user_container = container[u'user1'] = UserWebinarProgressContainer()
+        assert_that(user_container.total_attendance_seconds, is_(0))
+        assert_that(user_container.sessions_attended, is_(0))
+        assert_that(user_container.first_join, none())
+        assert_that(user_container.attendance_percent, is_(0))
+
+        # Stored as records are added
+        user_container[u'999999'] = _progress()
+        user_container[u'888888'] = _progress(sessionKey=888888,
+                                              attendance=[],
+                                              attendanceTimeInSeconds=0)
+        assert_that(user_container.has_aggregates, is_(True))
+        assert_that(user_container.total_attendance_seconds, is_(30))
+        assert_that(user_container.update_aggregates(), is_(False))
+
+        # Legacy containers compute them on read until stored
+        user_container._aggregates = None
+        assert_that(user_container.has_aggregates, is_(False))
+        assert_that(user_container.total_attendance_seconds, is_(30))
+        assert_that(user_container.update_aggregates(), is_(True))
+        assert_that(user_container.update_aggregates(), is_(False))
+
+        changed = _progress(attendanceTimeInSeconds=90,
+                            attendance=[{"joinTime": "2018-07-24T20:00:00Z",
+                                         "leaveTime": "2018-07-24T20:00:30Z"},
+                                        {"joinTime": "2018-07-24T19:59:00Z",
+                                         "leaveTime": "2018-07-24T20:00:00Z"}])
+        # And as they are updated in place
+        assert_that(_store_user_progress(user_container, changed), is_(True))
+        assert_that(user_container.update_aggregates(), is_(False))
+        assert_that(user_container.total_attendance_seconds, is_(90))
+        assert_that(user_container.sessions_attended, is_(1))
+        assert_that(user_container.first_join,
+                    is_(datetime(2018, 7, 24, 19, 59)))
+        assert_that(user_container.last_leave,
+                    is_(datetime(2018, 7, 24, 20, 0, 30)))
+        # Of the one scheduled hour
+        assert_that(user_container.attendance_percent, close_to(2.5, 0.001))
+        # ...against the current schedule
+        webinar.times[0].endTime = webinar.times[0].startTime + timedelta(minutes=30)
+        assert_that(user_container.attendance_percent, close_to(5.0, 0.001))
+
+        # ...or removed
+        del user_container[u'999999']
+        assert_that(user_container.update_aggregates(), is_(False))
+        assert_that(user_container.total_attendance_seconds, is_(0))
+        assert_that(user_container.sessions_attended, is_(0))
+        assert_that(user_container.first_join, none())
+
+
+class TestUpdateWebinarsProgress(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.clients = {}
+        self.stored = []
+        self.old_client = progress_module.IWebinarClient
+        self.old_store = progress_module._store_webinar_progress
+        progress_module.IWebinarClient = \
+            lambda webinar, unused_default=None: self.clients.get(webinar.organizerKey)
+
+        def _store(webinar, *args, **kwargs):
+            self.stored.append((webinar.webinarKey, threading.current_thread()))
+            return self.old_store(webinar, *args, **kwargs)
+        progress_module._store_webinar_progress = _store
+
+    def tearDown(self):
+        progress_module.IWebinarClient = self.old_client
+        progress_module._store_webinar_progress = self.old_store
+
+    def test_update_webinars_progress(self):
+        client = self.clients[u'111111111111'] = _SyncClient(
+            {u'1': [[]],
+             u'2': [None],
+             u'3': [WebinarClientError('boom')],
+             u'4': [WebinarUnauthorizedError('expired'), []]})
+        future = _webinar(u'5')
+        future.times[0].endTime = datetime.utcnow() + timedelta(days=1)
+        unauthorized = _webinar(u'6', organizer_key=u'999')
+        webinars = [_webinar(u'1'), _webinar(u'2'), _webinar(u'3'),
+                    _webinar(u'4'), future, unauthorized]
+
+        results = update_webinars_progress(webinars, max_workers=4,
+                                           max_organizer_workers=1)
+        # Only webinars that are due; those without a client first
+        assert_that([(x.webinar.webinarKey, x.success) for x in results],
+                    contains((u'6', False), (u'1', True), (u'2', False),
+                             (u'3', False), (u'4', True)))
+        assert_that(results[0].error, is_(u'Unauthorized'))
+        assert_that(results[2].error, is_(u'NotFound'))
+        assert_that(isinstance(results[3].error, WebinarClientError), is_(True))
+
+        # Fetches are limited per organizer
+        assert_that(client.max_active, is_(1))
+        # Rejected tokens are refreshed once, and the fetch retried
+        assert_that(client.refreshes, is_(1))
+
+        # Stored serially, in our thread
+        assert_that(self.stored,
+                    contains((u'1', threading.current_thread()),
+                             (u'4', threading.current_thread())))
+        assert_that(IWebinarProgressContainer(webinars[0]).last_updated,
+                    is_(not_none()))
+        assert_that(query_webinar_progress_container(webinars[1]), none())
+
+        # Updated webinars are no longer due, unless forced
+        client.responses[u'1'] = [[]]
+        assert_that(update_webinars_progress(webinars[:1]), is_([]))
+        results = update_webinars_progress(webinars[:1], force=True)
+        assert_that([x.success for x in results], contains(True))
+
+    def test_update_webinar_progress(self):
+        webinar = _webinar(u'1')
+        assert_that(update_webinar_progress(webinar), is_(False))
+
+        self.clients[u'111111111111'] = _SyncClient({u'1': [None, []]})
+        assert_that(update_webinar_progress(webinar), is_(False))
+        assert_that(self.stored, is_([]))
+        assert_that(update_webinar_progress(webinar), is_(True))
+        assert_that(self.stored, has_length(1))
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Storage, per-process caching and refreshing of webinar OAuth tokens.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+import threading
+
+from nti.app.products.webinar import metrics
+
+from nti.app.products.webinar.interfaces import WebinarClientError
+
+from nti.app.products.webinar.utils import get_auth_tokens
+
+#: Cached tokens are treated as expired this many seconds early.
+TOKEN_EXPIRY_MARGIN = 60
+
+#: The max number of seconds to wait on someone else's token refresh.
+TOKEN_REFRESH_WAIT_TIMEOUT = 30
+
+#: The max interval, in seconds, between polls for a refreshed token.
+TOKEN_REFRESH_POLL_INTERVAL = 0.5
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class TokenCache(object):
+    """
+    A thread-safe, in-memory cache of token key name to token, honoring
+    the token's expiry.
+    """
+
+    def __init__(self, margin=TOKEN_EXPIRY_MARGIN):
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._tokens.get(key)
+        if entry is not None and entry[1] - self.margin > now:
+            return entry[0]
+        return None
+
+    def get_expiry(self, key):
+        """
+        Return the timestamp the cached token expires at, or None.
+        """
+        with self._lock:
+            entry = self._tokens.get(key)
+        return entry[1] if entry is not None else None
+
+    def set(self, key, token, expires_at):
+        with self._lock:
+            self._tokens[key] = (token, expires_at)
+
+    def invalidate(self, key, token=None):
+        """
+        Drop the cached token for the key; if a `token` is given, only if it
+        is the one cached.
+        """
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None and (token is None or entry[0] == token):
+                del self._tokens[key]
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+#: The process-wide access token cache.
+access_token_cache = TokenCache()
+
+
+class TokenStore(object):
+    """
+    The (non-persistent) redis storage details for an integration's tokens.
+    This is safe to use outside of the request (and thread) that created it.
+    """
+
+    def __init__(self, redis_client, key_base_name,
+                 access_token_expiry, refresh_token_expiry, lock_timeout):
+        self.redis_client = redis_client
+        self.lock_name = key_base_name
+        self.access_token_key = '%s/%s' % (key_base_name, 'access_token')
+        self.refresh_token_key = '%s/%s' % (key_base_name, 'refresh_token')
+        self.access_token_expiry = access_token_expiry
+        self.refresh_token_expiry = refresh_token_expiry
+        self.lock_timeout = lock_timeout
+
+    def store_tokens(self, access_token, refresh_token):
+        """
+        Store the tokens. This should only be called with appropriate
+        safeguarding of concurrency.
+        """
+        self.redis_client.setex(self.access_token_key,
+                                time=self.access_token_expiry,
+                                value=access_token)
+        self.redis_client.setex(self.refresh_token_key,
+                                time=self.refresh_token_expiry,
+                                value=refresh_token)
+        access_token_cache.set(self.access_token_key,
+                               access_token,
+                               time.time() + self.access_token_expiry)
+
+    def get_stored_access_token(self):
+        """
+        Fetch the access token from redis, caching it in-process until it
+        expires.
+        """
+        pipe = self.redis_client.pipeline()
+        pipe.get(self.access_token_key)
+        pipe.ttl(self.access_token_key)
+        result, ttl = pipe.execute()
+        if result is not None:
+            if ttl is None or ttl < 0:
+                ttl = self.access_token_expiry
+            access_token_cache.set(self.access_token_key,
+                                   result,
+                                   time.time() + ttl)
+        return result
+
+    def get_access_token(self):
+        result = access_token_cache.get(self.access_token_key)
+        if result is None:
+            result = self.get_stored_access_token()
+        return result
+
+    def get_refresh_token(self):
+        return self.redis_client.get(self.refresh_token_key)
+
+    def lock(self):
+        return self.redis_client.lock(self.lock_name, self.lock_timeout)
+
+    def _refresh_locked(self, lock, old_access_token):
+        """
+        Refresh our tokens while holding the (acquired) lock.
+        """
+        acquired = time.time()
+        try:
+            # Someone may beat us; if so, use their new token
+            current_access_token = self.get_stored_access_token()
+            if     not current_access_token \
+                or current_access_token == old_access_token:
+                # First one here, update and store
+                access_token, refresh_token = get_auth_tokens(self.get_refresh_token())
+                self.store_tokens(access_token, refresh_token)
+                metrics.incr('token.refresh')
+                result = access_token
+            else:
+                result = current_access_token
+        finally:
+            held = time.time() - acquired
+            metrics.timing('token.lock_held', held)
+            if held > self.lock_timeout / 2:
+                logger.warn('Held webinar token lock for (%.2fs)', held)
+            lock.release()
+        return result
+
+    def _wait_for_refresh(self, old_access_token, timeout):
+        """
+        Wait for whoever holds the lock to store a new token, taking over the
+        refresh if they let go of the lock without doing so.
+        """
+        start = time.time()
+        interval = 0.05
+        while True:
+            current_access_token = self.get_stored_access_token()
+            if current_access_token and current_access_token != old_access_token:
+                metrics.timing('token.refresh_wait', time.time() - start)
+                return current_access_token
+            lock = self.lock()
+            if lock.acquire(blocking=False):
+                metrics.timing('token.refresh_wait', time.time() - start)
+                return self._refresh_locked(lock, old_access_token)
+            if time.time() - start > timeout:
+                metrics.incr('token.refresh_wait_timeout')
+                logger.warn('Timed out waiting for webinar token refresh (%.2fs)',
+                            timeout)
+                raise WebinarClientError('Timed out waiting for webinar token refresh.')
+            time.sleep(interval)
+            interval = min(interval * 2, TOKEN_REFRESH_POLL_INTERVAL)
+
+    def update_tokens(self, old_access_token=None, blocking=True,
+                      timeout=TOKEN_REFRESH_WAIT_TIMEOUT):
+        """
+        Refresh our tokens, unless someone else already has since
+        `old_access_token`. Only one caller per process, and only one process,
+        performs the refresh; everyone else waits (up to `timeout` seconds)
+        for the new token to show up. If not `blocking` and someone else is
+        refreshing, return None immediately.
+        """
+        access_token_cache.invalidate(self.access_token_key, old_access_token)
+        flight, leader = _refresh_flights.join(self.access_token_key)
+        if not leader:
+            if not blocking:
+                return None
+            result = flight.wait(timeout)
+            if result is None:
+                # Our leader did not wait on another process; we will
+                result = self._wait_for_refresh(old_access_token, timeout)
+            return result
+        try:
+            lock = self.lock()
+            if lock.acquire(blocking=False):
+                result = self._refresh_locked(lock, old_access_token)
+            elif not blocking:
+                result = None
+            else:
+                result = self._wait_for_refresh(old_access_token, timeout)
+        except Exception as e:
+            _refresh_flights.finish(self.access_token_key, flight, error=e)
+            raise
+        _refresh_flights.finish(self.access_token_key, flight, result=result)
+        return result
+
+
+class _RefreshFlight(object):
+
+    result = None
+    error = None
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wait(self, timeout):
+        if not self.event.wait(timeout):
+            metrics.incr('token.refresh_wait_timeout')
+            raise WebinarClientError('Timed out waiting for webinar token refresh.')
+        if self.error is not None:
+            raise WebinarClientError('Error during webinar token refresh.')
+        return self.result
+
+
+class _RefreshFlights(object):
+    """
+    Tracks the in-flight token refresh, per token, within this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def join(self, key):
+        """
+        Return the flight for the key, and whether we are its leader.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _RefreshFlight()
+            return flight, True
+
+    def finish(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result = result
+        flight.error = error
+        flight.event.set()
+
+
+_refresh_flights = _RefreshFlights()
+
+
+class TokenRefreshScheduler(object):
+    """
+    Refreshes access tokens in background threads, at most one at a time
+    per token.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def _run(self, token_store, old_access_token):
+        try:
+            token_store.update_tokens(old_access_token, blocking=False)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error refreshing webinar access token in background')
+        finally:
+            with self._lock:
+                self._pending.discard(token_store.access_token_key)
+
+    def schedule(self, token_store, old_access_token):
+        """
+        Start a background refresh of the given token, unless one is already
+        running. Returns whether a refresh was started.
+        """
+        key = token_store.access_token_key
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        thread = threading.Thread(target=self._run,
+                                  args=(token_store, old_access_token),
+                                  name='webinar-token-refresh')
+        thread.daemon = True
+        thread.start()
+        return True
+
+
+#: The process-wide background token refresher.
+token_refresh_scheduler = TokenRefreshScheduler()
+
+
+def maybe_refresh_in_background(token_store, refresh_fraction):
+    """
+    If our cached access token has used `refresh_fraction` of its lifetime,
+    start refreshing it in the background, so that callers are not left
+    to find it expired.
+    """
+    key = token_store.access_token_key
+    expires_at = access_token_cache.get_expiry(key)
+    if expires_at is None:
+        return False
+    lifetime = token_store.access_token_expiry
+    refresh_at = expires_at - lifetime * (1 - refresh_fraction)
+    if time.time() < refresh_at:
+        return False
+    return token_refresh_scheduler.schedule(token_store,
+                                            access_token_cache.get(key))
@@ -8,8 +8,22 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import csv
 import base64
-import requests
+import tempfile
+
+from io import BytesIO
+
+from multiprocessing.pool import ThreadPool
+
+import simplejson
+
+from six import PY2
+from six import StringIO
+from six import text_type
+
+from pyramid.response import FileIter
+from pyramid.response import Response
 
 import pyramid.httpexceptions as hexc
 
@@ -17,12 +31,24 @@ from pyramid.threadlocal import get_current_request
 
 from zope import component
 
+from zope.component.hooks import site as current_site
+from zope.component.hooks import getSite
+
 from nti.app.externalization.error import raise_json_error
 
 from nti.app.products.webinar import MessageFactory as _
 
+from nti.app.products.webinar.http_pool import DEFAULT_TIMEOUT
+
+from nti.app.products.webinar.http_pool import get_http_session
+
+from nti.app.products.webinar.interfaces import WebinarUnauthorizedError
+
 from nti.common.interfaces import IOAuthKeys
 
+#: How much of an export we hold in memory before spooling it to disk.
+EXPORT_SPOOL_SIZE = 4 * 1024 * 1024
+
 logger = __import__('logging').getLogger(__name__)
 
 
@@ -43,9 +69,10 @@ def get_token_data(post_data):
     auth_header = '%s:%s' % (auth_keys.APIKey, auth_keys.secretKey)
     auth_header = base64.b64encode(auth_header)
     auth_header = 'Basic %s' % auth_header
-    response = requests.post(WEBINAR_AUTH_TOKEN_URL,
-                             post_data,
-                             headers={'Authorization': auth_header})
+    response = get_http_session().post(WEBINAR_AUTH_TOKEN_URL,
+                                       post_data,
+                                       headers={'Authorization': auth_header},
+                                       timeout=DEFAULT_TIMEOUT)
     if response.status_code != 200:
         error_json = response.json()
         if 'error' in error_json and error_json['error'] == 'invalid_grant':
@@ -88,3 +115,171 @@ def get_auth_tokens(refresh_token):
             'grant_type': 'refresh_token'}
     access_data = get_token_data(data)
     return access_data.get('access_token'), access_data.get('refresh_token')
+
+
+def concurrent_map(func, items, max_workers):
+    """
+    Map `func` over `items` using a bounded pool of worker threads, returning
+    results in order. Workers run within our current site, but should
+    otherwise avoid touching persistent objects (e.g. refreshing tokens;
+    see :func:`retry_unauthorized`).
+    """
+    items = list(items)
+    if not items:
+        return []
+    site = getSite()
+
+    def _run(item):
+        with current_site(site):
+            return func(item)
+
+    pool = ThreadPool(max(1, min(max_workers, len(items))))
+    try:
+        return pool.map(_run, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def retry_unauthorized(func, jobs, results, get_client):
+    """
+    Retry, serially in this thread, the :func:`concurrent_map` jobs whose
+    workers returned (as the last item of their result) a
+    :class:`WebinarUnauthorizedError`; workers may not refresh tokens on
+    the persistent integration. Each job's client, from `get_client(job)`,
+    has its token refreshed (at most) once first. Returns all the results,
+    in order.
+    """
+    results = list(results)
+    refreshed = set()
+    for idx, job in enumerate(jobs):
+        if not isinstance(results[idx][-1], WebinarUnauthorizedError):
+            continue
+        client = get_client(job)
+        if id(client) not in refreshed:
+            refreshed.add(id(client))
+            try:
+                client.refresh_access_token()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error refreshing webinar access token')
+        results[idx] = func(job)
+    return results
+
+
+_JSON_WHITESPACE = u' \t\n\r'
+
+_EXPECT_START = 0
+_EXPECT_FIRST = 1
+_EXPECT_VALUE = 2
+_EXPECT_SEPARATOR = 3
+
+
+def iter_json_array(chunks):
+    """
+    Incrementally parse a JSON array from an iterable of text chunks,
+    yielding each element as soon as it has been completely read. Raises
+    :class:`ValueError` for anything but a well-formed array, including
+    trailing data after it.
+    """
+    decoder = simplejson.JSONDecoder()
+    chunks = iter(chunks)
+    buf = u''
+    pos = 0
+    # What we expect next: the opening bracket, the first value (or an
+    # empty array's closing bracket), a value after a comma, or a
+    # separator (a comma or the closing bracket) after a value.
+    expecting = _EXPECT_START
+    exhausted = False
+    while True:
+        while pos < len(buf) and buf[pos] in _JSON_WHITESPACE:
+            pos += 1
+        need_more = pos >= len(buf)
+        if not need_more:
+            char = buf[pos]
+            if expecting == _EXPECT_START:
+                if char != u'[':
+                    raise ValueError('Expected a JSON array')
+                expecting = _EXPECT_FIRST
+                pos += 1
+                continue
+            if expecting in (_EXPECT_FIRST, _EXPECT_SEPARATOR) and char == u']':
+                # Only whitespace may follow the array
+                rest = buf[pos + 1:]
+                while rest is not None:
+                    if rest.strip(_JSON_WHITESPACE):
+                        raise ValueError('Unexpected data after JSON array')
+                    rest = next(chunks, None)
+                return
+            if expecting == _EXPECT_SEPARATOR:
+                if char != u',':
+                    raise ValueError('Expected "," or "]" at %s' % pos)
+                expecting = _EXPECT_VALUE
+                pos += 1
+                continue
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if exhausted:
+                    raise
+                need_more = True
+            else:
+                # A value ending our buffer may be truncated (e.g. a number)
+                if end < len(buf) or exhausted:
+                    pos = end
+                    expecting = _EXPECT_SEPARATOR
+                    yield value
+                    continue
+                need_more = True
+        if exhausted:
+            raise ValueError('Unexpected end of JSON array')
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+        else:
+            buf = buf[pos:] + chunk
+            pos = 0
+
+
+def csv_line(values):
+    """
+    Return the given values as a single utf-8 encoded CSV line.
+    """
+    values = [u'' if x is None else text_type(x) for x in values]
+    if PY2:
+        out = BytesIO()
+        csv.writer(out).writerow([x.encode('utf-8') for x in values])
+        return out.getvalue()
+    out = StringIO()
+    csv.writer(out).writerow(values)
+    return out.getvalue().encode('utf-8')
+
+
+def ndjson_line(value):
+    """
+    Return the given value as a single utf-8 encoded NDJSON line.
+    """
+    result = simplejson.dumps(value, separators=(',', ':'))
+    if isinstance(result, text_type):
+        result = result.encode('utf-8')
+    return result + b'\n'
+
+
+def export_response(lines, content_type, filename=None):
+    """
+    Return a response streaming the given encoded lines. The lines are
+    consumed here, while our transaction is still open, but are spooled to
+    disk once they outgrow :data:`EXPORT_SPOOL_SIZE` rather than being held
+    in memory.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    length = 0
+    for line in lines:
+        spool.write(line)
+        length += len(line)
+    spool.seek(0)
+    response = Response(content_type=content_type)
+    if filename:
+        response.content_disposition = 'attachment; filename="%s"' % filename
+    response.content_length = length
+    response.app_iter = FileIter(spool)
+    return response
@@ -8,6 +8,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import heapq
+
 from datetime import datetime
 
 from pyramid import httpexceptions as hexc
@@ -18,10 +20,13 @@ from requests.structures import CaseInsensitiveDict
 
 from zope import component
 
+from zope.cachedescriptors.property import Lazy
+
 from zope.event import notify
 
 from nti.app.base.abstract_views import AbstractAuthenticatedView
 
+from nti.app.externalization.view_mixins import BatchingUtilsMixin
 from nti.app.externalization.view_mixins import ModeledContentUploadRequestUtilsMixin
 
 from nti.app.products.webinar import VIEW_JOIN_WEBINAR
@@ -29,7 +34,9 @@ from nti.app.products.webinar import VIEW_RESOLVE_WEBINAR
 from nti.app.products.webinar import VIEW_WEBINAR_REGISTER
 from nti.app.products.webinar import VIEW_UPCOMING_WEBINARS
 from nti.app.products.webinar import VIEW_WEBINAR_UNREGISTER
+from nti.app.products.webinar import VIEW_WEBINAR_BULK_REGISTER
 from nti.app.products.webinar import VIEW_WEBINAR_REGISTRATIONS
+from nti.app.products.webinar import VIEW_WEBINAR_ATTENDANCE_REPORT
 from nti.app.products.webinar import VIEW_WEBINAR_REGISTRATION_FIELDS
 
 from nti.app.products.webinar import MessageFactory as _
@@ -38,12 +45,28 @@ from nti.app.products.webinar.interfaces import IWebinar
 from nti.app.products.webinar.interfaces import IWebinarClient
 from nti.app.products.webinar.interfaces import JoinWebinarEvent
 from nti.app.products.webinar.interfaces import WebinarClientError
+from nti.app.products.webinar.interfaces import WebinarCircuitOpenError
 from nti.app.products.webinar.interfaces import WebinarRegistrationError
 from nti.app.products.webinar.interfaces import IWebinarAuthorizedIntegration
 from nti.app.products.webinar.interfaces import IGoToWebinarAuthorizedIntegration
 from nti.app.products.webinar.interfaces import IWebinarRegistrationMetadataContainer
 
+from nti.app.products.webinar.adapters import WebinarRegistrationMetadataContainer
+from nti.app.products.webinar.adapters import query_webinar_registration_container
+
+from nti.app.products.webinar.cache import invalidate_webinar_listings
+
+from nti.app.products.webinar.reports import ATTENDANCE_REPORT_FORMATS
+from nti.app.products.webinar.reports import ATTENDANCE_REPORT_CONTENT_TYPES
+
+from nti.app.products.webinar.reports import iter_webinar_attendance
+from nti.app.products.webinar.reports import iter_organizer_attendance
+from nti.app.products.webinar.reports import iter_attendance_report_lines
+
+from nti.app.products.webinar.utils import csv_line
 from nti.app.products.webinar.utils import raise_error
+from nti.app.products.webinar.utils import ndjson_line
+from nti.app.products.webinar.utils import export_response
 
 from nti.appserver.dataserver_pyramid_views import GenericGetView
 
@@ -51,6 +74,8 @@ from nti.dataserver.authorization import ACT_READ
 from nti.dataserver.authorization import ACT_NTI_ADMIN
 from nti.dataserver.authorization import ACT_CONTENT_EDIT
 
+from nti.dataserver.users import User
+
 from nti.externalization.interfaces import StandardExternalFields
 from nti.externalization.interfaces import LocatedExternalDict
 
@@ -63,6 +88,23 @@ ITEM_COUNT = StandardExternalFields.ITEM_COUNT
 logger = __import__('logging').getLogger(__name__)
 
 
+def _isoformat(timestamp):
+    if not timestamp:
+        return None
+    return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def raise_unavailable_error(error):
+    """
+    Raise a 503 for a :class:`WebinarCircuitOpenError`, so clients can tell
+    an outage apart from other API errors.
+    """
+    raise_error({'message': _(u"The webinar service is temporarily unavailable."),
+                 'code': 'WebinarServiceUnavailableError',
+                 'retry_after': error.retry_after},
+                factory=hexc.HTTPServiceUnavailable)
+
+
 @view_config(route_name='objects.generic.traversal',
              context=IGoToWebinarAuthorizedIntegration,
              request_method='DELETE',
@@ -76,6 +118,7 @@ class GoToWebinarIntegrationDeleteView(AbstractAuthenticatedView):
     def __call__(self):
         registry = component.getSiteManager()
         unregisterUtility(registry, provided=IGoToWebinarAuthorizedIntegration)
+        invalidate_webinar_listings(self.context.organizer_key)
         return hexc.HTTPNoContent()
 
 
@@ -93,7 +136,9 @@ class UpcomingWebinarsView(AbstractAuthenticatedView):
     def __call__(self):
         client = IWebinarClient(self.context)
         try:
-            webinars = client.get_upcoming_webinars()
+            webinars = client.get_upcoming_webinars(summary=True)
+        except WebinarCircuitOpenError as circuit_error:
+            raise_unavailable_error(circuit_error)
         except WebinarClientError:
             raise_error({'message': _(u"Error during webinar call."),
                          'code': 'WebinarClientAPIError'})
@@ -125,23 +170,22 @@ class ResolveWebinarsView(UpcomingWebinarsView):
             or result.get('key') \
             or result.get('webinar_url')
 
-    def filter_webinars(self, webinars, include_filter):
-        """
-        Include anything matching on webinarKey or registrationUrl.
-        """
-        return [x for x in webinars
-                if x.webinarKey == include_filter \
-                or x.registrationUrl == include_filter]
-
     def __call__(self):
         webinar_filter = self.get_webinar_param()
         if not webinar_filter:
             raise_error({'message': _(u"Must supply webinar key."),
                          'code': 'MissingWebinarURLError'})
-        result = super(ResolveWebinarsView, self).__call__()
-        result[ITEMS] = self.filter_webinars(result[ITEMS],
-                                             webinar_filter)
-        result[ITEM_COUNT] = len(result[ITEMS])
+        client = IWebinarClient(self.context)
+        try:
+            webinars = client.resolve_webinars(webinar_filter, summary=True)
+        except WebinarCircuitOpenError as circuit_error:
+            raise_unavailable_error(circuit_error)
+        except WebinarClientError:
+            raise_error({'message': _(u"Error during webinar call."),
+                         'code': 'WebinarClientAPIError'})
+        result = LocatedExternalDict()
+        result[ITEMS] = webinars
+        result[TOTAL] = result[ITEM_COUNT] = len(webinars)
         return result
 
 
@@ -166,6 +210,8 @@ class WebinarRegistrationFieldView(AbstractAuthenticatedView):
 
         try:
             result = client.get_registration_fields(self.context.webinarKey)
+        except WebinarCircuitOpenError as circuit_error:
+            raise_unavailable_error(circuit_error)
         except WebinarClientError:
             raise_error({'message': _(u"Error during webinar call."),
                          'code': 'WebinarClientAPIError'})
@@ -213,6 +259,8 @@ class WebinarRegisterView(AbstractAuthenticatedView,
                          'code': 'WebinarRegistrationValidationError',
                          'error_dict': validation_error.json},
                         factory=hexc.HTTPUnprocessableEntity)
+        except WebinarCircuitOpenError as circuit_error:
+            raise_unavailable_error(circuit_error)
         except WebinarClientError:
             raise_error({'message': _(u"Validation error during registration."),
                          'code': 'WebinarRegistrationValidationError'})
@@ -220,12 +268,106 @@ class WebinarRegisterView(AbstractAuthenticatedView,
                     self.context.webinarKey,
                     self.remoteUser,
                     registration_metadata)
+        # Registrant counts in our cached listings are now stale
+        invalidate_webinar_listings(self.context.organizerKey)
         container = IWebinarRegistrationMetadataContainer(self.context)
         if self.remoteUser.username not in container:
             container[self.remoteUser.username] = registration_metadata
         return container[self.remoteUser.username]
 
 
+@view_config(route_name='objects.generic.traversal',
+             context=IWebinar,
+             request_method='POST',
+             name=VIEW_WEBINAR_BULK_REGISTER,
+             permission=ACT_NTI_ADMIN,
+             renderer='rest')
+class WebinarBulkRegisterView(AbstractAuthenticatedView,
+                              ModeledContentUploadRequestUtilsMixin):
+    """
+    Register many users for the contextual :class:`IWebinar` object at
+    once. The input is a list of `Items`, each with a `username` and that
+    user's registration data (e.g. `firstName`, `lastName`, `email`); any
+    `registration_data` given is shared by all users. Returns the result
+    for each user.
+    """
+
+    def _get_registrations(self):
+        values = self.readInput()
+        if isinstance(values, (list, tuple)):
+            values = {ITEMS: values}
+        items = values.get(ITEMS) or values.get('items')
+        if not items or not isinstance(items, (list, tuple)):
+            raise_error({'message': _(u"Must supply users to register."),
+                         'code': 'RegistrationDataNotFoundError'})
+        shared_data = values.get('registration_data') or {}
+        result = []
+        missing = []
+        for item in items:
+            item = dict(item) if isinstance(item, dict) else {}
+            username = item.pop('username', None)
+            user = User.get_user(username) if username else None
+            if user is None:
+                missing.append(username)
+                continue
+            registration_data = dict(shared_data)
+            registration_data.update(item)
+            result.append((user, registration_data))
+        return result, missing
+
+    def _result_ext(self, registration_result):
+        result = {'username': registration_result.username,
+                  'status': registration_result.status}
+        if registration_result.error is not None:
+            result['error'] = registration_result.error
+        return result
+
+    def __call__(self):
+        registrations, missing = self._get_registrations()
+        client = IWebinarClient(self.context, None)
+        if client is None:
+            raise_error({'message': _(u"No longer have an integration for this webinar."),
+                         'code': 'UnauthorizedWebinarError'},
+                         factory=hexc.HTTPUnprocessableEntity)
+        try:
+            registration_results = client.register_users(self.context.webinarKey,
+                                                         registrations)
+        except WebinarCircuitOpenError as circuit_error:
+            raise_unavailable_error(circuit_error)
+        except WebinarClientError:
+            raise_error({'message': _(u"Error during webinar call."),
+                         'code': 'WebinarClientAPIError'})
+
+        container = IWebinarRegistrationMetadataContainer(self.context)
+        items = []
+        registered_count = 0
+        for registration_result in registration_results:
+            item = self._result_ext(registration_result)
+            if registration_result.success:
+                registered_count += 1
+                username = registration_result.username
+                if username not in container:
+                    container[username] = registration_result.metadata
+                item['RegistrationMetadata'] = container[username]
+            items.append(item)
+        for username in missing:
+            items.append({'username': username,
+                          'status': u'UserNotFound'})
+
+        logger.info('Bulk registered users for webinar (%s) (registered=%s) (total=%s)',
+                    self.context.webinarKey,
+                    registered_count,
+                    len(items))
+        if registered_count:
+            # Registrant counts in our cached listings are now stale
+            invalidate_webinar_listings(self.context.organizerKey)
+        result = LocatedExternalDict()
+        result[ITEMS] = items
+        result[TOTAL] = result[ITEM_COUNT] = len(items)
+        result['RegisteredCount'] = registered_count
+        return result
+
+
 @view_config(route_name='objects.generic.traversal',
              context=IWebinar,
              request_method='DELETE',
@@ -244,13 +386,15 @@ class WebinarUnRegisterView(AbstractAuthenticatedView):
             raise_error({'message': _(u"No longer have an integration for this webinar."),
                          'code': 'UnauthorizedWebinarError'},
                          factory=hexc.HTTPUnprocessableEntity)
-        container = IWebinarRegistrationMetadataContainer(self.context)
+        container = query_webinar_registration_container(self.context)
         username = self.remoteUser.username
-        if username in container:
+        if container is not None and username in container:
             registration_metadata = container[username]
             try:
                 did_unregister = client.unregister_user(self.context.webinarKey,
                                                     registration_metadata.registrant_key)
+            except WebinarCircuitOpenError as circuit_error:
+                raise_unavailable_error(circuit_error)
             except WebinarClientError:
                 raise_error({'message': _(u"Error during unregistration."),
                              'code': 'WebinarUnRegistrationError'})
@@ -258,6 +402,8 @@ class WebinarUnRegisterView(AbstractAuthenticatedView):
                 logger.info('Unregistered user from webinar (%s) (%s)',
                             username,
                             self.context.webinarKey)
+                del container[username]
+                invalidate_webinar_listings(self.context.organizerKey)
         return hexc.HTTPNoContent()
 
 
@@ -273,8 +419,8 @@ class JoinWebinarView(AbstractAuthenticatedView):
     """
 
     def __call__(self):
-        container = IWebinarRegistrationMetadataContainer(self.context)
-        if self.remoteUser.username not in container:
+        container = query_webinar_registration_container(self.context)
+        if container is None or self.remoteUser.username not in container:
             # XXX: What do we do here?
             raise_error({'message': _(u"Webinar registration does not exist."),
                          'code': 'WebinarRegistrationNotFoundError'},
@@ -302,14 +448,182 @@ class WebinarGetView(GenericGetView):
              name=VIEW_WEBINAR_REGISTRATIONS,
              permission=ACT_NTI_ADMIN,
              renderer='rest')
-class WebinarRegistrationsView(AbstractAuthenticatedView):
+class WebinarRegistrationsView(AbstractAuthenticatedView,
+                               BatchingUtilsMixin):
     """
-    Allows the user to join the contextual :class:`IWebinar` object.
+    Returns the registrations for the contextual :class:`IWebinar` object.
+    Given any of the params below (other than `format`), `Items` is an
+    ordered list of a batch of registrations; otherwise, it is all the
+    registrations, keyed by username.
+
+    params:
+        batchStart/batchSize - the batch to return
+        sortOn - `username` (default) or `createdTime`
+        sortOrder - `ascending` (default) or `descending`
+        usernamePrefix - only registrations of usernames with this prefix
+        format - `csv` or `ndjson` to export all matching registrations
     """
 
+    _DEFAULT_BATCH_SIZE = 100
+    _DEFAULT_BATCH_START = 0
+
+    BATCH_PARAMS = ('batchSize', 'batchStart', 'sortOn', 'sortOrder',
+                    'usernamePrefix')
+
+    EXPORT_FIELDS = ('username', 'registrant_key', 'webinar_key',
+                     'organizer_key', 'join_url', 'createdTime',
+                     'lastModified')
+
+    @Lazy
+    def _params(self):
+        return CaseInsensitiveDict(self.request.params)
+
+    @Lazy
+    def sort_on(self):
+        result = self._params.get('sortOn') or 'username'
+        if result not in ('username', 'createdTime'):
+            raise_error({'message': _(u"Invalid sortOn."),
+                         'code': 'InvalidSortOnError'})
+        return result
+
+    @Lazy
+    def sort_descending(self):
+        return (self._params.get('sortOrder') or '').lower() == 'descending'
+
+    @Lazy
+    def username_prefix(self):
+        return (self._params.get('usernamePrefix') or u'').lower()
+
+    @Lazy
+    def batching(self):
+        return any(x in self._params for x in self.BATCH_PARAMS)
+
+    @Lazy
+    def export_format(self):
+        result = (self._params.get('format') or u'').lower() or None
+        if result not in (None, 'csv', 'ndjson'):
+            raise_error({'message': _(u"Invalid export format."),
+                         'code': 'InvalidExportFormatError'})
+        return result
+
+    def _usernames(self, container):
+        # Keys only; registrations are not loaded until needed
+        reverse = self.sort_descending and self.sort_on == 'username'
+        return container.iter_usernames(self.username_prefix, reverse=reverse)
+
+    def _registrations(self, container, needed=None):
+        """
+        Yield the matching (username, registration) pairs in sort order,
+        walking the container lazily. Sorting by created time loads each
+        registration, keeping only the `needed` first if given.
+        """
+        if self.sort_on != 'createdTime':
+            for username in self._usernames(container):
+                yield username, container[username]
+            return
+        created = ((container[x].createdTime, x) for x in self._usernames(container))
+        if needed is not None:
+            select = heapq.nlargest if self.sort_descending else heapq.nsmallest
+            created = select(needed, created)
+        else:
+            created = sorted(created, reverse=self.sort_descending)
+        for unused_created, username in created:
+            yield username, container[username]
+
+    def _export_row(self, username, registration):
+        return (username,
+                registration.registrant_key,
+                registration.webinar_key,
+                registration.organizer_key,
+                registration.join_url,
+                _isoformat(registration.createdTime),
+                _isoformat(registration.lastModified))
+
+    def _export(self, container):
+        if self.export_format == 'csv':
+            def _lines():
+                yield csv_line(self.EXPORT_FIELDS)
+                for username, registration in self._registrations(container):
+                    yield csv_line(self._export_row(username, registration))
+            content_type = 'text/csv'
+        else:
+            def _lines():
+                for username, registration in self._registrations(container):
+                    row = self._export_row(username, registration)
+                    yield ndjson_line(dict(zip(self.EXPORT_FIELDS, row)))
+            content_type = 'application/x-ndjson'
+        filename = 'webinar_registrations_%s.%s' % (self.context.webinarKey,
+                                                    self.export_format)
+        return export_response(_lines(), content_type, filename)
+
     def __call__(self):
-        container = IWebinarRegistrationMetadataContainer(self.context)
+        container = query_webinar_registration_container(self.context)
+        if container is None:
+            container = WebinarRegistrationMetadataContainer()
+        if self.export_format:
+            return self._export(container)
         result = LocatedExternalDict()
-        result[ITEMS] = dict(container)
-        result[TOTAL] = result[ITEM_COUNT] = len(container)
+        if not self.batching:
+            result[ITEMS] = dict(container)
+            result[TOTAL] = result[ITEM_COUNT] = len(container)
+            return result
+        total = container.count_usernames(self.username_prefix)
+        batch_size, batch_start = self._get_batch_size_start()
+        needed = batch_start + batch_size + 2 if batch_size is not None else None
+        registrations = (x[1] for x in self._registrations(container, needed))
+        self._batch_items_iterable(result, registrations,
+                                   number_items_needed=needed,
+                                   batch_size=batch_size,
+                                   batch_start=batch_start)
+        result[TOTAL] = total
         return result
+
+
+def _attendance_report_response(request, rows, filename_prefix):
+    """
+    Stream the attendance report rows, one per attendance interval, as CSV
+    (default) or NDJSON (`format=ndjson`).
+    """
+    params = CaseInsensitiveDict(request.params)
+    report_format = (params.get('format') or 'csv').lower()
+    if report_format not in ATTENDANCE_REPORT_FORMATS:
+        raise_error({'message': _(u"Invalid report format."),
+                     'code': 'InvalidReportFormatError'},
+                    request=request)
+    return export_response(iter_attendance_report_lines(rows, report_format),
+                           ATTENDANCE_REPORT_CONTENT_TYPES[report_format],
+                           '%s.%s' % (filename_prefix, report_format))
+
+
+@view_config(route_name='objects.generic.traversal',
+             context=IWebinar,
+             request_method='GET',
+             name=VIEW_WEBINAR_ATTENDANCE_REPORT,
+             permission=ACT_NTI_ADMIN)
+class WebinarAttendanceReportView(AbstractAuthenticatedView):
+    """
+    The attendance report for the contextual :class:`IWebinar`.
+    """
+
+    def __call__(self):
+        return _attendance_report_response(self.request,
+                                           iter_webinar_attendance(self.context),
+                                           'webinar_attendance_%s' % self.context.webinarKey)
+
+
+@view_config(route_name='objects.generic.traversal',
+             context=IGoToWebinarAuthorizedIntegration,
+             request_method='GET',
+             name=VIEW_WEBINAR_ATTENDANCE_REPORT,
+             permission=ACT_NTI_ADMIN)
+class OrganizerAttendanceReportView(AbstractAuthenticatedView):
+    """
+    The attendance report for every webinar of the contextual
+    :class:`IGoToWebinarAuthorizedIntegration` organizer.
+    """
+
+    def __call__(self):
+        organizer_key = self.context.organizer_key
+        return _attendance_report_response(self.request,
+                                           iter_organizer_attendance(organizer_key),
+                                           'webinar_attendance_organizer_%s' % organizer_key)